@@ -0,0 +1,190 @@
+"""Deterministic generator of realistic synthetic context, posts and notes files.
+
+The same seed always produces byte-identical files so benchmark runs are comparable.
+"""
+import os
+import json
+import zlib
+import random
+import struct
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+ANCHOR_TIME = datetime(2025, 3, 1, 12, 0, 0, tzinfo=timezone.utc) # Timestamp of the most recent entry
+CAPTURE_INTERVAL = timedelta(seconds=24) # Matches MONITOR_INTERVAL=0.4 from .env.template
+POST_INTERVAL = timedelta(minutes=5)
+
+MODELS = [
+	"google/gemini-2.0-flash-lite-preview-02-05:free",
+	"google/gemini-2.0-flash-lite-001",
+	"google/gemini-2.0-flash-001"
+]
+LOCATIONS = [
+	"Pallet Town", "Route 1", "Viridian City", "Viridian Forest", "Pewter City", "Route 3",
+	"Mt. Moon", "Mt. Moon B1F", "Route 4", "Cerulean City", "Route 24", "Nugget Bridge",
+	"Route 25", "Bill's House", "Cerulean Gym", "Route 5", "Underground Path", "Vermilion City",
+	"S.S. Anne", "Route 11", "Diglett's Cave", "Rock Tunnel", "Lavender Town", "Unknown"
+]
+POKEMON = [
+	("Charmander", "CHARMY"), ("Charmeleon", "CHARMY"), ("Pidgey", "BIRDO"), ("Pidgeotto", "BIRDO"),
+	("Rattata", "RATTY"), ("Spearow", "SPEARY"), ("Nidoran", "NIDO"), ("Geodude", "ROCKY"),
+	("Zubat", "ZUBY"), ("Pikachu", "SPARKY"), ("Oddish", "ODDY"), ("Abra", "ABRA")
+]
+HEALTH = ["full", "ok", "low", "critical", "fainted"]
+SUMMARY_TEMPLATES = [
+	"Claude is walking through {location}, looking for the next trainer to battle. The party menu shows {pokemon} at the front of the team.",
+	"Claude is in a battle against a wild {wild} in {location}. His {pokemon} is using Scratch and the opponent's HP bar is dropping into the red.",
+	"A text box is open in {location} where an NPC explains the way forward. Claude seems to be reading the dialogue carefully before moving on.",
+	"Claude opened the start menu in {location} and is checking his items. He appears to be deciding whether to use a Potion on {pokemon}.",
+	"Claude is battling a trainer in {location}. {pokemon} landed a critical hit and the opposing {wild} fainted, earning experience points.",
+	"Claude is stuck walking into a wall in {location}, repeating the same movement several times. This looks like a navigation mistake.",
+]
+COMMENTARY_TEMPLATES = [
+	"Claude is still exploring {location} with {pokemon} leading the way!",
+	"Big moment in {location}: {pokemon} just took down a wild {wild}!",
+	"Claude keeps bumping into walls in {location}. Navigation is hard!",
+	"{pokemon} is carrying the team through {location} right now.",
+]
+NOTE_SECTIONS = [
+	"## Team\n- {pokemon} is the main attacker\n- Team health has been managed with Potions",
+	"## Progress\n- Boulder Badge earned in Pewter City\n- Currently heading through {location}",
+	"## Strategy\n- Claude prefers leading with {pokemon}\n- He tends to avoid wild encounters when low on HP",
+	"## Mistakes\n- Walked in circles in {location} for several minutes\n- Forgot to heal before a trainer battle",
+]
+
+def _isoformat(time: datetime) -> str:
+	"""Format a timestamp like datetime.now(timezone.utc).isoformat() does in the agents."""
+	return time.isoformat()
+
+def _context_entry(rng: random.Random, time: datetime, index: int) -> dict:
+	"""Create one monitor analysis record."""
+	location = rng.choice(LOCATIONS)
+	team = rng.sample(POKEMON, rng.randint(1, 4))
+	summary = rng.choice(SUMMARY_TEMPLATES).format(
+		location=location, pokemon=team[0][1], wild=rng.choice(POKEMON)[0]
+	)
+	# Most frames are mundane, a few are highlights
+	score = min(10, max(1, int(rng.expovariate(0.45)) + 1))
+	input_tokens = 780 + rng.randint(0, 40)
+	output_tokens = 90 + rng.randint(0, 80)
+	return {
+		"image_path": f"context/images/{time.strftime('%Y%m%d_%H%M%S_UTC')}.png",
+		"timestamp": _isoformat(time),
+		"model": rng.choice(MODELS),
+		"detailed_summary": summary if rng.random() > 0.02 else "", # Failed analyses have empty summaries
+		"team_details": [
+			{"name": name, "custom_name": custom_name, "health": rng.choice(HEALTH)}
+			for name, custom_name in team
+		],
+		"score": score,
+		"estimated_location": location,
+		"token_usage": {
+			"input_tokens": input_tokens,
+			"output_tokens": output_tokens,
+			"total_tokens": input_tokens + output_tokens
+		}
+	}
+
+def generate_context(path: str, lines: int, seed: int = 0, end_time: datetime = ANCHOR_TIME) -> str:
+	"""Write `lines` monitor analyses ending at end_time to a context.jsonl file."""
+	rng = random.Random(seed)
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	start_time = end_time - CAPTURE_INTERVAL * (lines - 1)
+	with open(path, "w") as f:
+		for i in range(lines):
+			f.write(json.dumps(_context_entry(rng, start_time + CAPTURE_INTERVAL * i, i)) + "\n")
+	return path
+
+def generate_posts(path: str, lines: int, seed: int = 0, end_time: datetime = ANCHOR_TIME) -> str:
+	"""Write `lines` post agent decisions ending at end_time to a posts.jsonl file."""
+	rng = random.Random(seed + 1)
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	start_time = end_time - POST_INTERVAL * (lines - 1)
+	with open(path, "w") as f:
+		for i in range(lines):
+			time = start_time + POST_INTERVAL * i
+			score = rng.randint(0, 10)
+			input_tokens = 2500 + rng.randint(0, 1500)
+			output_tokens = 60 + rng.randint(0, 40)
+			post = {
+				"timestamp": _isoformat(time),
+				"model": rng.choice(MODELS[::2]),
+				"commentary": rng.choice(COMMENTARY_TEMPLATES).format(
+					location=rng.choice(LOCATIONS), pokemon=rng.choice(POKEMON)[1], wild=rng.choice(POKEMON)[0]
+				),
+				"score": score,
+				"post": score >= 7,
+				"image_id": rng.randint(1, 20),
+				"token_usage": {
+					"input_tokens": input_tokens,
+					"output_tokens": output_tokens,
+					"total_tokens": input_tokens + output_tokens
+				},
+				"image_path": f"context/images/{time.strftime('%Y%m%d_%H%M%S_UTC')}.png"
+			}
+			f.write(json.dumps(post) + "\n")
+	return path
+
+def generate_notes(path: str, sections: int = 12, seed: int = 0) -> str:
+	"""Write a notes.txt file with `sections` markdown sections."""
+	rng = random.Random(seed + 2)
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	blocks = [
+		rng.choice(NOTE_SECTIONS).format(location=rng.choice(LOCATIONS), pokemon=rng.choice(POKEMON)[1])
+		for _ in range(sections)
+	]
+	with open(path, "w") as f:
+		f.write("\n\n".join(blocks) + "\n")
+	return path
+
+def generate_screenshot(path: str, width: int = 1920, height: int = 1200, seed: int = 0) -> str:
+	"""Write a PNG with the size and rough compressibility of a full window screenshot."""
+	rng = random.Random(seed + 3)
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	# Flat coloured tiles with per-pixel noise, similar to a video frame with UI panels
+	tile = 40
+	colours = [bytes(rng.randint(0, 255) for _ in range(3)) for _ in range(16)]
+	noise = bytes(rng.randint(0, 7) for _ in range(width * 3 + 97))
+	rows = []
+	for y in range(height):
+		row = bytearray(b"\x00") # Filter type: none
+		line = bytearray()
+		for x in range(0, width, tile):
+			line += colours[((x // tile) * 7 + (y // tile) * 3) % len(colours)] * min(tile, width - x)
+		offset = (y * 31) % 97
+		row += bytes(a ^ b for a, b in zip(line, noise[offset:offset + len(line)]))
+		rows.append(bytes(row))
+
+	def chunk(kind: bytes, data: bytes) -> bytes:
+		return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+	with open(path, "wb") as f:
+		f.write(b"\x89PNG\r\n\x1a\n")
+		f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+		f.write(chunk(b"IDAT", zlib.compress(b"".join(rows), 6)))
+		f.write(chunk(b"IEND", b""))
+	return path
+
+def generate_dataset(root: str, context_lines: int, post_lines: int = 2000, seed: int = 0) -> dict:
+	"""Generate a full context/ tree under root and return the paths."""
+	return {
+		"context": generate_context(os.path.join(root, "monitor", "context.jsonl"), context_lines, seed),
+		"posts": generate_posts(os.path.join(root, "posts", "posts.jsonl"), post_lines, seed),
+		"notes": generate_notes(os.path.join(root, "posts", "notes.txt"), seed=seed),
+	}
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Generate synthetic context, posts and notes files")
+	parser.add_argument("root", help="Output directory (mirrors the context/ layout)")
+	parser.add_argument("--lines", type=int, default=10000, help="Number of context.jsonl lines")
+	parser.add_argument("--posts", type=int, default=2000, help="Number of posts.jsonl lines")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--screenshot", action="store_true", help="Also write a full-size screenshot")
+	args = parser.parse_args()
+
+	paths = generate_dataset(args.root, args.lines, args.posts, args.seed)
+	if args.screenshot:
+		paths["screenshot"] = generate_screenshot(os.path.join(args.root, "images", "screenshot.png"), seed=args.seed)
+	for name, path in paths.items():
+		print(f"{name}: {path}")
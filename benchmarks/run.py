@@ -0,0 +1,282 @@
+"""Micro-benchmarks for the hot pure-Python paths of both agents.
+
+Usage:
+	python -m benchmarks.run                                  # run and save results
+	python -m benchmarks.run --sizes 1000,10000000            # include the 10M line context file
+	python -m benchmarks.run --baseline benchmarks/results/baseline.json
+	python -m benchmarks.run --only capture                   # capture backends, needs Chrome
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional
+
+from .generate import ANCHOR_TIME, generate_context, generate_notes, generate_screenshot
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "benchmarks/data"
+RESULTS_DIR = "benchmarks/results"
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+DEFAULT_THRESHOLD = 0.10 # Flag anything more than 10% slower than the baseline
+
+def measure(func: Callable[[], Any], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+	"""Time func and return wall clock statistics in seconds."""
+	for _ in range(warmup):
+		func()
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		timings.append(time.perf_counter() - start)
+	return {
+		"median": statistics.median(timings),
+		"min": min(timings),
+		"mean": statistics.fmean(timings),
+		"repeat": repeat,
+	}
+
+def _context_file(lines: int) -> str:
+	"""Return a cached synthetic context.jsonl with the given number of lines."""
+	path = os.path.join(DATA_DIR, f"context_{lines}.jsonl")
+	if not os.path.exists(path):
+		logger.info(f"Generating {path}")
+		generate_context(path, lines)
+	return path
+
+def _load_context(path: str):
+	"""Build a post Context pointed at a synthetic file without touching the real context/ tree."""
+	from post.context import Context
+	context = Context.__new__(Context)
+	context.timestamp = ANCHOR_TIME
+	context.context_path = Path(path)
+	context.channel = None
+	return context
+
+#-------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------
+def bench_context(sizes, repeat: int) -> Dict[str, Dict]:
+	"""Context._get_context and _context_to_string over context.jsonl files of various sizes."""
+	results = {}
+	for lines in sizes:
+		context = _load_context(_context_file(lines))
+		# Large files are slow enough that a single pass is representative
+		runs = repeat if lines <= 100000 else 1
+		results[f"context.get_context[{lines}]"] = {**measure(context._get_context, runs, warmup=0 if runs == 1 else 1), "n": lines}
+
+	context = _load_context(_context_file(sizes[0]))
+	window = context._get_context()
+	results["context.context_to_string"] = {**measure(lambda: context._context_to_string(window), repeat * 20), "n": window["count"]}
+	return results
+
+def _raw_monitor_responses(count: int):
+	rng = random.Random(0)
+	return [{
+		"detailed_summary": "Claude is in a battle against a wild Pidgey on Route 1.",
+		"team_details": [{"name": "Charmander", "custom_name": "CHARMY", "health": "ok"}] * rng.randint(1, 6),
+		"score": rng.choice([3, "7", 12, None]),
+		"estimated_location": "Route 1",
+		"token_usage": {"input_tokens": 800, "output_tokens": 120, "total_tokens": 920}
+	} for _ in range(count)]
+
+def _raw_post_responses(count: int):
+	rng = random.Random(0)
+	return [{
+		"commentary": "Claude just caught a Pikachu in Viridian Forest!",
+		"score": rng.choice([2, "9", -1]),
+		"post": rng.choice([True, False, "true"]),
+		"image_id": rng.choice([1, 5, None, "3"]),
+		"token_usage": {"input_tokens": 3000, "output_tokens": 80, "total_tokens": 3080}
+	} for _ in range(count)]
+
+def bench_sanitize(repeat: int) -> Dict[str, Dict]:
+	"""Monitor and post sanitize_results over a batch of raw responses."""
+	import monitor.validate
+	import post.validate
+	count = 1000
+	timestamp = ANCHOR_TIME.isoformat()
+	monitor_raw = _raw_monitor_responses(count)
+	post_raw = _raw_post_responses(count)
+	return {
+		"monitor.sanitize_results": {**measure(
+			lambda: [monitor.validate.sanitize_results(r, "image.png", timestamp, "model") for r in monitor_raw], repeat
+		), "n": count},
+		"post.sanitize_results": {**measure(
+			lambda: [post.validate.sanitize_results(r, timestamp, "model") for r in post_raw], repeat
+		), "n": count},
+	}
+
+def bench_count_tokens(repeat: int) -> Dict[str, Dict]:
+	"""Token counting on the real system prompts plus a realistic post agent prompt."""
+	from common.tokens import get_encoder, count_tokens, count_static_tokens, approx_tokens
+	from monitor.prompts import MONITOR_SYSTEM_PROMPT
+	from post.prompts import ANALYZE_CONTEXT_PROMPT
+
+	if get_encoder() is None:
+		raise ImportError("tiktoken encoding unavailable")
+	context = _load_context(_context_file(1000))
+	notes_path = generate_notes(os.path.join(DATA_DIR, "notes.txt"))
+	with open(notes_path) as f:
+		notes = f.read()
+	post_prompt = ANALYZE_CONTEXT_PROMPT + context._context_to_string(context._get_context()) + notes
+	return {
+		"count_tokens.monitor_prompt": {**measure(lambda: count_tokens(MONITOR_SYSTEM_PROMPT), repeat * 20), "n": len(MONITOR_SYSTEM_PROMPT)},
+		"count_tokens.monitor_prompt_static": {**measure(lambda: count_static_tokens(MONITOR_SYSTEM_PROMPT), repeat * 20), "n": len(MONITOR_SYSTEM_PROMPT)},
+		"count_tokens.post_prompt": {**measure(lambda: count_tokens(post_prompt), repeat * 20), "n": len(post_prompt)},
+		"count_tokens.post_prompt_approx": {**measure(lambda: approx_tokens(post_prompt), repeat * 20), "n": len(post_prompt)},
+	}
+
+def bench_encode_image(repeat: int) -> Dict[str, Dict]:
+	"""ImageAnalyzer._encode_image on a full-size screenshot."""
+	from monitor.llm import ImageAnalyzer
+	path = os.path.join(DATA_DIR, "screenshot_1920x1200.png")
+	if not os.path.exists(path):
+		generate_screenshot(path)
+	analyzer = ImageAnalyzer.__new__(ImageAnalyzer) # Skip API key and encoder setup
+	return {"image.encode_image": {**measure(lambda: analyzer._encode_image(path), repeat), "n": os.path.getsize(path)}}
+
+def bench_relative_time(repeat: int) -> Dict[str, Dict]:
+	"""get_relative_time over a spread of time differences."""
+	from post.utils import get_relative_time
+	now = ANCHOR_TIME.timestamp()
+	past = [now - offset for offset in range(0, 100000, 7)]
+	return {"utils.get_relative_time": {**measure(lambda: [get_relative_time(now, p) for p in past], repeat), "n": len(past)}}
+
+CAPTURE_PORT = 8765
+CAPTURE_INTERVAL = 0.5 # secs between captures while measuring CPU
+
+def bench_capture(repeat: int) -> Dict[str, Dict]:
+	"""TwitchCapture.capture_screenshot latency and browser CPU for each capture backend.
+
+	Serves the real embed page, so the numbers include decoding the live stream.
+	"""
+	from monitor.server import Server
+	from monitor.capture import TwitchCapture, CAPTURE_BACKENDS
+	from monitor.watchdog import process_tree_cpu
+
+	server = Server(port=CAPTURE_PORT, directory="monitor/stream")
+	server.start()
+	images_dir = os.path.join(DATA_DIR, "captures")
+	results = {}
+	try:
+		for backend in CAPTURE_BACKENDS:
+			capture = TwitchCapture(server_port=CAPTURE_PORT, images_dir=images_dir, backend=backend)
+			try:
+				capture.init()
+				for screencast in capture.screencasts.values():
+					screencast.ready.wait(30)
+				captures = repeat * 4
+
+				def capture_once():
+					os.remove(capture.capture_screenshot())
+				results[f"capture.{backend}.latency"] = {**measure(capture_once, captures), "n": captures}
+
+				# CPU of this process and the whole browser tree while capturing at a steady rate
+				pid = capture.driver.service.process.pid
+				start_cpu = process_tree_cpu(pid) + time.process_time()
+				start = time.perf_counter()
+				for _ in range(captures):
+					capture_once()
+					time.sleep(CAPTURE_INTERVAL)
+				elapsed = time.perf_counter() - start
+				cpu = process_tree_cpu(pid) + time.process_time() - start_cpu
+				# Stored in the timing fields so it is compared against baselines like the rest
+				results[f"capture.{backend}.cpu_per_sec"] = {"median": cpu / elapsed, "min": cpu / elapsed, "mean": cpu / elapsed, "repeat": 1, "n": captures}
+			finally:
+				capture.cleanup()
+	finally:
+		server.stop()
+	return results
+
+#-------------------------------------------------------------------
+# Results
+#-------------------------------------------------------------------
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> int:
+	"""Print a comparison against the baseline and return the number of regressions."""
+	regressions = 0
+	print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+	for name, result in sorted(results.items()):
+		if name not in baseline:
+			print(f"{name:<40} {'-':>12} {result['min'] * 1000:>10.3f}ms {'new':>9}")
+			continue
+		# Compare best-of-N timings, they are far less noisy than medians for micro-benchmarks
+		before = baseline[name]["min"]
+		change = (result["min"] - before) / before if before else 0.0
+		flag = ""
+		if change > threshold:
+			regressions += 1
+			flag = "  REGRESSION"
+		print(f"{name:<40} {before * 1000:>10.3f}ms {result['min'] * 1000:>10.3f}ms {change:>+8.1%}{flag}")
+	return regressions
+
+def main(argv: Optional[list] = None) -> int:
+	parser = argparse.ArgumentParser(description="Run micro-benchmarks for the agents' hot paths")
+	parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated context.jsonl line counts")
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--only", default="", help="Comma separated benchmark groups (context,sanitize,tokens,image,time,capture)")
+	parser.add_argument("--output", default="", help="Results JSON path (default: benchmarks/results/<timestamp>.json)")
+	parser.add_argument("--baseline", default="", help="Results JSON to compare against")
+	parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown flagged as a regression")
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+	os.makedirs(DATA_DIR, exist_ok=True)
+	sizes = [int(size) for size in args.sizes.split(",") if size]
+
+	groups = {
+		"context": lambda: bench_context(sizes, args.repeat),
+		"sanitize": lambda: bench_sanitize(args.repeat),
+		"tokens": lambda: bench_count_tokens(args.repeat),
+		"image": lambda: bench_encode_image(args.repeat),
+		"time": lambda: bench_relative_time(args.repeat),
+		"capture": lambda: bench_capture(args.repeat),
+	}
+	# Capture benchmarks start Chrome and need the network, they only run when asked for
+	selected = [group for group in args.only.split(",") if group] or [group for group in groups if group != "capture"]
+
+	results = {}
+	for group in selected:
+		try:
+			logger.info(f"Running {group} benchmarks")
+			results.update(groups[group]())
+		except ImportError as e:
+			logger.warning(f"Skipping {group} benchmarks, missing dependency: {e}")
+		except Exception as e:
+			if group != "capture":
+				raise
+			logger.warning(f"Skipping capture benchmarks, could not start Chrome: {e}")
+
+	for name, result in sorted(results.items()):
+		print(f"{name:<40} median {result['median'] * 1000:>10.3f}ms  min {result['min'] * 1000:>10.3f}ms  (n={result['n']})")
+
+	output = args.output or os.path.join(RESULTS_DIR, datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S_UTC") + ".json")
+	Path(output).parent.mkdir(parents=True, exist_ok=True)
+	with open(output, "w") as f:
+		json.dump({
+			"created": datetime.now(timezone.utc).isoformat(),
+			"python": sys.version.split()[0],
+			"platform": platform.platform(),
+			"results": results
+		}, f, indent=2)
+	logger.info(f"Results saved to {output}")
+
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)["results"]
+		regressions = compare(results, baseline, args.threshold)
+		if regressions:
+			logger.error(f"{regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+			return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,335 @@
+"""Columnar copies of the agents' logs for fast grouped queries.
+
+`compact` converts new lines of context.jsonl and posts.jsonl into NumPy
+column files (context/analytics/<table>/seg-NNNNN/<column>.npy), strings
+dictionary-encoded as int32 codes. `query` memory-maps the columns, skips
+segments outside the time range and aggregates with bincount, so questions
+over months of logs take milliseconds:
+
+	python -m common.analytics compact
+	python -m common.analytics query events --group model,day --agg sum:output_tokens,count --since 7d
+	python -m common.analytics query events --group location --agg mean:score,count --where channel=claudeplayspokemon
+	python -m common.analytics query posts --group day --agg mean:post,count --since 7d
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.entities import LOCATION_INDEX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_DIR = "context/analytics"
+SEGMENT_ROWS = 100000 # The last segment is extended until it holds this many rows
+TIME_BUCKETS = {"hour": (3600, 0), "day": (86400, 0), "week": (7 * 86400, 4 * 86400)} # (size, offset), weeks start on Monday
+AGGREGATES = ("count", "sum", "mean", "min", "max")
+
+def _usage(entry: Dict[str, Any], key: str) -> int:
+	return int((entry.get("token_usage") or {}).get(key) or 0)
+
+def _location(entry: Dict[str, Any]) -> str:
+	return LOCATION_INDEX.name(entry.get("location_id")) or entry.get("estimated_location") or ""
+
+# Table name -> (source log, {column: (dtype, or "str" for dictionary encoded, value from a log entry)})
+TABLES: Dict[str, Tuple[str, Dict[str, Tuple[str, Callable[[Dict[str, Any]], Any]]]]] = {
+	"events": ("context/monitor/context.jsonl", {
+		"channel": ("str", lambda entry: entry.get("channel") or ""),
+		"model": ("str", lambda entry: entry.get("model") or ""),
+		"location": ("str", _location),
+		"scene": ("str", lambda entry: entry.get("scene") or ""),
+		"tier": ("str", lambda entry: entry.get("tier") or ""),
+		"score": ("int16", lambda entry: entry.get("score") or 0),
+		"input_tokens": ("int32", lambda entry: _usage(entry, "input_tokens")),
+		"output_tokens": ("int32", lambda entry: _usage(entry, "output_tokens")),
+	}),
+	"posts": ("context/posts/posts.jsonl", {
+		"model": ("str", lambda entry: entry.get("model") or ""),
+		"score": ("int16", lambda entry: entry.get("score") or 0),
+		"post": ("int8", lambda entry: bool(entry.get("post"))),
+		"duplicate": ("int8", lambda entry: bool(entry.get("duplicate_of"))),
+		"input_tokens": ("int32", lambda entry: _usage(entry, "input_tokens")),
+		"output_tokens": ("int32", lambda entry: _usage(entry, "output_tokens")),
+	}),
+}
+
+class ColumnStore:
+	"""One table of append-only column segments with a manifest and shared string dictionaries."""
+	def __init__(self, name: str, root: str = DEFAULT_ANALYTICS_DIR):
+		self.name = name
+		self.source, self.columns = TABLES[name]
+		self.dir = Path(root) / name
+		self.manifest_path = self.dir / "manifest.json"
+		self.manifest = {"offset": 0, "segments": [], "dictionaries": {}}
+		if self.manifest_path.exists():
+			with open(self.manifest_path, "r") as f:
+				self.manifest = json.load(f)
+
+	def _save_manifest(self) -> None:
+		temp_path = self.manifest_path.with_suffix(".tmp")
+		with open(temp_path, "w") as f:
+			json.dump(self.manifest, f)
+		os.replace(temp_path, self.manifest_path)
+
+#-------------------------------------------------------------------
+# Compaction
+#-------------------------------------------------------------------
+	def compact(self, source: Optional[str] = None) -> int:
+		"""Append log lines written since the last compaction, return the number of new rows."""
+		source_path = Path(source or self.source)
+		if not source_path.exists():
+			return 0
+		if source_path.stat().st_size < self.manifest["offset"]:
+			logger.warning(f"{source_path} shrank, rebuilding the {self.name} table")
+			shutil.rmtree(self.dir, ignore_errors=True)
+			self.manifest = {"offset": 0, "segments": [], "dictionaries": {}}
+
+		dictionaries = self.manifest["dictionaries"]
+		lookups = {column: {value: code for code, value in enumerate(dictionaries.get(column, []))} for column in self.columns}
+		times, rows = [], {column: [] for column in self.columns}
+		offset = self.manifest["offset"]
+		with open(source_path, "rb") as f:
+			f.seek(offset)
+			for line in f:
+				if not line.endswith(b"\n"):
+					break # Partially written entry, compacted next time
+				offset += len(line)
+				try:
+					entry = json.loads(line)
+					time = datetime.fromisoformat(entry["timestamp"]).timestamp()
+					values = {column: extract(entry) for column, (_, extract) in self.columns.items()}
+				except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+					continue
+				times.append(time)
+				for column, (dtype, _) in self.columns.items():
+					value = values[column]
+					if dtype == "str":
+						lookup = lookups[column]
+						value = lookup.setdefault(str(value), len(lookup))
+					rows[column].append(value)
+
+		# The manifest (offset, dictionaries, segments) is saved in one step after the segment is written
+		self.manifest["offset"] = offset
+		self.manifest["dictionaries"] = {column: list(lookup) for column, lookup in lookups.items() if self.columns[column][0] == "str"}
+		self.dir.mkdir(parents=True, exist_ok=True)
+		if times:
+			new = {"time": np.array(times, dtype=np.float64)}
+			for column, (dtype, _) in self.columns.items():
+				new[column] = np.array(rows[column], dtype=np.int32 if dtype == "str" else dtype)
+			self._append(new)
+		else:
+			self._save_manifest()
+		return len(times)
+
+	def _append(self, new: Dict[str, np.ndarray]) -> None:
+		"""Write new rows, merged into the last segment while it is small so segments stay few."""
+		segments = self.manifest["segments"]
+		number = int(segments[-1]["name"].split("-")[1]) + 1 if segments else 0
+		if segments and segments[-1]["rows"] < SEGMENT_ROWS:
+			# Rewritten under a new name so the manifest never points at a partial segment
+			previous = self._load_segment(segments.pop()["name"], mmap=False)
+			new = {column: np.concatenate([previous[column], values]) for column, values in new.items()}
+
+		for start in range(0, len(new["time"]), SEGMENT_ROWS):
+			name = f"seg-{number:05d}"
+			segment_dir = self.dir / name
+			segment_dir.mkdir(parents=True, exist_ok=True)
+			times = new["time"][start:start + SEGMENT_ROWS]
+			for column, values in new.items():
+				np.save(segment_dir / f"{column}.npy", values[start:start + SEGMENT_ROWS])
+			segments.append({"name": name, "rows": len(times), "min_time": float(times.min()), "max_time": float(times.max())})
+			number += 1
+		self._remove_stale()
+
+	def _remove_stale(self) -> None:
+		"""Delete segment directories that are no longer in the manifest (once it is saved)."""
+		self._save_manifest()
+		live = {segment["name"] for segment in self.manifest["segments"]}
+		for path in self.dir.glob("seg-*"):
+			if path.name not in live:
+				shutil.rmtree(path, ignore_errors=True)
+
+#-------------------------------------------------------------------
+# Queries
+#-------------------------------------------------------------------
+	def _load_segment(self, name: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+		mode = "r" if mmap else None
+		return {
+			column: np.load(self.dir / name / f"{column}.npy", mmap_mode=mode)
+			for column in ("time", *self.columns)
+		}
+
+	def load(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, np.ndarray]:
+		"""Columns of the rows in [since, until), segments outside the range are not read."""
+		parts = []
+		for segment in self.manifest["segments"]:
+			if (since is not None and segment["max_time"] < since) or (until is not None and segment["min_time"] >= until):
+				continue
+			columns = self._load_segment(segment["name"])
+			mask = None # Segments entirely inside the range are used as is
+			if since is not None and segment["min_time"] < since:
+				mask = columns["time"] >= since
+			if until is not None and segment["max_time"] >= until:
+				mask = (columns["time"] < until) if mask is None else mask & (columns["time"] < until)
+			parts.append(columns if mask is None else {column: values[mask] for column, values in columns.items()})
+		if len(parts) == 1:
+			return parts[0]
+		return {
+			column: np.concatenate([part[column] for part in parts]) if parts else np.array([], dtype=np.float64 if column == "time" else np.int64)
+			for column in ("time", *self.columns)
+		}
+
+	def query(
+		self,
+		group: List[str],
+		aggregates: List[str],
+		since: Optional[float] = None,
+		until: Optional[float] = None,
+		where: Optional[Dict[str, str]] = None
+	) -> List[Dict[str, Any]]:
+		"""Grouped aggregates, e.g. group=["model", "day"], aggregates=["sum:output_tokens", "count"]."""
+		columns = self.load(since, until)
+		dictionaries = self.manifest["dictionaries"]
+
+		mask = np.ones(len(columns["time"]), dtype=bool)
+		for column, value in (where or {}).items():
+			if column not in dictionaries:
+				raise ValueError(f"Filters only apply to string columns: {', '.join(dictionaries)}")
+			codes = [code for code, known in enumerate(dictionaries[column]) if known == value]
+			mask &= np.isin(columns[column], codes)
+		columns = {column: values[mask] for column, values in columns.items()}
+		rows = len(columns["time"])
+
+		# Combine the group keys into one mixed radix code per row
+		keys, labels = [], []
+		for key in group:
+			if key in TIME_BUCKETS:
+				size, shift = TIME_BUCKETS[key]
+				values = ((columns["time"] - shift) // size).astype(np.int64)
+			elif key in dictionaries:
+				values = columns[key].astype(np.int64)
+			else:
+				raise ValueError(f"Unknown group key {key!r}, use {', '.join([*dictionaries, *TIME_BUCKETS])}")
+			low = int(values.min()) if rows else 0
+			keys.append(values - low)
+			labels.append((key, low, int(values.max()) - low + 1 if rows else 1))
+		combined = np.zeros(rows, dtype=np.int64)
+		for values, (_, _, size) in zip(keys, labels):
+			combined = combined * size + values
+		if group:
+			groups, inverse = np.unique(combined, return_inverse=True)
+		else:
+			groups, inverse = np.zeros(min(rows, 1), dtype=np.int64), combined
+		counts = np.bincount(inverse, minlength=len(groups))
+
+		results = [{} for _ in groups]
+		sizes = [size for _, _, size in labels]
+		for position, (key, low, size) in enumerate(labels):
+			codes = np.unravel_index(groups, sizes)[position] + low if sizes else []
+			for result, code in zip(results, codes):
+				if key in TIME_BUCKETS:
+					size, shift = TIME_BUCKETS[key]
+					result[key] = datetime.fromtimestamp(int(code) * size + shift, timezone.utc).strftime("%Y-%m-%d %H:00" if key == "hour" else "%Y-%m-%d")
+				else:
+					result[key] = dictionaries[key][int(code)]
+
+		for aggregate in aggregates:
+			function, _, column = aggregate.partition(":")
+			if function not in AGGREGATES or (function != "count" and column not in self.columns):
+				raise ValueError(f"Unknown aggregate {aggregate!r}, use count or {'|'.join(AGGREGATES[1:])}:<column>")
+			if function == "count":
+				values = counts
+			else:
+				data = columns[column].astype(np.float64)
+				if function == "sum":
+					values = np.bincount(inverse, weights=data, minlength=len(groups))
+				elif function == "mean":
+					values = np.bincount(inverse, weights=data, minlength=len(groups)) / np.maximum(counts, 1)
+				elif rows:
+					# Rows sorted by group, then reduced over each group's run
+					order = np.argsort(inverse, kind="stable")
+					starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+					values = (np.minimum if function == "min" else np.maximum).reduceat(data[order], starts)
+				else:
+					values = []
+			for result, value in zip(results, values):
+				result[aggregate] = round(float(value), 3) if function == "mean" else int(value) if float(value).is_integer() else float(value)
+		return sorted(results, key=lambda result: [result[key] for key in group])
+
+def parse_time(value: str) -> Optional[float]:
+	"""Parse an ISO date/time or a relative time such as 7d, 12h or 30m ago."""
+	if not value:
+		return None
+	match = re.fullmatch(r"(\d+(?:\.\d+)?)([mhdw])", value.strip())
+	if match:
+		unit = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}[match.group(2)]
+		return (datetime.now(timezone.utc) - timedelta(**{unit: float(match.group(1))})).timestamp()
+	parsed = datetime.fromisoformat(value)
+	if parsed.tzinfo is None:
+		parsed = parsed.replace(tzinfo=timezone.utc)
+	return parsed.timestamp()
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+	if not results:
+		print("No rows")
+		return
+	headers = list(results[0])
+	widths = [max(len(header), *(len(str(result[header])) for result in results)) for header in headers]
+	print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+	for result in results:
+		print("  ".join(str(result[header]).ljust(width) for header, width in zip(headers, widths)))
+
+def main(argv: Optional[list] = None) -> int:
+	parser = argparse.ArgumentParser(description="Compact the agents' logs into columns and query them")
+	parser.add_argument("--dir", default=DEFAULT_ANALYTICS_DIR, help="Column store directory")
+	commands = parser.add_subparsers(dest="command", required=True)
+	compact = commands.add_parser("compact", help="Append new log lines to the column store")
+	compact.add_argument("tables", nargs="*", default=list(TABLES), help=f"Tables to compact ({', '.join(TABLES)})")
+	query = commands.add_parser("query", help="Grouped aggregates over a time range")
+	query.add_argument("table", choices=list(TABLES))
+	query.add_argument("--group", default="", help="Comma separated string columns or time buckets (hour, day, week)")
+	query.add_argument("--agg", default="count", help="Comma separated aggregates: count, sum:<column>, mean:<column>, min:<column>, max:<column>")
+	query.add_argument("--since", default="", help="ISO time or relative (7d, 12h)")
+	query.add_argument("--until", default="", help="ISO time or relative (7d, 12h)")
+	query.add_argument("--where", action="append", default=[], help="column=value filter, may be repeated")
+	query.add_argument("--json", action="store_true", help="Print rows as JSON")
+	query.add_argument("--no-compact", action="store_true", help="Query without compacting new log lines first")
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.INFO, format="%(message)s")
+	if args.command == "compact":
+		for table in args.tables:
+			added = ColumnStore(table, args.dir).compact()
+			logger.info(f"{table}: {added} new rows")
+		return 0
+
+	store = ColumnStore(args.table, args.dir)
+	if not args.no_compact:
+		store.compact()
+	try:
+		results = store.query(
+			group=[key for key in args.group.split(",") if key],
+			aggregates=[aggregate for aggregate in args.agg.split(",") if aggregate],
+			since=parse_time(args.since),
+			until=parse_time(args.until),
+			where=dict(condition.split("=", 1) for condition in args.where)
+		)
+	except ValueError as e:
+		logger.error(e)
+		return 1
+	if args.json:
+		print(json.dumps(results, indent=2))
+	else:
+		print_table(results)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import glob
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_DIR = "context/budget"
+LEDGER_RETENTION_DAYS = 14
+BURN_WINDOW = 3600 # secs of recent spend used to project the burn rate
+MIN_OBSERVATION = 300 # secs of spend history needed before intervals are adjusted
+REPORT_INTERVAL = 3600 # secs between per-model usage summaries in the logs
+DEFAULT_MIN_SCALE = 0.5 # Intervals are never shortened below half the configured value
+DEFAULT_MAX_SCALE = 8.0
+
+# USD per million input/output tokens, MODEL_PRICES overrides these
+DEFAULT_PRICES = {
+	"google/gemini-2.0-flash-lite-preview-02-05:free": (0.0, 0.0),
+	"google/gemini-2.0-flash-lite-001": (0.075, 0.30),
+	"google/gemini-2.0-flash-001": (0.10, 0.40),
+}
+
+def parse_prices(value: str) -> Dict[str, Tuple[float, float]]:
+	"""Parse "model=input/output;..." prices in USD per million tokens."""
+	prices = {}
+	for item in (value or "").split(";"):
+		if not item.strip():
+			continue
+		try:
+			model, price = item.rsplit("=", 1)
+			input_price, output_price = price.split("/")
+			prices[model.strip()] = (float(input_price), float(output_price))
+		except ValueError:
+			logger.warning(f"Ignoring invalid model price {item!r}")
+	return prices
+
+class BudgetGovernor:
+	"""Tracks daily token spend across both agents and scales loop intervals to fit the budget.
+
+	Every fresh API response is appended to a per-day ledger in context/budget
+	that both agents share. Each agent projects the recent burn rate over the rest
+	of the UTC day and stretches or shrinks its own interval so the projected spend
+	lands on the remaining budget. A daily budget of 0 only records usage.
+	"""
+	def __init__(
+		self,
+		name: str,
+		daily_budget: float = 0.0,
+		prices: Optional[Dict[str, Tuple[float, float]]] = None,
+		ledger_dir: str = DEFAULT_LEDGER_DIR,
+		min_scale: float = DEFAULT_MIN_SCALE,
+		max_scale: float = DEFAULT_MAX_SCALE
+	):
+		self.name = name
+		self.daily_budget = daily_budget
+		self.prices = {**DEFAULT_PRICES, **(prices or {})}
+		self.ledger_dir = ledger_dir
+		self.min_scale = min_scale
+		self.max_scale = max_scale
+		self.started_at = time.time()
+
+		self.scale = 1.0
+		self.scales = deque([(self.started_at, 1.0)]) # (time, scale) changes, for the scale in effect over the burn window
+		self.day = None
+		self.offset = 0 # Bytes of today's ledger already read
+		self.spent = 0.0
+		self.by_model: Dict[str, Dict[str, float]] = {}
+		self.recent = deque() # (time, cost) within the burn window
+		self.last_report = time.time()
+		self.lock = threading.Lock()
+		os.makedirs(self.ledger_dir, exist_ok=True)
+
+	def ledger_path(self, day: str) -> str:
+		return os.path.join(self.ledger_dir, f"usage-{day}.jsonl")
+
+	def cost(self, model: str, usage: Dict[str, int]) -> float:
+		"""Cost in USD of a response's token usage."""
+		input_price, output_price = self.prices.get(model, (0.0, 0.0))
+		return (usage["input_tokens"] * input_price + usage["output_tokens"] * output_price) / 1_000_000
+
+	def record(self, model: str, usage: Dict[str, int]) -> None:
+		"""Append a response's token usage to today's ledger."""
+		now = time.time()
+		entry = {
+			"time": now,
+			"agent": self.name,
+			"model": model,
+			"input_tokens": usage["input_tokens"],
+			"output_tokens": usage["output_tokens"],
+			"cost": self.cost(model, usage)
+		}
+		day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+		try:
+			# Single line appends are atomic enough to share the ledger between processes
+			with open(self.ledger_path(day), "a") as f:
+				f.write(json.dumps(entry) + "\n")
+		except Exception as e:
+			logger.error(f"Error recording token usage: {e}")
+
+	def refresh(self) -> None:
+		"""Read ledger entries written since the last refresh, starting over each UTC day."""
+		now = time.time()
+		day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+		if day != self.day:
+			self.day = day
+			self.offset = 0
+			self.spent = 0.0
+			self.by_model = {}
+			self.recent.clear()
+			self.prune()
+
+		path = self.ledger_path(day)
+		if os.path.exists(path):
+			try:
+				with open(path, "r") as f:
+					f.seek(self.offset)
+					for line in f:
+						if not line.endswith("\n"):
+							break # Partially written entry, read it next time
+						self.offset += len(line.encode())
+						try:
+							entry = json.loads(line)
+						except json.JSONDecodeError:
+							continue
+						self.spent += entry["cost"]
+						totals = self.by_model.setdefault(
+							entry["model"],
+							{"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+						)
+						totals["requests"] += 1
+						totals["input_tokens"] += entry["input_tokens"]
+						totals["output_tokens"] += entry["output_tokens"]
+						totals["cost"] += entry["cost"]
+						self.recent.append((entry["time"], entry["cost"]))
+			except Exception as e:
+				logger.error(f"Error reading usage ledger: {e}")
+
+		while self.recent and self.recent[0][0] < now - BURN_WINDOW:
+			self.recent.popleft()
+
+	def prune(self) -> None:
+		"""Delete ledgers older than the retention period."""
+		cutoff = (datetime.now(timezone.utc) - timedelta(days=LEDGER_RETENTION_DAYS)).strftime("%Y-%m-%d")
+		for path in glob.glob(os.path.join(self.ledger_dir, "usage-*.jsonl")):
+			if os.path.basename(path)[len("usage-"):-len(".jsonl")] < cutoff:
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+
+	def interval(self, base_secs: float) -> float:
+		"""Return the loop interval to use next, base_secs scaled to land on the daily budget."""
+		with self.lock:
+			self.refresh()
+			now = datetime.now(timezone.utc)
+			day_start = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+			remaining_secs = day_start + 86400 - now.timestamp()
+			remaining_budget = self.daily_budget - self.spent
+
+			# Only observe spend made while this agent was running and within today, the ledger
+			# also holds spend from before a restart that this agent's scale had no part in
+			window_start = max(day_start, self.started_at, now.timestamp() - BURN_WINDOW)
+			span = now.timestamp() - window_start
+			burn_rate = sum(cost for time_, cost in self.recent if time_ >= window_start) / span if span > 0 else 0.0
+			projected = burn_rate * remaining_secs
+
+			previous = self.scale
+			if self.daily_budget > 0 and span >= MIN_OBSERVATION:
+				if remaining_budget <= 0:
+					self.scale = self.max_scale
+				elif projected <= 0:
+					self.scale = self.min_scale
+				else:
+					# Burn is inversely proportional to the interval, so the burn at the unscaled
+					# interval is the observed burn times the scale in effect while it was observed.
+					# The target is computed afresh on every call rather than compounded, so
+					# repeated calls within one burn window cannot push the scale to its bounds.
+					base_projected = projected * self._average_scale(now.timestamp() - span, now.timestamp())
+					self.scale = base_projected / remaining_budget
+				self.scale = min(self.max_scale, max(self.min_scale, self.scale))
+			if self.scale != previous:
+				self.scales.append((now.timestamp(), self.scale))
+
+			if abs(self.scale - previous) / previous >= 0.1:
+				logger.info(
+					f"Budget: ${self.spent:.4f} of ${self.daily_budget:.2f} spent, "
+					f"projected ${projected:.4f} for the rest of the day, "
+					f"interval scaled {previous:.2f}x -> {self.scale:.2f}x"
+				)
+				metrics.emit(
+					"budget",
+					agent=self.name,
+					spent=round(self.spent, 6),
+					daily_budget=self.daily_budget,
+					burn_rate_per_hour=round(burn_rate * 3600, 6),
+					projected=round(projected, 6),
+					scale=round(self.scale, 3),
+					interval=round(base_secs * self.scale, 1)
+				)
+			self.report()
+			return base_secs * self.scale
+
+	def _average_scale(self, start: float, end: float) -> float:
+		"""Time-weighted average of the scale applied between start and end."""
+		while len(self.scales) > 1 and self.scales[1][0] <= start:
+			self.scales.popleft() # Changes before the window only matter through the one in effect at its start
+		total = 0.0
+		for i, (since, scale) in enumerate(self.scales):
+			until = self.scales[i + 1][0] if i + 1 < len(self.scales) else end
+			total += scale * max(0.0, min(until, end) - max(since, start))
+		return total / (end - start) if end > start else self.scale
+
+	def report(self) -> None:
+		"""Log today's per-model usage every REPORT_INTERVAL."""
+		if time.time() - self.last_report < REPORT_INTERVAL:
+			return
+		self.last_report = time.time()
+		for model, totals in sorted(self.by_model.items()):
+			logger.info(
+				f"Usage today {model}: {totals['requests']} requests, "
+				f"{totals['input_tokens']} input / {totals['output_tokens']} output tokens, ${totals['cost']:.4f}"
+			)
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .metrics import emit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 60 * 60 # secs
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+REPORT_EVERY = 50 # Log cache statistics every N lookups
+
+def with_cache_hints(messages: List[Dict]) -> List[Dict]:
+	"""Mark the static system prompt as a cacheable prefix for providers that support prompt caching."""
+	hinted = []
+	for message in messages:
+		if message.get("role") == "system" and isinstance(message.get("content"), str):
+			message = {
+				**message,
+				"content": [{
+					"type": "text",
+					"text": message["content"],
+					"cache_control": {"type": "ephemeral"}
+				}]
+			}
+		hinted.append(message)
+	return hinted
+
+class ResponseCache:
+	"""On-disk LRU cache of chat completion responses keyed by a hash of the request payload.
+
+	Entries expire after ttl seconds and the least recently used ones are evicted
+	once the cache grows past max_bytes. The index lives in memory and is rebuilt
+	from file mtimes at startup.
+	"""
+	def __init__(self, cache_dir: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+		self.cache_dir = Path(cache_dir)
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+		self.ttl = ttl
+		self.max_bytes = max_bytes
+		self.index: "OrderedDict[str, tuple]" = OrderedDict() # key -> (created, size), least recently used first
+		self.size = 0
+		self.lock = threading.Lock()
+
+		# Statistics
+		self.hits = 0
+		self.misses = 0
+		self.saved_tokens = 0 # Prompt and completion tokens served from the local cache
+		self.provider_cached_tokens = 0 # Prompt tokens the provider served from its prompt cache
+		self.prompt_tokens = 0
+
+		self._load()
+
+	def _load(self) -> None:
+		"""Rebuild the LRU index from the files on disk."""
+		entries = []
+		for path in self.cache_dir.glob("*.json"):
+			stat = path.stat()
+			entries.append((stat.st_mtime, path.stem, stat.st_size))
+		for mtime, key, size in sorted(entries):
+			self.index[key] = (mtime, size)
+			self.size += size
+		logger.info(f"Response cache loaded {len(self.index)} entries ({self.size / 1024 / 1024:.1f} MiB) from {self.cache_dir}")
+
+	@staticmethod
+	def key(payload: Dict[str, Any]) -> str:
+		"""Return the cache key for a request payload (model, messages and options)."""
+		return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+	def get(self, key: str) -> Optional[Dict[str, Any]]:
+		"""Return a cached response or None on a miss."""
+		with self.lock:
+			entry = self.index.get(key)
+			path = self.cache_dir / f"{key}.json"
+			if entry is not None and time.time() - entry[0] > self.ttl:
+				self._remove(key)
+				entry = None
+			if entry is None:
+				self.misses += 1
+				self._maybe_report()
+				return None
+			try:
+				with open(path, "r") as f:
+					response = json.load(f)
+			except Exception as e:
+				logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+				self._remove(key)
+				self.misses += 1
+				return None
+			self.index.move_to_end(key)
+			self.hits += 1
+			usage = response.get("usage") or {}
+			self.saved_tokens += int(usage.get("total_tokens") or 0)
+			self._maybe_report()
+			return response
+
+	def put(self, key: str, response: Dict[str, Any]) -> None:
+		"""Store a response and evict expired and least recently used entries."""
+		data = json.dumps(response)
+		path = self.cache_dir / f"{key}.json"
+		with self.lock:
+			try:
+				tmp_path = path.with_suffix(".tmp")
+				with open(tmp_path, "w") as f:
+					f.write(data)
+				os.replace(tmp_path, path)
+			except Exception as e:
+				logger.warning(f"Error writing cache entry {path}: {e}")
+				return
+			if key in self.index:
+				self.size -= self.index.pop(key)[1]
+			self.index[key] = (time.time(), len(data))
+			self.size += len(data)
+			self._evict()
+
+	def record_usage(self, response: Dict[str, Any]) -> None:
+		"""Track provider-side prompt caching from a fresh response's usage."""
+		usage = response.get("usage") or {}
+		details = usage.get("prompt_tokens_details") or {}
+		with self.lock:
+			self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+			self.provider_cached_tokens += int(details.get("cached_tokens") or 0)
+
+	def _evict(self) -> None:
+		"""Drop expired entries from the front, then least recently used ones until under max_bytes."""
+		now = time.time()
+		while self.index:
+			key, (created, _) = next(iter(self.index.items()))
+			if self.size <= self.max_bytes and now - created <= self.ttl:
+				break
+			self._remove(key)
+
+	def _remove(self, key: str) -> None:
+		entry = self.index.pop(key, None)
+		if entry is not None:
+			self.size -= entry[1]
+		(self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+
+	def stats(self) -> Dict[str, Any]:
+		lookups = self.hits + self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+			"saved_tokens": self.saved_tokens,
+			"provider_cached_tokens": self.provider_cached_tokens,
+			"provider_cached_ratio": round(self.provider_cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+			"entries": len(self.index),
+			"bytes": self.size
+		}
+
+	def _maybe_report(self) -> None:
+		"""Log and emit cache statistics every REPORT_EVERY lookups."""
+		if (self.hits + self.misses) % REPORT_EVERY:
+			return
+		stats = self.stats()
+		logger.info(
+			f"Response cache: {stats['hit_rate']:.1%} hit rate ({stats['hits']}/{stats['hits'] + stats['misses']}), "
+			f"{stats['saved_tokens']} tokens saved locally, {stats['provider_cached_tokens']} prompt tokens cached by provider"
+		)
+		emit("response_cache", cache=self.cache_dir.name, **stats)
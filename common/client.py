@@ -0,0 +1,98 @@
+import logging
+import requests
+from typing import Any, Dict, Optional, Tuple
+
+from .budget import BudgetGovernor
+from .cache import ResponseCache, with_cache_hints
+from .ratelimit import RateLimiter, PRIORITY_NORMAL
+from .tokens import approx_tokens, usage_from_response
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+IMAGE_TOKENS = 1000 # Rough input token cost of one screenshot, used for rate limit estimates
+OUTPUT_TOKENS = 500 # Expected completion size, used for rate limit estimates
+
+def estimate_tokens(payload: Dict[str, Any]) -> int:
+	"""Cheaply estimate the total tokens a request will use for rate limiting."""
+	tokens = OUTPUT_TOKENS
+	for message in payload["messages"]:
+		content = message.get("content")
+		parts = [{"type": "text", "text": content}] if isinstance(content, str) else content or []
+		for part in parts:
+			tokens += approx_tokens(part["text"]) if part.get("type") == "text" else IMAGE_TOKENS
+	return tokens
+
+class ChatClient:
+	"""Sends chat completions to OpenRouter, shared by the monitor and post analyzers.
+
+	Optionally marks static system prompts for provider prompt caching, serves
+	repeated payloads from a local response cache, acquires capacity from the
+	rate limiter shared with the other agent and records spend for the budget governor.
+	"""
+	def __init__(
+		self,
+		api_key: str,
+		api_url: str = OPENROUTER_API_URL,
+		response_cache: Optional[ResponseCache] = None,
+		prompt_cache: bool = False,
+		rate_limiter: Optional[RateLimiter] = None,
+		budget: Optional[BudgetGovernor] = None
+	):
+		self.api_key = api_key
+		self.api_url = api_url
+		self.response_cache = response_cache
+		self.prompt_cache = prompt_cache
+		self.rate_limiter = rate_limiter
+		self.budget = budget
+
+	def send(self, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL) -> Tuple[int, Dict[str, Any], Optional[str]]:
+		"""Send a chat completion request.
+
+		Returns (status code, response json, cache key). Fresh responses come with a
+		cache key, pass it to remember() once the response has been validated.
+		Cached responses are marked `cached` and report zero usage.
+		A 429 is returned without calling the API if the rate limiter times out.
+		"""
+		if self.prompt_cache:
+			payload = {**payload, "messages": with_cache_hints(payload["messages"])}
+
+		key = None
+		if self.response_cache:
+			key = self.response_cache.key(payload)
+			cached = self.response_cache.get(key)
+			if cached is not None:
+				logger.info(f"Serving response from cache (model: {payload['model']})")
+				# Nothing was spent, zero the usage so it is not counted again downstream
+				usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+				return 200, {**cached, "usage": usage, "cached": True}, None
+
+		model = payload["model"]
+		estimate = estimate_tokens(payload)
+		if self.rate_limiter and not self.rate_limiter.acquire(model, estimate, priority):
+			return 429, {}, None
+
+		headers = {
+			"Authorization": f"Bearer {self.api_key}",
+			"Content-Type": "application/json"
+		}
+		response = requests.post(self.api_url, json=payload, headers=headers)
+		if response.status_code != 200:
+			if response.status_code == 429 and self.rate_limiter:
+				self.rate_limiter.penalize(model)
+			return response.status_code, {}, None
+
+		data = response.json()
+		usage = usage_from_response(data)
+		if self.rate_limiter and usage:
+			self.rate_limiter.adjust(model, usage["total_tokens"] - estimate) # Settle the estimate with real usage
+		if self.budget and usage:
+			self.budget.record(model, usage)
+		if self.response_cache:
+			self.response_cache.record_usage(data)
+		return 200, data, key
+
+	def remember(self, key: Optional[str], data: Dict[str, Any]) -> None:
+		"""Store a validated response in the local cache."""
+		if key and self.response_cache:
+			self.response_cache.put(key, data)
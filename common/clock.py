@@ -0,0 +1,21 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+class Clock:
+	"""Wall clock used by the agents' loops, replaced by a VirtualClock in replays."""
+	def now(self) -> datetime:
+		return datetime.now(timezone.utc)
+
+	def sleep(self, secs: float) -> None:
+		time.sleep(secs)
+
+class VirtualClock(Clock):
+	"""Simulated clock that starts at a given time and only moves when slept on."""
+	def __init__(self, start: datetime):
+		self.current = start
+
+	def now(self) -> datetime:
+		return self.current
+
+	def sleep(self, secs: float) -> None:
+		self.current += timedelta(seconds=secs)
@@ -0,0 +1,204 @@
+import re
+import logging
+import unicodedata
+from functools import lru_cache
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FUZZY_THRESHOLD = 0.7 # Minimum trigram similarity for a fuzzy match of the whole text
+WINDOW_THRESHOLD = 0.75 # Minimum similarity for a fuzzy match of a few words inside longer text
+FUZZY_MARGIN = 0.1 # A fuzzy match must beat the closest other entity by this much
+GENERIC = "" # Id of generic places, they are recognized so they never fuzzy match a real entity
+UNKNOWN = {"unknown", "none", "n a", "unclear", "not visible"}
+MAX_ALIAS_WORDS = 4 # Longest alias, in words, looked up by exact match
+CACHE_SIZE = 4096
+
+# Gen 1 species in Pokedex order, the species id is the Pokedex number
+SPECIES = (
+	"Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard", "Squirtle", "Wartortle",
+	"Blastoise", "Caterpie", "Metapod", "Butterfree", "Weedle", "Kakuna", "Beedrill", "Pidgey",
+	"Pidgeotto", "Pidgeot", "Rattata", "Raticate", "Spearow", "Fearow", "Ekans", "Arbok",
+	"Pikachu", "Raichu", "Sandshrew", "Sandslash", "Nidoran F", "Nidorina", "Nidoqueen", "Nidoran M",
+	"Nidorino", "Nidoking", "Clefairy", "Clefable", "Vulpix", "Ninetales", "Jigglypuff", "Wigglytuff",
+	"Zubat", "Golbat", "Oddish", "Gloom", "Vileplume", "Paras", "Parasect", "Venonat",
+	"Venomoth", "Diglett", "Dugtrio", "Meowth", "Persian", "Psyduck", "Golduck", "Mankey",
+	"Primeape", "Growlithe", "Arcanine", "Poliwag", "Poliwhirl", "Poliwrath", "Abra", "Kadabra",
+	"Alakazam", "Machop", "Machoke", "Machamp", "Bellsprout", "Weepinbell", "Victreebel", "Tentacool",
+	"Tentacruel", "Geodude", "Graveler", "Golem", "Ponyta", "Rapidash", "Slowpoke", "Slowbro",
+	"Magnemite", "Magneton", "Farfetch'd", "Doduo", "Dodrio", "Seel", "Dewgong", "Grimer",
+	"Muk", "Shellder", "Cloyster", "Gastly", "Haunter", "Gengar", "Onix", "Drowzee",
+	"Hypno", "Krabby", "Kingler", "Voltorb", "Electrode", "Exeggcute", "Exeggutor", "Cubone",
+	"Marowak", "Hitmonlee", "Hitmonchan", "Lickitung", "Koffing", "Weezing", "Rhyhorn", "Rhydon",
+	"Chansey", "Tangela", "Kangaskhan", "Horsea", "Seadra", "Goldeen", "Seaking", "Staryu",
+	"Starmie", "Mr. Mime", "Scyther", "Jynx", "Electabuzz", "Magmar", "Pinsir", "Tauros",
+	"Magikarp", "Gyarados", "Lapras", "Ditto", "Eevee", "Vaporeon", "Jolteon", "Flareon",
+	"Porygon", "Omanyte", "Omastar", "Kabuto", "Kabutops", "Aerodactyl", "Snorlax", "Articuno",
+	"Zapdos", "Moltres", "Dratini", "Dragonair", "Dragonite", "Mewtwo", "Mew",
+)
+SPECIES_ALIASES = {
+	29: ("Nidoran female", "Nidoran♀"),
+	32: ("Nidoran male", "Nidoran♂"),
+	83: ("Farfetchd",),
+	122: ("Mr Mime", "MrMime"),
+}
+
+# Kanto locations as (id, canonical name, aliases). Buildings inside a town resolve to the town.
+LOCATIONS = (
+	[
+		("pallet-town", "Pallet Town", ("Pallet", "Oak's Lab", "Professor Oak's Lab")),
+		("viridian-city", "Viridian City", ("Viridian", "Viridian Gym")),
+		("pewter-city", "Pewter City", ("Pewter", "Pewter Gym", "Pewter Museum")),
+		("cerulean-city", "Cerulean City", ("Cerulean", "Cerulean Gym")),
+		("vermilion-city", "Vermilion City", ("Vermilion", "Vermillion City", "Vermilion Gym", "Pokemon Fan Club")),
+		("lavender-town", "Lavender Town", ("Lavender",)),
+		("celadon-city", "Celadon City", ("Celadon", "Celadon Gym", "Celadon Department Store", "Game Corner")),
+		("fuchsia-city", "Fuchsia City", ("Fuchsia", "Fuchsia Gym")),
+		("saffron-city", "Saffron City", ("Saffron", "Saffron Gym", "Fighting Dojo")),
+		("cinnabar-island", "Cinnabar Island", ("Cinnabar", "Cinnabar Gym")),
+		("indigo-plateau", "Indigo Plateau", ("Pokemon League", "Elite Four")),
+		("viridian-forest", "Viridian Forest", ()),
+		("mt-moon", "Mt. Moon", ("Mount Moon",)),
+		("rock-tunnel", "Rock Tunnel", ()),
+		("pokemon-tower", "Pokemon Tower", ("Pokémon Tower", "Lavender Tower")),
+		("underground-path", "Underground Path", ("Underground Passage",)),
+		("digletts-cave", "Diglett's Cave", ("Digletts Cave", "Diglett Cave")),
+		("ss-anne", "S.S. Anne", ("SS Anne", "S S Anne")),
+		("rocket-hideout", "Rocket Hideout", ("Team Rocket Hideout",)),
+		("silph-co", "Silph Co.", ("Silph Company", "Silph")),
+		("safari-zone", "Safari Zone", ()),
+		("power-plant", "Power Plant", ()),
+		("seafoam-islands", "Seafoam Islands", ("Seafoam",)),
+		("pokemon-mansion", "Pokemon Mansion", ("Pokémon Mansion", "Cinnabar Mansion")),
+		("victory-road", "Victory Road", ()),
+		("cerulean-cave", "Cerulean Cave", ()),
+	]
+	+ [(f"route-{number}", f"Route {number}", (f"Rt {number}",)) for number in range(1, 26)]
+)
+# Places found in every town, on their own they say nothing about where the player is
+GENERIC_LOCATIONS = (
+	"Pokemon Center", "Pokémon Center", "Poke Center", "Pokecenter", "Poke Mart", "Pokemart", "Mart",
+	"Gym", "House", "Building", "Lab", "Cave", "Forest", "Tower", "Route", "Town", "City", "Island",
+	"Indoors", "Inside a building", "Overworld", "Battle", "Menu",
+)
+
+def normalize(text: str) -> str:
+	"""Lowercase, strip accents and punctuation, collapse whitespace and expand common abbreviations."""
+	text = text.replace("♀", " female").replace("♂", " male")
+	text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+	text = re.sub(r"[^a-z0-9]+", " ", text.lower().replace("'", ""))
+	text = re.sub(r"\bmount\b", "mt", text)
+	text = re.sub(r"\b(rt|rte)\b", "route", text)
+	text = re.sub(r"\broute(\d+)\b", r"route \1", text)
+	return " ".join(text.split())
+
+def trigrams(text: str) -> Set[str]:
+	padded = f"  {text} "
+	return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class EntityIndex:
+	"""Exact and fuzzy lookup of free text against a fixed set of named entities.
+
+	The whole text is matched against the aliases exactly, then by trigram
+	similarity through an inverted trigram index. Longer text is then matched
+	exactly on word windows, earliest mention wins, so "Route 3 - near Mt. Moon"
+	resolves to Route 3, and finally fuzzily on short windows. Fuzzy matches need
+	a clear margin over the next entity, generic places such as "Pokemon Center"
+	resolve to None. Results are memoized since the vision model repeats the same
+	strings constantly.
+	"""
+	def __init__(self, entities: Iterable[Tuple[object, str, Iterable[str]]], generic: Iterable[str] = ()):
+		self.names: Dict[object, str] = {}
+		self.aliases: Dict[str, object] = {}
+		self.postings: Dict[str, List[str]] = defaultdict(list) # trigram -> aliases containing it
+		self.grams: Dict[str, Set[str]] = {}
+		for entity_id, name, aliases in [*entities, (GENERIC, None, tuple(generic))]:
+			if name:
+				self.names[entity_id] = name
+			for alias in (name, *aliases) if name else aliases:
+				key = normalize(alias)
+				if key and key not in self.aliases:
+					self.aliases[key] = entity_id
+					self.grams[key] = trigrams(key)
+					for gram in self.grams[key]:
+						self.postings[gram].append(key)
+		self.match = lru_cache(maxsize=CACHE_SIZE)(self._match)
+
+	def name(self, entity_id) -> Optional[str]:
+		return self.names.get(entity_id)
+
+	def generic(self, text: str) -> bool:
+		"""True for text naming a generic place such as "Pokemon Center", or nothing at all."""
+		query = normalize(text or "")
+		return not query or query in UNKNOWN or self.aliases.get(query) == GENERIC
+
+	def _match(self, text: str) -> Optional[Tuple[object, str, float]]:
+		"""Return (id, canonical name, confidence) for free text, or None if nothing is close."""
+		if not text:
+			return None
+		query = normalize(text)
+		if not query or query in UNKNOWN:
+			return None
+
+		# The whole text, exactly then fuzzily, so "Viridian Forrest" is not read as "Viridian"
+		if query in self.aliases:
+			entity_id = self.aliases[query]
+			return None if entity_id == GENERIC else (entity_id, self.names[entity_id], 1.0)
+		match = self._fuzzy(query, FUZZY_THRESHOLD)
+		if match is not None:
+			return match
+
+		# Exact alias on the earliest (then longest) window of words
+		words = query.split()
+		for start in range(len(words)):
+			for length in range(min(MAX_ALIAS_WORDS, len(words) - start), 0, -1):
+				entity_id = self.aliases.get(" ".join(words[start:start + length]))
+				if entity_id is not None and entity_id != GENERIC:
+					return entity_id, self.names[entity_id], 1.0
+
+		# Fuzzy on short word windows of longer text
+		if len(words) > 1:
+			windows = {
+				" ".join(words[start:start + length])
+				for length in range(1, MAX_ALIAS_WORDS)
+				for start in range(len(words) - length + 1)
+			}
+			scored = [m for m in (self._fuzzy(window, WINDOW_THRESHOLD) for window in windows) if m]
+			match = max(scored, key=lambda m: m[2], default=None)
+		return match
+
+	def _fuzzy(self, query: str, threshold: float) -> Optional[Tuple[object, str, float]]:
+		"""Closest alias by Dice similarity of trigram sets, candidates share at least one trigram."""
+		grams = trigrams(query)
+		shared: Dict[str, int] = defaultdict(int)
+		for gram in grams:
+			for key in self.postings.get(gram, ()):
+				shared[key] += 1
+		# Best score per entity, so aliases of the same entity do not compete with each other
+		scores: Dict[object, float] = {}
+		for key, count in shared.items():
+			score = 2 * count / (len(grams) + len(self.grams[key]))
+			entity_id = self.aliases[key]
+			scores[entity_id] = max(scores.get(entity_id, 0.0), score)
+		ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+		if not ranked or ranked[0][1] < threshold or ranked[0][0] == GENERIC:
+			return None
+		entity_id, best_score = ranked[0]
+		if len(ranked) > 1 and best_score - ranked[1][1] < FUZZY_MARGIN:
+			return None # Ambiguous between two entities
+		return entity_id, self.names[entity_id], round(best_score, 3)
+
+SPECIES_INDEX = EntityIndex(
+	(number, name, SPECIES_ALIASES.get(number, ()))
+	for number, name in enumerate(SPECIES, start=1)
+)
+LOCATION_INDEX = EntityIndex(LOCATIONS, generic=GENERIC_LOCATIONS)
+
+def match_species(text: str) -> Optional[Tuple[int, str, float]]:
+	"""Match a Pokemon name to (Pokedex number, canonical name, confidence)."""
+	return SPECIES_INDEX.match(text)
+
+def match_location(text: str) -> Optional[Tuple[str, str, float]]:
+	"""Match a location description to (location id, canonical name, confidence)."""
+	return LOCATION_INDEX.match(text)
@@ -0,0 +1,30 @@
+import hashlib
+from pathlib import Path
+
+ARCHIVE_DIR = "archive" # Subdirectory of the images directory holding the archive tier
+ARCHIVE_SUFFIX = ".webp"
+
+def file_hash(path) -> str:
+	"""Return the sha256 of a file's contents."""
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+def archived_image_path(image_path: str) -> Path:
+	"""Return where the image store archives a screenshot, keyed by its digest."""
+	path = Path(image_path)
+	return path.parent / ARCHIVE_DIR / f"{path.stem}{ARCHIVE_SUFFIX}"
+
+def resolve_image_path(image_path: str) -> str:
+	"""Return where a stored screenshot lives now.
+
+	Paths in context.jsonl point at the hot tier, the image store later moves old
+	frames to the compressed archive. Returns the archived copy when the original
+	is gone, otherwise the path unchanged.
+	"""
+	if not image_path or Path(image_path).exists():
+		return image_path
+	archived = archived_image_path(image_path)
+	return str(archived) if archived.exists() else image_path
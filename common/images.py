@@ -0,0 +1,40 @@
+import os
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+BORDER_THRESHOLD = 16 # Pixels darker than this count as letterbox border
+
+def get_game_area() -> Optional[Tuple[float, float, float, float]]:
+	"""Return the GAME_AREA crop box as (left, top, right, bottom) fractions of the frame, if configured."""
+	value = os.getenv("GAME_AREA", "").strip()
+	if not value:
+		return None
+	try:
+		left, top, right, bottom = (float(x) for x in value.split(","))
+		if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+			raise ValueError("fractions must be within 0-1 and left/top smaller than right/bottom")
+		return left, top, right, bottom
+	except ValueError as e:
+		logger.warning(f"Ignoring invalid GAME_AREA {value!r}: {e}")
+		return None
+
+def crop_game_area(image: Image.Image) -> Image.Image:
+	"""Crop a stream frame to the game area.
+
+	Uses GAME_AREA when configured, otherwise trims the black letterbox around the player.
+	"""
+	area = get_game_area()
+	if area:
+		width, height = image.size
+		left, top, right, bottom = area
+		return image.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+
+	mask = image.convert("L").point(lambda value: 255 if value > BORDER_THRESHOLD else 0)
+	bbox = mask.getbbox()
+	if bbox and bbox != (0, 0, *image.size):
+		return image.crop(bbox)
+	return image
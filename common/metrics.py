@@ -0,0 +1,22 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "logs/metrics.jsonl"
+
+_lock = threading.Lock()
+
+def emit(metric: str, **fields) -> None:
+	"""Append a metric record to logs/metrics.jsonl. Never raises."""
+	record = {"time": time.time(), "pid": os.getpid(), "metric": metric, **fields}
+	try:
+		with _lock:
+			os.makedirs(os.path.dirname(METRICS_PATH), exist_ok=True)
+			with open(METRICS_PATH, "a") as f:
+				f.write(json.dumps(record) + "\n")
+	except Exception as e:
+		logger.warning(f"Error writing metric {metric}: {e}")
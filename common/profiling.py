@@ -0,0 +1,130 @@
+import os
+import io
+import time
+import pstats
+import signal
+import logging
+import cProfile
+import tracemalloc
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = "logs/profiles"
+DEFAULT_TOP_N = 25
+TRACEMALLOC_FRAMES = 10
+
+class Profiler:
+	"""On-demand cProfile and tracemalloc hooks toggled by unix signals.
+
+	SIGUSR1 starts cProfile, a second SIGUSR1 stops it and dumps the stats.
+	SIGUSR2 takes a tracemalloc snapshot and dumps the top allocations along
+	with the diff against the previous snapshot.
+	"""
+	def __init__(self, name: str, output_dir: str = DEFAULT_PROFILE_DIR, top_n: int = DEFAULT_TOP_N):
+		self.name = name
+		self.output_dir = output_dir
+		self.top_n = top_n
+		self.profile: Optional[cProfile.Profile] = None
+		self.profile_started = 0.0
+		self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+	def install(self) -> bool:
+		"""Register the signal handlers. Returns False on platforms without SIGUSR1/SIGUSR2."""
+		if not hasattr(signal, "SIGUSR1") or not hasattr(signal, "SIGUSR2"):
+			logger.warning("Profiling signals are not supported on this platform")
+			return False
+		signal.signal(signal.SIGUSR1, self.handle_profile)
+		signal.signal(signal.SIGUSR2, self.handle_snapshot)
+		logger.info(f"Profiling hooks installed (pid {os.getpid()}): SIGUSR1 toggles cProfile, SIGUSR2 takes a memory snapshot")
+		return True
+
+	def _output_path(self, suffix: str) -> str:
+		"""Build a timestamped output path in the profile directory."""
+		os.makedirs(self.output_dir, exist_ok=True)
+		timestamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+		return os.path.join(self.output_dir, f"{self.name}_{timestamp}_UTC.{suffix}")
+
+#-------------------------------------------------------------------
+# CPU profiling
+#-------------------------------------------------------------------
+	def handle_profile(self, sig, frame):
+		"""Toggle cProfile on SIGUSR1."""
+		try:
+			if self.profile is None:
+				self.start_profile()
+			else:
+				self.stop_profile()
+		except Exception as e:
+			logger.error(f"Error toggling profiler: {e}")
+
+	def start_profile(self) -> None:
+		"""Start collecting cProfile stats."""
+		self.profile = cProfile.Profile()
+		self.profile_started = time.monotonic()
+		self.profile.enable()
+		logger.info("cProfile started")
+
+	def stop_profile(self) -> Optional[str]:
+		"""Stop cProfile and dump raw stats plus a text summary. Returns the stats path."""
+		if self.profile is None:
+			return None
+		self.profile.disable()
+		duration = time.monotonic() - self.profile_started
+		profile, self.profile = self.profile, None
+
+		stats_path = self._output_path("prof")
+		profile.dump_stats(stats_path)
+
+		# Human readable summary next to the raw stats
+		buffer = io.StringIO()
+		stats = pstats.Stats(profile, stream=buffer)
+		stats.sort_stats("cumulative").print_stats(self.top_n)
+		with open(stats_path[:-len(".prof")] + ".txt", "w") as f:
+			f.write(f"cProfile of {self.name} over {duration:.1f}s\n")
+			f.write(buffer.getvalue())
+
+		logger.info(f"cProfile stopped after {duration:.1f}s, stats saved to {stats_path}")
+		return stats_path
+
+#-------------------------------------------------------------------
+# Memory snapshots
+#-------------------------------------------------------------------
+	def handle_snapshot(self, sig, frame):
+		"""Take a tracemalloc snapshot on SIGUSR2."""
+		try:
+			self.take_snapshot()
+		except Exception as e:
+			logger.error(f"Error taking memory snapshot: {e}")
+
+	def take_snapshot(self) -> Optional[str]:
+		"""Dump the top allocations and the diff against the previous snapshot. Returns the report path."""
+		if not tracemalloc.is_tracing():
+			# The first signal only starts tracing, allocations before this point are not tracked
+			tracemalloc.start(TRACEMALLOC_FRAMES)
+			logger.info("tracemalloc started, send SIGUSR2 again to take a snapshot")
+			return None
+
+		snapshot = tracemalloc.take_snapshot().filter_traces((
+			tracemalloc.Filter(False, tracemalloc.__file__),
+			tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+		))
+		current, peak = tracemalloc.get_traced_memory()
+
+		lines = [f"tracemalloc snapshot of {self.name}: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB", ""]
+		lines.append(f"Top {self.top_n} allocations:")
+		for stat in snapshot.statistics("lineno")[:self.top_n]:
+			lines.append(str(stat))
+
+		if self.snapshot is not None:
+			lines.append("")
+			lines.append(f"Top {self.top_n} differences since previous snapshot:")
+			for stat in snapshot.compare_to(self.snapshot, "lineno")[:self.top_n]:
+				lines.append(str(stat))
+		self.snapshot = snapshot
+
+		report_path = self._output_path("mem.txt")
+		with open(report_path, "w") as f:
+			f.write("\n".join(lines) + "\n")
+		logger.info(f"Memory snapshot saved to {report_path}")
+		return report_path
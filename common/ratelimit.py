@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "context/ratelimit.json"
+DEFAULT_RPM = 20 # OpenRouter's limit for free models
+DEFAULT_TPM = 1_000_000
+DEFAULT_MAX_WAIT = 60 # secs before giving up and letting the caller try another model
+RATE_LIMIT_PENALTY = 30 # secs a model is blocked for every process after a 429
+
+# Priority classes, lower is more important
+PRIORITY_HIGH = 0 # Post decisions
+PRIORITY_NORMAL = 1 # Notes updates
+PRIORITY_LOW = 2 # Routine frame analysis
+
+# Fraction of each bucket a priority class must leave untouched, so bursts of
+# routine work can never starve more important requests
+RESERVE = {PRIORITY_HIGH: 0.0, PRIORITY_NORMAL: 0.2, PRIORITY_LOW: 0.4}
+WAITER_TTL = 5 # secs a waiting request keeps blocking lower priority classes
+
+def parse_limits(value: str) -> Dict[str, Tuple[float, float]]:
+	"""Parse "model=rpm/tpm;model=rpm/tpm" per-model limit overrides."""
+	limits = {}
+	for item in (value or "").split(";"):
+		if not item.strip():
+			continue
+		try:
+			model, limit = item.rsplit("=", 1)
+			rpm, tpm = limit.split("/")
+			limits[model.strip()] = (float(rpm), float(tpm))
+		except ValueError:
+			logger.warning(f"Ignoring invalid rate limit {item!r}")
+	return limits
+
+class RateLimiter:
+	"""Token-bucket rate limiter shared by every agent process on the host.
+
+	Each model has a requests/min and a tokens/min bucket. The bucket state lives
+	in a JSON file guarded by an exclusive flock, so the monitor and post agents
+	see the same budget. Requests carry a priority class, lower classes keep a
+	reserve free and yield to higher classes that are waiting.
+	"""
+	def __init__(
+		self,
+		state_path: str = DEFAULT_STATE_PATH,
+		default_limits: Tuple[float, float] = (DEFAULT_RPM, DEFAULT_TPM),
+		limits: Optional[Dict[str, Tuple[float, float]]] = None,
+		max_wait: float = DEFAULT_MAX_WAIT
+	):
+		self.state_path = state_path
+		self.default_limits = default_limits
+		self.limits = limits or {}
+		self.max_wait = max_wait
+		os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+
+	def _limits(self, model: str) -> Tuple[float, float]:
+		return self.limits.get(model, self.default_limits)
+
+	@contextmanager
+	def _locked(self):
+		"""Yield the shared state while holding an exclusive lock on the state file."""
+		with open(self.state_path, "a+") as f:
+			fcntl.flock(f, fcntl.LOCK_EX)
+			try:
+				f.seek(0)
+				try:
+					state = json.loads(f.read() or "{}")
+				except json.JSONDecodeError:
+					state = {}
+				yield state
+				f.seek(0)
+				f.truncate()
+				f.write(json.dumps(state))
+				f.flush()
+			finally:
+				fcntl.flock(f, fcntl.LOCK_UN)
+
+	def _bucket(self, state: dict, model: str, now: float) -> dict:
+		"""Return the model's buckets refilled up to now."""
+		rpm, tpm = self._limits(model)
+		bucket = state.setdefault("models", {}).setdefault(model, {
+			"requests": rpm, "tokens": tpm, "updated": now, "blocked_until": 0
+		})
+		elapsed = max(0.0, now - bucket["updated"])
+		bucket["requests"] = min(rpm, bucket["requests"] + elapsed * rpm / 60)
+		bucket["tokens"] = min(tpm, bucket["tokens"] + elapsed * tpm / 60)
+		bucket["updated"] = now
+		return bucket
+
+	def acquire(self, model: str, tokens: int, priority: int = PRIORITY_NORMAL) -> bool:
+		"""Block until the model has capacity for one request of `tokens` tokens.
+
+		Returns False if no capacity became available within max_wait.
+		"""
+		waiter = f"{os.getpid()}:{threading.get_ident()}"
+		deadline = time.time() + self.max_wait
+		rpm, tpm = self._limits(model)
+		tokens = min(tokens, tpm) # A request larger than the bucket could never run
+		while True:
+			with self._locked() as state:
+				now = time.time()
+				bucket = self._bucket(state, model, now)
+				waiters = {
+					key: value for key, value in state.get("waiters", {}).get(model, {}).items()
+					if value["until"] > now and key != waiter
+				}
+				# The reserve never leaves less than one request of capacity, or small limits could never be used
+				reserve = RESERVE.get(priority, 0.0)
+				request_reserve = min(rpm * reserve, rpm - 1)
+				token_reserve = min(tpm * reserve, tpm - tokens)
+				outranked = any(value["priority"] < priority for value in waiters.values())
+				if (
+					now >= bucket["blocked_until"] and
+					not outranked and
+					bucket["requests"] - 1 >= request_reserve and
+					bucket["tokens"] - tokens >= token_reserve
+				):
+					bucket["requests"] -= 1
+					bucket["tokens"] -= tokens
+					state.setdefault("waiters", {})[model] = waiters
+					return True
+
+				# Register as waiting so lower priority classes yield to us
+				waiters[waiter] = {"priority": priority, "until": now + WAITER_TTL}
+				state.setdefault("waiters", {})[model] = waiters
+				request_wait = max(0.0, (request_reserve + 1 - bucket["requests"]) * 60 / rpm)
+				token_wait = max(0.0, (token_reserve + tokens - bucket["tokens"]) * 60 / tpm)
+				wait = max(request_wait, token_wait, bucket["blocked_until"] - now, 0.05)
+
+			if now + wait > deadline:
+				self._drop_waiter(model, waiter)
+				logger.warning(f"Rate limiter gave up waiting for {model} after {self.max_wait}s")
+				return False
+			time.sleep(min(wait, 1.0)) # Re-check regularly, other processes may return capacity
+
+	def _drop_waiter(self, model: str, waiter: str) -> None:
+		with self._locked() as state:
+			state.get("waiters", {}).get(model, {}).pop(waiter, None)
+
+	def adjust(self, model: str, tokens: int) -> None:
+		"""Charge (or refund, if negative) the difference between estimated and actual tokens."""
+		if not tokens:
+			return
+		with self._locked() as state:
+			bucket = self._bucket(state, model, time.time())
+			bucket["tokens"] -= tokens
+
+	def penalize(self, model: str, seconds: float = RATE_LIMIT_PENALTY) -> None:
+		"""Block a model for every process after the provider returned a 429."""
+		with self._locked() as state:
+			now = time.time()
+			bucket = self._bucket(state, model, now)
+			bucket["blocked_until"] = max(bucket["blocked_until"], now + seconds)
+			bucket["requests"] = 0
+		logger.warning(f"Rate limited by provider, pausing {model} for {seconds}s")
@@ -0,0 +1,43 @@
+import sys
+import time
+import logging
+import importlib
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+	"""Records startup phases and deferred imports and logs a time breakdown."""
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.last = self.started
+		self.phases: List[Tuple[str, float]] = []
+		self.imports: List[Tuple[str, float, int]] = []
+
+	def mark(self, phase: str) -> None:
+		"""Record the time spent since the previous mark as `phase`."""
+		now = time.perf_counter()
+		self.phases.append((phase, now - self.last))
+		self.last = now
+
+	def import_module(self, name: str):
+		"""Import a module and record how long it took and how many modules it pulled in."""
+		modules_before = len(sys.modules)
+		start = time.perf_counter()
+		module = importlib.import_module(name)
+		self.imports.append((name, time.perf_counter() - start, len(sys.modules) - modules_before))
+		return module
+
+	def report(self) -> str:
+		"""Log and return the startup breakdown."""
+		total = time.perf_counter() - self.started
+		lines = [f"Startup took {total:.3f}s"]
+		for phase, duration in self.phases:
+			lines.append(f"  {phase:<32} {duration:.3f}s")
+		if self.imports:
+			lines.append("  imports:")
+			for name, duration, module_count in sorted(self.imports, key=lambda x: x[1], reverse=True):
+				lines.append(f"    {name:<30} {duration:.3f}s ({module_count} modules)")
+		report = "\n".join(lines)
+		logger.info(report)
+		return report
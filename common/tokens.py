@@ -0,0 +1,102 @@
+"""Process-wide token accounting shared by the monitor and post agents.
+
+The tiktoken encoding is loaded lazily on first use. It is not shipped with
+the repo: tiktoken downloads it into assets/tiktoken (git ignored) the first
+time, later starts read it from there. Run `python -m common.tokens --prefetch`
+once to download it ahead of time. A process that cannot load it falls back
+to approximate counts.
+"""
+import os
+import sys
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = "cl100k_base" # Encoding used by gpt-4
+DEFAULT_CACHE_DIR = "assets/tiktoken"
+TOKEN_COUNT_MODE = os.getenv("TOKEN_COUNT_MODE", "exact").lower() # "exact" or "approx"
+BYTES_PER_TOKEN = 4 # Rough average for English text with cl100k
+
+_encoder = None
+_encoder_failed = False
+_encoder_lock = threading.Lock()
+
+def get_encoder():
+	"""Return the shared tiktoken encoding, or None if it cannot be loaded."""
+	global _encoder, _encoder_failed
+	if _encoder is not None or _encoder_failed:
+		return _encoder
+	with _encoder_lock:
+		if _encoder is not None or _encoder_failed:
+			return _encoder
+		# tiktoken reads (and writes) its BPE files from this directory before going to the network
+		os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.abspath(DEFAULT_CACHE_DIR))
+		try:
+			import tiktoken
+			_encoder = tiktoken.get_encoding(ENCODING_NAME)
+		except Exception as e:
+			logger.warning(f"Could not load tiktoken encoding {ENCODING_NAME}, falling back to approximate counts: {e}")
+			_encoder_failed = True
+	return _encoder
+
+def approx_tokens(text: str) -> int:
+	"""Estimate the token count of text without tokenizing it."""
+	if not text:
+		return 0
+	return (len(text.encode("utf-8")) + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+def count_tokens(text: str, approximate: bool = False) -> int:
+	"""Count tokens in text. Uses the approximate counter when asked, configured or offline."""
+	if not text:
+		return 0
+	if approximate or TOKEN_COUNT_MODE == "approx":
+		return approx_tokens(text)
+	encoder = get_encoder()
+	if encoder is None:
+		return approx_tokens(text)
+	return len(encoder.encode(text, disallowed_special=()))
+
+@lru_cache(maxsize=64)
+def count_static_tokens(text: str) -> int:
+	"""Memoized count_tokens for text that never changes such as system prompts."""
+	return count_tokens(text)
+
+def count_message_tokens(messages: List[Dict], static: tuple = ()) -> int:
+	"""Count text tokens in chat messages. Text in `static` is counted once per process."""
+	token_count = 0
+	for message in messages:
+		content = message.get("content")
+		parts = [{"type": "text", "text": content}] if isinstance(content, str) else content or []
+		for part in parts:
+			if part.get("type") != "text":
+				continue
+			text = part["text"]
+			token_count += count_static_tokens(text) if text in static else count_tokens(text)
+	return token_count
+
+def usage_from_response(response: dict) -> Optional[Dict[str, int]]:
+	"""Return token usage reported by the API, or None if the response has none."""
+	usage = response.get("usage") if isinstance(response, dict) else None
+	if not isinstance(usage, dict):
+		return None
+	input_tokens = usage.get("prompt_tokens")
+	output_tokens = usage.get("completion_tokens")
+	if not isinstance(input_tokens, int) or not isinstance(output_tokens, int):
+		return None
+	return {
+		"input_tokens": input_tokens,
+		"output_tokens": output_tokens,
+		"total_tokens": usage.get("total_tokens", input_tokens + output_tokens)
+	}
+
+if __name__ == "__main__":
+	if "--prefetch" in sys.argv:
+		logging.basicConfig(level=logging.INFO)
+		if get_encoder() is None:
+			sys.exit(1)
+		print(f"Cached {ENCODING_NAME} in {os.environ['TIKTOKEN_CACHE_DIR']}")
+	else:
+		print("Usage: python -m common.tokens --prefetch")
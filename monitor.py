@@ -1,17 +1,33 @@
 import os
 import sys
-import glob
 import time
 import signal
 import logging
-from typing import Optional
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 from dotenv import load_dotenv
 load_dotenv(override=True)
 
-from monitor.server import Server
-from monitor.capture import TwitchCapture
-from monitor.llm import ImageAnalyzer
-from monitor.context import save_to_context
+from common.startup import StartupTimer
+startup = StartupTimer()
+
+from monitor.context import save_to_context, last_job_id
+from monitor.validate import get_default_response
+from monitor.jobs import JobQueue, DEFAULT_QUEUE_PATH, DEFAULT_LEASE_SECS
+from monitor.store import ImageStore
+from monitor.scheduler import CaptureScheduler
+from monitor.state import StateTracker
+from common.profiling import Profiler
+from common.cache import ResponseCache
+from common.ratelimit import RateLimiter, parse_limits
+from common.budget import BudgetGovernor, parse_prices
+
+# Heavy components (selenium, requests) are imported in MonitorAgent.initialize once the config is valid
+if TYPE_CHECKING:
+	from monitor.server import Server
+	from monitor.capture import TwitchCapture
+	from monitor.llm import ImageAnalyzer
 
 # Configure logging
 def setup_logging():
@@ -36,16 +52,21 @@ logger = setup_logging()
 
 SERVER_DIR = "monitor/stream"
 IMAGES_DIR = "context/images"
+CACHE_DIR = "context/cache"
+RATE_LIMIT_STATE_PATH = "context/ratelimit.json"
 DEFAULT_AGENT_BOOT_WAIT = "0" # mins
 DEFAULT_MONITOR_INTERVAL = "0.5" # mins
-MAX_IMAGES = 20 # Max images in context (roughly 10 mins worth of images)
+MAX_IMAGES = 20 # Hot images kept at full quality, older ones are archived once their analysis is saved
+MAX_ANALYSIS_WORKERS = 4 # Default cap on concurrent analyses, the rate limiter bounds them further
 
 class MonitorAgent:
 	def __init__(self):
 		# Get environment variables with defaults
-		self.twitch_channel = os.getenv("TWITCH_CHANNEL")
-		if not self.twitch_channel:
-			logger.error("TWITCH_CHANNEL environment variable is required")
+		# TWITCH_CHANNELS monitors several streams from one browser, TWITCH_CHANNEL a single one
+		channels = os.getenv("TWITCH_CHANNELS") or os.getenv("TWITCH_CHANNEL") or ""
+		self.channels = list(dict.fromkeys(channel.strip() for channel in channels.split(",") if channel.strip()))
+		if not self.channels:
+			logger.error("TWITCH_CHANNEL or TWITCH_CHANNELS environment variable is required")
 			sys.exit(1)
 					
 		agent_boot_wait_str = os.getenv("AGENT_BOOT_WAIT", DEFAULT_AGENT_BOOT_WAIT)
@@ -61,36 +82,186 @@ class MonitorAgent:
 			self.monitor_interval_secs = self.monitor_interval * 60
 
 			self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+			self.clips_enabled = os.getenv("CLIPS_ENABLED", "false").lower() == "true"
+			self.scene_routing = os.getenv("SCENE_ROUTING", "false").lower() == "true"
+			self.scene_policy = os.getenv("SCENE_POLICY", "")
+			self.scene_min_confidence = float(os.getenv("SCENE_MIN_CONFIDENCE", "0.6"))
+			self.cascade = os.getenv("CASCADE_MODE", "false").lower() == "true"
+			self.cascade_threshold = int(os.getenv("CASCADE_SCORE_THRESHOLD", "7"))
+			# Batch mode sends several frames per request (1 disables batching)
+			self.batch_size = int(os.getenv("MONITOR_BATCH_SIZE", "1"))
+			self.batch_window_secs = float(os.getenv("MONITOR_BATCH_WINDOW", "0")) * 60
+			# Analyses run on a worker pool shared by all channels
+			self.analysis_workers = int(os.getenv("ANALYSIS_WORKERS") or min(len(self.channels), MAX_ANALYSIS_WORKERS))
+			# Queue mode hands frames to worker.py processes through a shared job queue instead
+			self.analysis_mode = os.getenv("ANALYSIS_MODE", "local").lower()
+			self.queue_path = os.getenv("QUEUE_PATH", DEFAULT_QUEUE_PATH)
+			self.queue_lease_secs = float(os.getenv("QUEUE_LEASE_SECS", str(DEFAULT_LEASE_SECS)))
+			self.queue_max_backlog = int(os.getenv("QUEUE_MAX_BACKLOG", str(MAX_IMAGES // 2)))
+			# Workers on other nodes claim frames over the HTTP server, authenticated with this token
+			self.queue_token = os.getenv("QUEUE_TOKEN", "")
+
+			# Provider prompt caching hints and the local response cache are opt-in
+			self.prompt_cache = os.getenv("PROMPT_CACHE", "false").lower() == "true"
+			self.response_cache_enabled = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+			self.response_cache_ttl_secs = float(os.getenv("RESPONSE_CACHE_TTL", "1440")) * 60
+			self.response_cache_max_bytes = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+			# Rate limits shared with the other agent through context/ratelimit.json
+			self.rate_limit_rpm = float(os.getenv("RATE_LIMIT_RPM", "20"))
+			self.rate_limit_tpm = float(os.getenv("RATE_LIMIT_TPM", "1000000"))
+			self.rate_limits = os.getenv("RATE_LIMITS", "")
+
+			# Daily spend ceiling in USD shared with the other agent, 0 only records usage
+			self.daily_budget = float(os.getenv("DAILY_BUDGET", "0"))
+			self.model_prices = os.getenv("MODEL_PRICES", "")
+			self.budget_max_scale = float(os.getenv("BUDGET_MAX_SCALE", "8"))
+
+			# Adaptive capture: shorter intervals during action, exponential backoff while idle (mins)
+			self.adaptive_capture = os.getenv("ADAPTIVE_CAPTURE", "false").lower() == "true"
+			self.monitor_interval_min_secs = float(os.getenv("MONITOR_INTERVAL_MIN", "0.25")) * 60
+			self.monitor_interval_max_secs = float(os.getenv("MONITOR_INTERVAL_MAX", "4")) * 60
+
+			# Browser watchdog: recycle Chrome on memory growth or a stalled stream, optionally from a warm standby
+			self.browser_watchdog = os.getenv("BROWSER_WATCHDOG", "false").lower() == "true"
+			self.browser_standby = os.getenv("BROWSER_STANDBY", "true").lower() == "true"
+			self.browser_max_rss = int(float(os.getenv("BROWSER_MAX_RSS_MB", "2048")) * 1024 * 1024)
+			self.browser_stall_secs = float(os.getenv("BROWSER_STALL_SECS", "180"))
+
+			# Capture backend: WebDriver screenshots or a CDP screencast of the player
+			self.capture_backend = os.getenv("CAPTURE_BACKEND", "screenshot").lower()
 		except ValueError:
-			logger.error("AGENT_BOOT_WAIT and MONITOR_INTERVAL must be numeric values")
+			logger.error("AGENT_BOOT_WAIT, MONITOR_INTERVAL and other numeric settings must be numeric values")
+			sys.exit(1)
+
+		# Fail fast before any heavy imports or browser startup
+		if not self.openrouter_api_key:
+			logger.error("OPENROUTER_API_KEY environment variable is required")
 			sys.exit(1)
 					
 		# Components
 		self.server_port = 8001
-		self.server: Optional[Server] = None
-		self.capture: Optional[TwitchCapture] = None
-		self.image_analyzer: Optional[ImageAnalyzer] = None
+		self.server: Optional["Server"] = None
+		self.capture: Optional["TwitchCapture"] = None
+		self.image_analyzer: Optional["ImageAnalyzer"] = None
+		self.image_store: Optional[ImageStore] = None
+		self.frame_buffer = None
+		self.clip_exporter = None
+		self.watchdog = None
+		self.job_queue: Optional[JobQueue] = None
+		self.state_tracker = StateTracker() # Game state for the post agent, reduced from every analysis
+		self.last_job_id = 0
+		self.committing: Optional[int] = None # Job whose highlight clip is still encoding
+		self.pending_frames: Dict[str, List[Tuple[str, float]]] = {} # Frames waiting for a batch analysis
+		self.budget = BudgetGovernor(
+			"monitor",
+			daily_budget=self.daily_budget,
+			prices=parse_prices(self.model_prices),
+			max_scale=self.budget_max_scale
+		)
+		# One adaptive scheduler per channel
+		self.schedulers: Dict[str, CaptureScheduler] = {}
+		if self.adaptive_capture:
+			self.schedulers = {
+				channel: CaptureScheduler(
+					self.monitor_interval_secs,
+					self.monitor_interval_min_secs,
+					self.monitor_interval_max_secs
+				)
+				for channel in self.channels
+			}
+		self.profiler: Optional[Profiler] = None
 		# Flag to control the main loop
 		self.running = False
         
 	def initialize(self):
 		"""Initialize server and capture components"""
 		try:
+			startup.mark("config")
+			Server = startup.import_module("monitor.server").Server
+			TwitchCapture = startup.import_module("monitor.capture").TwitchCapture
+			ImageAnalyzer = startup.import_module("monitor.llm").ImageAnalyzer
+			startup.mark("imports")
+
 			# Start the HTTP server
 			logger.info("Starting HTTP server...")
 			self.server = Server(port=self.server_port, directory=SERVER_DIR)
 			self.server.start()
+			startup.mark("server")
 			
 			# Initialize the Twitch capture
 			logger.info("Initializing Twitch capture...")
-			self.capture = TwitchCapture(server_port=self.server_port, images_dir=IMAGES_DIR)
+			self.capture = TwitchCapture(
+				server_port=self.server_port,
+				images_dir=IMAGES_DIR,
+				backend=self.capture_backend,
+				channels=self.channels
+			)
 			self.capture.init()
-			logger.info(f"Initialization complete. Monitoring Twitch channel: {self.twitch_channel}")
+			self.image_store = ImageStore(images_dir=IMAGES_DIR, max_images=MAX_IMAGES)
+			if self.browser_watchdog:
+				# Health checks and the standby browser run on a background thread
+				self.watchdog = startup.import_module("monitor.watchdog").BrowserWatchdog(
+					self.capture,
+					max_rss=self.browser_max_rss,
+					stall_secs=self.browser_stall_secs,
+					standby=self.browser_standby
+				)
+				self.watchdog.start()
+				logger.info("Browser watchdog enabled")
+			if self.clips_enabled:
+				# Low resolution frames for highlight clips are sampled on a background thread (first channel only)
+				clips = startup.import_module("monitor.clips")
+				self.frame_buffer = clips.FrameRingBuffer(self.capture)
+				self.frame_buffer.start()
+				self.clip_exporter = clips.ClipExporter(self.frame_buffer)
+				self.clip_score_threshold = clips.CLIP_SCORE_THRESHOLD
+				logger.info("Highlight clips enabled")
+			logger.info(f"Initialization complete. Monitoring Twitch channels: {', '.join(self.channels)}")
+			startup.mark("browser")
 
-			# Initialize the Image Analyzer with Openrouter
-			logger.info("Initializing ImageAnalyzer...")
-			self.image_analyzer = ImageAnalyzer(api_key=self.openrouter_api_key)
-			logger.info(f"ImageAnalyzer initialized")
+			if self.analysis_mode == "queue":
+				# Workers run the analyzer, the capture node only enqueues frames and commits results
+				self.job_queue = JobQueue(self.queue_path, lease_secs=self.queue_lease_secs)
+				self.last_job_id = last_job_id()
+				for image_path in self.job_queue.uncommitted_images():
+					self.image_store.hold(image_path) # Queued before a restart, still waiting for a worker
+				# Remote workers cannot write the budget ledger, their usage is recorded when results come in
+				self.server.api = startup.import_module("monitor.remote").JobQueueAPI(
+					self.job_queue,
+					token=self.queue_token,
+					budget=BudgetGovernor("worker", prices=parse_prices(self.model_prices))
+				)
+				if not self.queue_token:
+					logger.warning("QUEUE_TOKEN is not set, only workers on this host can use the queue API")
+				logger.info(f"Queue mode: frames are analyzed by workers through {self.queue_path} and http://<host>:{self.server_port}/jobs")
+			else:
+				# Initialize the Image Analyzer with Openrouter
+				logger.info("Initializing ImageAnalyzer...")
+				scene_policy = None
+				if self.scene_routing and startup.import_module("common.images").get_game_area() is None:
+					logger.warning("SCENE_ROUTING needs GAME_AREA to classify frames reliably, scene routing disabled")
+				elif self.scene_routing:
+					scene_policy = startup.import_module("monitor.scene").parse_policy(self.scene_policy)
+					logger.info(f"Scene routing enabled: {scene_policy}")
+				self.image_analyzer = ImageAnalyzer(
+					api_key=self.openrouter_api_key,
+					scene_policy=scene_policy,
+					scene_min_confidence=self.scene_min_confidence,
+					cascade=self.cascade,
+					cascade_threshold=self.cascade_threshold,
+					response_cache=self.create_response_cache(),
+					prompt_cache=self.prompt_cache,
+					rate_limiter=RateLimiter(
+						state_path=RATE_LIMIT_STATE_PATH,
+						default_limits=(self.rate_limit_rpm, self.rate_limit_tpm),
+						limits=parse_limits(self.rate_limits)
+					),
+					budget=self.budget
+				)
+				logger.info(f"ImageAnalyzer initialized")
+				startup.mark("analyzer")
+			startup.report()
 
 		except Exception as e:
 			logger.error(f"Error during initialization: {e}")
@@ -103,6 +274,9 @@ class MonitorAgent:
 		# Register signal handlers
 		signal.signal(signal.SIGINT, self.handle_interrupt)
 		signal.signal(signal.SIGTERM, self.handle_interrupt)
+		# Register on-demand profiling hooks (SIGUSR1: cProfile, SIGUSR2: tracemalloc)
+		self.profiler = Profiler(name="monitor")
+		self.profiler.install()
 		
 		# Wait before starting capture loop
 		if self.agent_boot_wait_secs != 0:
@@ -111,31 +285,161 @@ class MonitorAgent:
 
 		try:
 			# Main capture loop
-			logger.info(f"Starting twitch capture loop (interval: {self.monitor_interval} minutes)")
-			cleanup_count = 0  # Initialize image cleanup counter
-			while self.running:
-				try:
-					# Capture screenshot
-					screenshot_path = self.capture.capture_screenshot()
-
-					# Analyze the screenshot
-					analysis = self.image_analyzer.analyze_image(screenshot_path)
-
-					# Save the analysis to context.json
-					save_to_context(analysis)
-
-					cleanup_count += 1  # Increment cleanup counter
-					if cleanup_count >= 30: # Run cleanup when count reaches 30
-						logger.info("Running image cleanup")
-						self.cleanup_images()
-						cleanup_count = 0 # Reset counter
-						
-					time.sleep(self.monitor_interval_secs)  # Wait until next capture
-				except Exception as e:
-					logger.error(f"Error during capture: {e}")
+			logger.info(f"Starting twitch capture loop (interval: {self.monitor_interval} minutes, channels: {len(self.channels)})")
+			due = {channel: time.time() for channel in self.channels} # Next capture time per channel
+			pending = self.pending_frames
+			pending.update({channel: [] for channel in self.channels})
+			with ThreadPoolExecutor(max_workers=self.analysis_workers, thread_name_prefix="analysis") as pool:
+				while self.running:
+					if self.job_queue:
+						self.commit_jobs()
+
+					# Fair scheduling: capture the channel that has been due the longest
+					channel = min(due, key=due.get)
+					wait = due[channel] - time.time()
+					if wait > 0:
+						time.sleep(min(wait, 1)) # Wake up regularly to notice shutdown
+						continue
+
+					try:
+						# Back off while workers are behind, every queued frame is held in the store
+						if self.job_queue and self.job_queue.backlog() >= self.queue_max_backlog:
+							logger.warning(f"Analysis queue backlog reached {self.queue_max_backlog}, skipping capture")
+							due[channel] = time.time() + self.next_interval(channel)
+							continue
+
+						# Capture screenshot and move it into the content-addressed store (evicts old frames),
+						# held there until its analysis is saved so waiting frames are never archived
+						capture_time = time.time()
+						try:
+							screenshot_path = self.capture.capture_screenshot(channel)
+						except Exception:
+							if self.watchdog:
+								self.watchdog.wake() # Check the browser now instead of at the next health check
+							raise
+						screenshot_path = self.image_store.put(screenshot_path, hold=True)
+
+						if self.job_queue:
+							try:
+								self.job_queue.enqueue(screenshot_path, capture_time, channel)
+							except Exception:
+								self.image_store.release(screenshot_path)
+								raise
+							due[channel] = time.time() + self.next_interval(channel)
+							continue
+
+						frames = [(screenshot_path, capture_time)]
+						if self.batch_size > 1:
+							frames = pending[channel] + frames
+							# Flush when the batch is full or its oldest frame is older than the batch window
+							if not (len(frames) >= self.batch_size or time.time() - frames[0][1] >= self.batch_window_secs > 0):
+								pending[channel] = frames
+								due[channel] = time.time() + self.next_interval(channel)
+								continue
+							pending[channel] = []
+
+						# Analysis runs on the shared pool, the channel is not captured again until it is done
+						due[channel] = float("inf")
+						pool.submit(self.analyze, channel, frames, due)
+					except Exception as e:
+						logger.error(f"Error during capture ({channel}): {e}")
+						due[channel] = time.time() + self.next_interval(channel)
 		finally:
 			self.cleanup()
+
+	def analyze(self, channel: str, frames: List[Tuple[str, float]], due: Dict[str, float]):
+		"""Analyze captured frames of a channel on a worker thread and schedule its next capture"""
+		try:
+			if len(frames) > 1:
+				analyses = self.image_analyzer.analyze_batch([
+					(path, datetime.fromtimestamp(captured, timezone.utc).isoformat())
+					for path, captured in frames
+				])
+			else:
+				analyses = [self.image_analyzer.analyze_image(frames[0][0])]
+			for analysis, (_, captured) in zip(analyses, frames):
+				self.process_analysis(analysis, captured, channel)
+		except Exception as e:
+			logger.error(f"Error during analysis ({channel}): {e}")
+		finally:
+			for path, _ in frames:
+				self.image_store.release(path)
+			due[channel] = time.time() + self.next_interval(channel)
+
+	def commit_jobs(self):
+		"""Save results finished by queue workers to context, in capture order"""
+		if self.committing is not None:
+			return # Later results wait for the highlight so the context stays in job order
+		try:
+			jobs = self.job_queue.ready(after=self.last_job_id)
+			for job in jobs:
+				timestamp = datetime.fromtimestamp(job.capture_time, timezone.utc).isoformat()
+				analysis = job.result or get_default_response(job.image_path, timestamp)
+				analysis["job_id"] = job.id # Lets a restarted monitor skip results it already saved
+				self.committing = job.id
+				self.process_analysis(analysis, job.capture_time, job.channel, on_saved=lambda job_id=job.id: self.job_saved(job_id))
+				self.image_store.release(job.image_path)
+				if self.committing is not None:
+					break # Committed by job_saved once the clip is written
+			if jobs:
+				self.job_queue.prune()
+		except Exception as e:
+			logger.error(f"Error committing analysis results: {e}")
+			self.committing = None
+
+	def job_saved(self, job_id: int):
+		"""Mark a queue job committed once its analysis is in the context, never before"""
+		self.last_job_id = job_id
+		self.job_queue.mark_committed(job_id)
+		self.committing = None
+
+	def next_interval(self, channel: str) -> float:
+		"""Seconds until the next capture of a channel, adapted to recent action and scaled to the daily budget"""
+		scheduler = self.schedulers.get(channel)
+		return self.budget.interval(scheduler.interval_secs if scheduler else self.monitor_interval_secs)
     
+	def process_analysis(self, analysis: dict, capture_time: float, channel: str, on_saved: Optional[Callable[[], None]] = None):
+		"""Export a highlight clip if needed and save the analysis to context, then call on_saved"""
+		analysis["channel"] = channel
+
+		# Export a clip of the surrounding seconds for highlights, the analysis is saved once the clip is written
+		deferred = False
+		if self.clip_exporter and channel == self.channels[0] and analysis.get("score", 0) >= self.clip_score_threshold:
+			deferred = self.clip_exporter.request(capture_time, lambda clip_path: self.save_highlight(analysis, clip_path, on_saved))
+
+		# Save the analysis to context.json
+		if not deferred:
+			save_to_context(analysis)
+			if on_saved:
+				on_saved()
+		self.state_tracker.update(analysis)
+
+		if channel in self.schedulers:
+			self.schedulers[channel].observe(analysis)
+
+	def save_highlight(self, analysis: dict, clip_path: Optional[str], on_saved: Optional[Callable[[], None]] = None):
+		"""Save a highlight analysis with its clip, if the export succeeded"""
+		if clip_path:
+			analysis["clip_path"] = clip_path
+		try:
+			save_to_context(analysis)
+		except Exception as e:
+			logger.error(f"Error saving highlight analysis: {e}")
+			self.committing = None # A queue job stays uncommitted and is saved again next time
+			return
+		if on_saved:
+			on_saved()
+
+	def create_response_cache(self) -> Optional[ResponseCache]:
+		"""Create the local LLM response cache if enabled"""
+		if not self.response_cache_enabled:
+			return None
+		return ResponseCache(
+			cache_dir=f"{CACHE_DIR}/monitor",
+			ttl=self.response_cache_ttl_secs,
+			max_bytes=self.response_cache_max_bytes
+		)
+
 	def handle_interrupt(self, sig, frame):
 		"""Handle keyboard interrupt or termination signal"""
 		logger.info("Received interrupt signal, shutting down...")
@@ -145,6 +449,26 @@ class MonitorAgent:
 		"""Clean up resources"""
 		logger.info("Cleaning up resources...")
 
+		if self.profiler:
+			self.profiler.stop_profile() # Dump an in-progress profile before exiting
+
+		# Frames still waiting for a batch are saved unanalyzed, shutdown must not wait on LLM calls
+		for channel, frames in self.pending_frames.items():
+			if frames:
+				logger.info(f"Saving {len(frames)} pending frames without analysis ({channel})")
+			for path, captured in frames:
+				timestamp = datetime.fromtimestamp(captured, timezone.utc).isoformat()
+				save_to_context({**get_default_response(path, timestamp), "channel": channel, "skipped": True})
+				self.image_store.release(path)
+		self.pending_frames = {}
+
+		if self.frame_buffer:
+			self.frame_buffer.stop()
+		if self.clip_exporter:
+			self.clip_exporter.stop()
+		if self.watchdog:
+			self.watchdog.stop()
+
 		if self.capture:
 			try:
 				self.capture.cleanup()
@@ -159,27 +483,6 @@ class MonitorAgent:
 			except Exception as e:
 				logger.error(f"Error stopping server: {e}")
 
-	def cleanup_images(self):
-		"""Keep only the latest MAX_IMAGES images in the images directory."""
-		try:
-			image_files = glob.glob(f"{IMAGES_DIR}/*.png") # Get all PNG files from the images directory
-			image_files.sort(key=os.path.getmtime) # Sort files by modification time (newest last)
-
-			# If we have more than MAX_IMAGES, remove the oldest ones
-			if len(image_files) > MAX_IMAGES:
-				files_to_remove = image_files[:-MAX_IMAGES]  # Keep the latest MAX_IMAGES
-				for old_file in files_to_remove:
-					try:
-						os.remove(old_file)
-						logger.debug(f"Removed old image: {old_file}")
-					except Exception as e:
-						logger.warning(f"Failed to remove old image {old_file}: {e}")
-				
-				logger.info(f"Cleaned up {len(files_to_remove)} old images, keeping the latest {MAX_IMAGES}")
-		
-		except Exception as e:
-			logger.error(f"Error cleaning up old images: {e}")
-
 if __name__ == "__main__":
 	monitor = MonitorAgent()
 	monitor.initialize()
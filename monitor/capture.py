@@ -1,19 +1,27 @@
 import os
 import time
 import logging
+import threading
 from datetime import datetime, timezone
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from typing import Optional
+from urllib.parse import quote
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+	from .screencast import Screencast
 
 logger = logging.getLogger(__name__)
 
 WINDOW_WIDTH = 1920
 WINDOW_HEIGHT = 1200
 EMBED_LOAD_TIMEOUT = 20
+DEFAULT_CHANNEL = "claudeplayspokemon"
+SCREENCAST_MAX_AGE = 10 # secs, older screencast frames fall back to a WebDriver screenshot
+CAPTURE_BACKENDS = ("screenshot", "screencast")
 
 # Chrome configuration options
 CHROME_CONFIG = {
@@ -32,6 +40,10 @@ CHROME_CONFIG = {
 		# Media stream handling for Twitch
 		"--autoplay-policy=no-user-gesture-required",
 		"--use-fake-ui-for-media-stream",
+		# Keep background tabs playing when several channels are captured
+		"--disable-background-timer-throttling",
+		"--disable-backgrounding-occluded-windows",
+		"--disable-renderer-backgrounding",
 	],
 	"experimental_options": {
 		"excludeSwitches": ["enable-automation"],
@@ -40,23 +52,38 @@ CHROME_CONFIG = {
 }
 
 class TwitchCapture:
+	"""Captures frames of one or more Twitch channels, one browser tab per channel."""
 	def __init__(
 		self, 
 		server_port: int, 
-		images_dir: str = "context/images"
+		images_dir: str = "context/images",
+		backend: str = "screenshot",
+		channels: Optional[List[str]] = None
 	):
 		self.images_dir = images_dir
+		self.backend = backend if backend in CAPTURE_BACKENDS else "screenshot"
+		self.channels = channels or [DEFAULT_CHANNEL]
+		self.screencasts: Dict[str, "Screencast"] = {}
 		self.server_port = server_port
 		self.driver: Optional[webdriver.Chrome] = None
-		self.embed_url = f"http://localhost:{self.server_port}/twitch.html"
+		self.tabs: Dict[str, Dict[str, str]] = {} # driver session id -> channel -> window handle
+		self.lock = threading.RLock() # WebDriver sessions are not thread safe
 		
 		# Create images directory if it does not exist
 		os.makedirs(self.images_dir, exist_ok=True)
 
+	def embed_url(self, channel: str) -> str:
+		return f"http://localhost:{self.server_port}/twitch.html?channel={quote(channel)}"
+
 	def init(self) -> None:
 		"""Set up the Selenium WebDriver for browser automation."""
 		if self.driver:
 			return
+		self.driver = self.create_driver()
+		self._start_screencasts()
+
+	def create_driver(self) -> webdriver.Chrome:
+		"""Start a new Chrome session with an embed tab loaded for every channel."""
 		# Add options
 		options = Options()
 		for option in CHROME_CONFIG["arguments"]:
@@ -66,44 +93,104 @@ class TwitchCapture:
 		for key, value in CHROME_CONFIG["experimental_options"].items():
 			options.add_experimental_option(key, value)
 		
-		self.driver = webdriver.Chrome(options=options)
+		driver = webdriver.Chrome(options=options)
 		logger.info("Initialized Chrome WebDriver")
 		
-		# Load the embed page once
-		self._load_embed_page()
+		# Load the embed page once per channel, each in its own tab
+		try:
+			tabs = {}
+			for i, channel in enumerate(self.channels):
+				if i > 0:
+					driver.switch_to.new_window("tab")
+				self._load_embed_page(driver, channel)
+				tabs[channel] = driver.current_window_handle
+			self.tabs[driver.session_id] = tabs
+		except Exception:
+			driver.quit()
+			raise
+		return driver
+
+	def swap(self, driver: webdriver.Chrome) -> Optional[webdriver.Chrome]:
+		"""Atomically replace the active driver and return the previous one."""
+		with self.lock:
+			previous, self.driver = self.driver, driver
+			if previous:
+				self.tabs.pop(previous.session_id, None)
+			self._start_screencasts()
+		return previous
 
-	def _load_embed_page(self) -> None:
+	def _select(self, channel: Optional[str]) -> str:
+		"""Switch the driver to the channel's tab (call with the lock held) and return the channel."""
+		channel = channel or self.channels[0]
+		if len(self.channels) > 1:
+			self.driver.switch_to.window(self.tabs[self.driver.session_id][channel])
+		return channel
+
+	def _start_screencasts(self) -> None:
+		"""Stream frames of every tab of the active driver when the screencast backend is selected."""
+		if self.backend != "screencast":
+			return
+		from .screencast import Screencast
+		for screencast in self.screencasts.values():
+			screencast.stop()
+		self.screencasts = {}
+		for channel, handle in self.tabs[self.driver.session_id].items():
+			self.screencasts[channel] = Screencast(self.driver, self.lock, handle=handle)
+			self.screencasts[channel].start()
+
+	def _screencast_frame(self, channel: Optional[str]) -> Optional[bytes]:
+		"""Latest screencast frame of a channel if it is recent enough to use."""
+		screencast = self.screencasts.get(channel or self.channels[0])
+		if not screencast:
+			return None
+		latest = screencast.latest()
+		if latest is None or time.time() - latest[1] > SCREENCAST_MAX_AGE:
+			return None
+		return latest[0]
+
+	def _load_embed_page(self, driver: webdriver.Chrome, channel: str) -> None:
 		"""Load the Twitch embed page once and wait for it to initialize."""
 		try:
-			logger.info(f"Loading Twitch embed via HTTP: {self.embed_url}")
-			self.driver.get(self.embed_url)
-			self._wait_for_embed_loading()
+			embed_url = self.embed_url(channel)
+			logger.info(f"Loading Twitch embed via HTTP: {embed_url}")
+			driver.get(embed_url)
+			self._wait_for_embed_loading(driver)
 			logger.info("Twitch embed loaded successfully")
 		except Exception as e:
 			logger.error(f"Error loading Twitch embed: {e}")
 			raise
 
-	def _wait_for_embed_loading(self) -> None:
+	def _wait_for_embed_loading(self, driver: webdriver.Chrome) -> None:
 		"""Wait for the embed to load completely."""
 		try:
 			# wait for iframe
-			WebDriverWait(self.driver, EMBED_LOAD_TIMEOUT).until(
+			WebDriverWait(driver, EMBED_LOAD_TIMEOUT).until(
 				EC.presence_of_element_located((By.TAG_NAME, "iframe"))
 			)
 			time.sleep(10) # DO NOT remove or screenshots will be obstructed by other elements
 		except Exception as e:
 			logger.warning(f"Timeout waiting for embed to load: {e}")
 
-	def capture_screenshot(self) -> str:
-		"""Capture a screenshot of the twitch stream."""
+	def capture_screenshot(self, channel: Optional[str] = None) -> str:
+		"""Capture a screenshot of a twitch stream, the first channel by default."""
 		try:
 			# Make sure we have a driver
 			if not self.driver:
 				self.init()
 					
 			timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S_UTC")
-			filename = f"{self.images_dir}/{timestamp}.png"
-			self.driver.save_screenshot(filename)
+			if len(self.channels) > 1:
+				timestamp = f"{timestamp}_{channel or self.channels[0]}"
+			frame = self._screencast_frame(channel)
+			if frame is not None:
+				filename = f"{self.images_dir}/{timestamp}.jpg"
+				with open(filename, "wb") as f:
+					f.write(frame)
+			else:
+				filename = f"{self.images_dir}/{timestamp}.png"
+				with self.lock:
+					self._select(channel)
+					self.driver.save_screenshot(filename)
 			logger.info(f"Screenshot saved to {filename}")
 			return filename
 				
@@ -111,9 +198,24 @@ class TwitchCapture:
 			logger.error(f"Error capturing screenshot: {e}")
 			raise
 
+	def capture_frame(self, channel: Optional[str] = None) -> bytes:
+		"""Capture the current frame as PNG (or screencast JPEG) bytes without writing it to disk."""
+		if not self.driver:
+			self.init()
+		frame = self._screencast_frame(channel)
+		if frame is not None:
+			return frame
+		with self.lock:
+			self._select(channel)
+			return self.driver.get_screenshot_as_png()
+
 	def cleanup(self):
 		"""Close browser and clean up resources."""
-		if self.driver:
-			self.driver.quit()
-			self.driver = None
-			logger.info("WebDriver session closed")
\ No newline at end of file
+		for screencast in self.screencasts.values():
+			screencast.stop()
+		self.screencasts = {}
+		with self.lock:
+			if self.driver:
+				self.driver.quit()
+				self.driver = None
+				logger.info("WebDriver session closed")
\ No newline at end of file
@@ -0,0 +1,155 @@
+import io
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Deque, List, Optional, Tuple
+
+from PIL import Image
+
+from common.images import crop_game_area
+
+logger = logging.getLogger(__name__)
+
+CLIPS_DIR = "context/clips"
+CLIP_FPS = float(os.getenv("CLIP_FPS", "0")) # 0 picks the default of the capture backend
+SCREENCAST_FPS = 2 # Screencast frames are already in memory and cost no browser round trip
+SCREENSHOT_FPS = 0.5 # WebDriver screenshots hold the capture lock, sample them sparingly
+CLIP_BUFFER_BYTES = int(os.getenv("CLIP_BUFFER_BYTES", str(32 * 1024 * 1024)))
+CLIP_SCORE_THRESHOLD = int(os.getenv("CLIP_SCORE_THRESHOLD", "8"))
+CLIP_SECONDS_BEFORE = 8
+CLIP_SECONDS_AFTER = 4
+FRAME_WIDTH = 480 # Width of buffered frames
+FRAME_QUALITY = 70
+MAX_PENDING_CLIPS = 2 # Extra highlights are dropped while the encoder is busy
+MAX_CLIPS = 100
+
+class FrameRingBuffer(threading.Thread):
+	"""Samples low resolution frames from the browser into a byte-capped ring buffer.
+
+	With the screencast backend the latest streamed frame is reused, otherwise a
+	full WebDriver screenshot is taken at a much lower rate.
+	"""
+	def __init__(self, capture, fps: float = CLIP_FPS, max_bytes: int = CLIP_BUFFER_BYTES):
+		super().__init__(daemon=True, name="frame-buffer")
+		self.capture = capture
+		fps = fps or (SCREENCAST_FPS if getattr(capture, "backend", None) == "screencast" else SCREENSHOT_FPS)
+		self.interval = 1 / fps
+		self.max_bytes = max_bytes
+		self.frames: Deque[Tuple[float, bytes]] = deque() # (unix time, jpeg bytes)
+		self.size = 0
+		self.lock = threading.Lock()
+		self.stopped = threading.Event()
+
+	def run(self) -> None:
+		"""Sample frames until stopped, skipping ticks rather than falling behind."""
+		next_tick = time.monotonic()
+		previous = None
+		while not self.stopped.is_set():
+			try:
+				frame = self.capture.capture_frame()
+				if frame is not previous: # The screencast has not sent a new frame since the last tick
+					self._add(time.time(), self._downscale(frame))
+					previous = frame
+			except Exception as e:
+				logger.warning(f"Error sampling frame: {e}")
+			next_tick = max(next_tick + self.interval, time.monotonic())
+			self.stopped.wait(next_tick - time.monotonic())
+
+	def stop(self) -> None:
+		self.stopped.set()
+
+	def _downscale(self, png: bytes) -> bytes:
+		"""Crop to the game area and shrink a full frame to a small JPEG."""
+		with Image.open(io.BytesIO(png)) as image:
+			image = crop_game_area(image.convert("RGB"))
+			height = max(1, round(image.height * FRAME_WIDTH / image.width))
+			image = image.resize((FRAME_WIDTH, height), Image.Resampling.BILINEAR)
+			buffer = io.BytesIO()
+			image.save(buffer, format="JPEG", quality=FRAME_QUALITY)
+			return buffer.getvalue()
+
+	def _add(self, timestamp: float, frame: bytes) -> None:
+		"""Append a frame and drop the oldest ones to stay within the byte budget."""
+		with self.lock:
+			self.frames.append((timestamp, frame))
+			self.size += len(frame)
+			while self.size > self.max_bytes and self.frames:
+				self.size -= len(self.frames.popleft()[1])
+
+	def frames_between(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+		"""Return buffered frames with start <= timestamp <= end."""
+		with self.lock:
+			return [(timestamp, frame) for timestamp, frame in self.frames if start <= timestamp <= end]
+
+class ClipExporter:
+	"""Encodes highlight clips from the frame buffer on a background worker."""
+	def __init__(self, buffer: FrameRingBuffer, clips_dir: str = CLIPS_DIR):
+		self.buffer = buffer
+		self.clips_dir = Path(clips_dir)
+		self.clips_dir.mkdir(parents=True, exist_ok=True)
+		self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-export")
+		self.pending = 0
+		self.lock = threading.Lock()
+
+	def request(self, timestamp: float, on_done: Callable[[Optional[str]], None]) -> bool:
+		"""Schedule a clip around timestamp, on_done gets the clip path once it is written or None if it failed.
+
+		Returns False without calling on_done when the encoder is already busy with MAX_PENDING_CLIPS clips.
+		"""
+		with self.lock:
+			if self.pending >= MAX_PENDING_CLIPS:
+				logger.warning("Clip encoder busy, skipping highlight clip")
+				return False
+			self.pending += 1
+		name = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d_%H%M%S_UTC")
+		self.executor.submit(self._export, timestamp, self.clips_dir / f"{name}.gif", on_done)
+		return True
+
+	def stop(self) -> None:
+		"""Finish the pending clips, their callbacks still save the analyses."""
+		self.executor.shutdown(wait=True)
+
+	def _export(self, timestamp: float, clip_path: Path, on_done: Callable[[Optional[str]], None]) -> None:
+		"""Wait for the frames after the highlight, encode the clip and report the result."""
+		saved = None
+		try:
+			delay = timestamp + CLIP_SECONDS_AFTER - time.time()
+			if delay > 0:
+				time.sleep(delay)
+			frames = self.buffer.frames_between(timestamp - CLIP_SECONDS_BEFORE, timestamp + CLIP_SECONDS_AFTER)
+			if len(frames) < 2:
+				logger.warning(f"Not enough buffered frames for clip {clip_path}")
+				return
+			self._encode_gif(frames, clip_path)
+			saved = str(clip_path)
+			logger.info(f"Highlight clip saved to {clip_path} ({len(frames)} frames)")
+			self._prune()
+		except Exception as e:
+			logger.error(f"Error exporting clip {clip_path}: {e}")
+		finally:
+			with self.lock:
+				self.pending -= 1
+			on_done(saved)
+
+	def _encode_gif(self, frames: List[Tuple[float, bytes]], clip_path: Path) -> None:
+		"""Write frames as a looping GIF, keeping their real timing."""
+		images = [Image.open(io.BytesIO(frame)).convert("P", palette=Image.Palette.ADAPTIVE) for _, frame in frames]
+		durations = [
+			max(20, round((next_time - time_) * 1000))
+			for (time_, _), (next_time, _) in zip(frames, frames[1:])
+		]
+		durations.append(durations[-1])
+		tmp_path = clip_path.with_suffix(".tmp")
+		images[0].save(tmp_path, format="GIF", save_all=True, append_images=images[1:], duration=durations, loop=0, optimize=True)
+		os.replace(tmp_path, clip_path) # Readers never see a partial clip
+
+	def _prune(self) -> None:
+		"""Keep only the newest MAX_CLIPS clips."""
+		clips = sorted(self.clips_dir.glob("*.gif"), key=lambda path: path.stat().st_mtime)
+		for old_clip in clips[:-MAX_CLIPS]:
+			old_clip.unlink(missing_ok=True)
@@ -1,9 +1,12 @@
 import json
 import logging
+import threading
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+_lock = threading.Lock() # Analyses of several channels are saved from worker threads
+
 def save_to_context(
 	analysis_result: dict,
 	context_dir: str = "context/monitor", 
@@ -23,7 +26,30 @@ def save_to_context(
 	context_path = context_dir_path / context_filename
 
 	# Append the data as json line
-	with open(context_path, 'a') as f:
+	with _lock, open(context_path, 'a') as f:
 		f.write(json.dumps(analysis_result) + '\n')
 
-	logger.info(f"Analysis saved to {context_path}")
\ No newline at end of file
+	logger.info(f"Analysis saved to {context_path}")
+
+def last_job_id(
+	context_dir: str = "context/monitor", 
+	context_filename: str = "context.jsonl"
+) -> int:
+	"""Return the highest queue job id saved to the context file, 0 if there is none.
+
+	Only the tail of the file is read, results are committed in job order.
+	"""
+	context_path = Path(context_dir) / context_filename
+	if not context_path.exists():
+		return 0
+	with open(context_path, 'rb') as f:
+		f.seek(0, 2)
+		f.seek(max(0, f.tell() - 256 * 1024))
+		tail = f.read().decode(errors="ignore").splitlines()
+	job_ids = [0]
+	for line in tail:
+		try:
+			job_ids.append(json.loads(line).get("job_id") or 0)
+		except (json.JSONDecodeError, AttributeError):
+			continue
+	return max(job_ids)
@@ -0,0 +1,192 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "context/queue.db"
+DEFAULT_LEASE_SECS = 120 # A claimed job returns to the queue if its worker does not finish in time
+DEFAULT_MAX_ATTEMPTS = 3 # Claims before a job is given up on
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	channel TEXT NOT NULL,
+	image_path TEXT NOT NULL,
+	capture_time REAL NOT NULL,
+	status TEXT NOT NULL DEFAULT 'queued', -- queued, leased, done, failed
+	lease_owner TEXT,
+	lease_expires REAL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	result TEXT,
+	committed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_committed ON jobs (committed, id);
+"""
+
+@dataclass
+class Job:
+	id: int
+	channel: str
+	image_path: str
+	capture_time: float
+	attempts: int
+	result: Optional[Dict[str, Any]] = None
+
+class JobQueue:
+	"""Durable frame analysis queue with visibility leases, backed by SQLite.
+
+	The monitor agent enqueues captured frames and commits results, any number of
+	worker processes claim jobs under a lease. A job whose lease expires is handed
+	to the next worker, the first result written wins so redelivered jobs are
+	harmless. Results are committed strictly in capture order, a job that keeps
+	failing is marked failed after max_attempts so it cannot block the queue.
+	The database runs in WAL mode, which relies on shared memory, so it must stay
+	on the monitor's host and never on a network share. Workers on the same host
+	open it directly, workers on other nodes go through monitor.remote.JobQueueAPI.
+	"""
+	def __init__(
+		self,
+		path: str = DEFAULT_QUEUE_PATH,
+		lease_secs: float = DEFAULT_LEASE_SECS,
+		max_attempts: int = DEFAULT_MAX_ATTEMPTS
+	):
+		self.path = path
+		self.lease_secs = lease_secs
+		self.max_attempts = max_attempts
+		self.local = threading.local() # sqlite3 connections cannot be shared between threads
+		Path(path).parent.mkdir(parents=True, exist_ok=True)
+		with self._connect() as db:
+			db.executescript(SCHEMA)
+
+	def _connect(self) -> sqlite3.Connection:
+		db = getattr(self.local, "db", None)
+		if db is None:
+			db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+			db.execute("PRAGMA journal_mode=WAL") # Local disk only, WAL is unsafe on network filesystems
+			db.execute("PRAGMA synchronous=NORMAL")
+			self.local.db = db
+		return db
+
+	def _transaction(self):
+		"""Start a write transaction, taking the database lock up front so claims never race."""
+		db = self._connect()
+		db.execute("BEGIN IMMEDIATE")
+		return db
+
+#-------------------------------------------------------------------
+# Producer (monitor agent)
+#-------------------------------------------------------------------
+	def enqueue(self, image_path: str, capture_time: float, channel: str = "") -> int:
+		"""Add a captured frame to the queue and return its job id."""
+		cursor = self._connect().execute(
+			"INSERT INTO jobs (channel, image_path, capture_time) VALUES (?, ?, ?)",
+			(channel, image_path, capture_time)
+		)
+		return cursor.lastrowid
+
+	def backlog(self) -> int:
+		"""Number of jobs not yet committed."""
+		return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE committed = 0").fetchone()[0]
+
+	def ready(self, after: int = 0) -> List[Job]:
+		"""Return finished, uncommitted jobs in order, stopping at the first unfinished job.
+
+		Jobs with an id up to `after` were saved before a restart, they are marked
+		committed without being returned.
+		"""
+		if after:
+			self.mark_committed(after)
+		rows = self._connect().execute(
+			"SELECT id, channel, image_path, capture_time, attempts, status, result "
+			"FROM jobs WHERE committed = 0 ORDER BY id"
+		).fetchall()
+		ready = []
+		for id, channel, image_path, capture_time, attempts, status, result in rows:
+			if status not in ("done", "failed"):
+				break
+			ready.append(Job(id, channel, image_path, capture_time, attempts, json.loads(result) if result else None))
+		return ready
+
+	def image_path(self, job_id: int) -> Optional[str]:
+		"""Path of a job's frame, None for unknown jobs."""
+		row = self._connect().execute("SELECT image_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+		return row[0] if row else None
+
+	def uncommitted_images(self) -> List[str]:
+		"""Frames of jobs whose results have not been saved yet."""
+		return [row[0] for row in self._connect().execute("SELECT image_path FROM jobs WHERE committed = 0 ORDER BY id")]
+
+	def mark_committed(self, job_id: int) -> None:
+		"""Mark every job up to job_id as committed once its result has been saved."""
+		self._connect().execute("UPDATE jobs SET committed = 1 WHERE committed = 0 AND id <= ?", (job_id,))
+
+	def prune(self, keep: int = 1000) -> None:
+		"""Delete committed jobs except the most recent ones."""
+		self._connect().execute(
+			"DELETE FROM jobs WHERE committed = 1 AND id <= (SELECT MAX(id) FROM jobs) - ?",
+			(keep,)
+		)
+
+#-------------------------------------------------------------------
+# Consumer (workers)
+#-------------------------------------------------------------------
+	def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+		"""Lease up to `limit` of the oldest available jobs, including jobs with an expired lease."""
+		now = time.time()
+		db = self._transaction()
+		try:
+			# Jobs that exhausted their attempts are failed instead of being retried forever
+			db.execute(
+				"UPDATE jobs SET status = 'failed', lease_owner = NULL "
+				"WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+				(now, self.max_attempts)
+			)
+			rows = db.execute(
+				"SELECT id, channel, image_path, capture_time, attempts FROM jobs "
+				"WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+				"ORDER BY id LIMIT ?",
+				(now, limit)
+			).fetchall()
+			for row in rows:
+				if row[4] > 0:
+					logger.warning(f"Retrying job {row[0]} (attempt {row[4] + 1})")
+				db.execute(
+					"UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+					(worker_id, now + self.lease_secs, row[0])
+				)
+			db.execute("COMMIT")
+		except Exception:
+			db.execute("ROLLBACK")
+			raise
+		return [Job(id, channel, image_path, capture_time, attempts + 1) for id, channel, image_path, capture_time, attempts in rows]
+
+	def extend(self, job_id: int, worker_id: str) -> bool:
+		"""Renew a lease still held by this worker."""
+		cursor = self._connect().execute(
+			"UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+			(time.time() + self.lease_secs, job_id, worker_id)
+		)
+		return cursor.rowcount == 1
+
+	def complete(self, job_id: int, result: Dict[str, Any]) -> bool:
+		"""Store a job's result. Idempotent: only the first result for a job is kept."""
+		cursor = self._connect().execute(
+			"UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL WHERE id = ? AND status IN ('queued', 'leased')",
+			(json.dumps(result), job_id)
+		)
+		return cursor.rowcount == 1
+
+	def release(self, job_id: int, worker_id: str) -> None:
+		"""Return a leased job to the queue after an error, or fail it once out of attempts."""
+		self._connect().execute(
+			"UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, lease_owner = NULL "
+			"WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+			(self.max_attempts, job_id, worker_id)
+		)
@@ -1,26 +1,46 @@
 import os
 import json
 import base64
+import mimetypes
 import logging
-import requests
-import tiktoken
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional, Tuple
 
-from .prompts import MONITOR_SYSTEM_PROMPT
-from .validate import validate_response,sanitize_results, get_default_response, count_tokens
+from .prompts import MONITOR_SYSTEM_PROMPT, MONITOR_BATCH_PROMPT
+from .validate import validate_response, validate_batch_response, sanitize_results, check_results, get_default_response
+from common.tokens import count_message_tokens
+from common.client import ChatClient
+from common.budget import BudgetGovernor
+from common.cache import ResponseCache
+from common.ratelimit import RateLimiter, PRIORITY_LOW
 
 logger = logging.getLogger(__name__)
 
+IMAGE_PROMPT_TEXT = "Screenshot of Claude playing Pokemon Red/Blue on Twitch"
+
 AVAILABLE_MODELS = [
 	"google/gemini-2.0-flash-lite-preview-02-05:free",
 	"google/gemini-2.0-flash-lite-001",
 	"google/gemini-2.0-flash-001"
 ]
+CHEAP_MODELS = AVAILABLE_MODELS[:-1] # Fast models used for mundane frames and the first cascade tier
+STRONG_MODELS = AVAILABLE_MODELS[-1:] # Used for key moments
 
 class ImageAnalyzer:
 	"""Analyzes Pokemon gameplay images using LLM models"""
-	def __init__(self, api_key: str, model: str = None):
+	def __init__(
+		self, 
+		api_key: str, 
+		model: str = None,
+		scene_policy: Optional[Dict[str, str]] = None,
+		scene_min_confidence: float = 0.6,
+		cascade: bool = False,
+		cascade_threshold: int = 7,
+		response_cache: Optional[ResponseCache] = None,
+		prompt_cache: bool = False,
+		rate_limiter: Optional[RateLimiter] = None,
+		budget: Optional[BudgetGovernor] = None
+	):
 		self.api_key = api_key
 		self.model = model if model in AVAILABLE_MODELS else AVAILABLE_MODELS[0]
 		self.api_url = "https://openrouter.ai/api/v1/chat/completions"
@@ -28,9 +48,27 @@ class ImageAnalyzer:
 		if not api_key:
 			logger.error("No OpenRouter API key provided")
 			raise ValueError("OpenRouter API key is required")
+		self.client = ChatClient(
+			api_key, 
+			self.api_url, 
+			response_cache=response_cache, 
+			prompt_cache=prompt_cache, 
+			rate_limiter=rate_limiter,
+			budget=budget
+		)
 
-		self.encoder = tiktoken.encoding_for_model("gpt-4") # Initialize tiktoken encoder
+		# Scene routing (scene -> best/cheap/skip), disabled when None
+		self.scene_policy = scene_policy
+		self.scene_min_confidence = scene_min_confidence
+		# Cascade mode: cheap tier first, strong tier only when the score passes cascade_threshold
+		self.cascade = cascade
+		self.cascade_threshold = cascade_threshold
 		
+	def _image_url(self, image_path: str) -> str:
+		"""Data URL of an image with the mime type matching its format."""
+		mime_type = mimetypes.guess_type(image_path)[0] or "image/png"
+		return f"data:{mime_type};base64,{self._encode_image(image_path)}"
+
 	def _encode_image(self, image_path: str) -> str:
 		"""Encode image to base64."""
 		if not os.path.exists(image_path):
@@ -40,22 +78,113 @@ class ImageAnalyzer:
 			return base64.b64encode(image_file.read()).decode('utf-8')
             
 	def _count_tokens(self, messages: List[Dict]) -> int:
-		"""Count input and output tokens using tiktoken."""
-		token_count = 0
-		for message in messages:
-			if isinstance(message.get('content'), str):
-				token_count += count_tokens(message['content'], self.encoder)
-			elif isinstance(message.get('content'), list):
-				for content in message['content']:
-					if content['type'] == 'text':
-						token_count += count_tokens(content['text'], self.encoder)
-		return token_count
+		"""Count input tokens, static prompts are only tokenized once per process."""
+		return count_message_tokens(messages, static=(MONITOR_SYSTEM_PROMPT, MONITOR_BATCH_PROMPT, IMAGE_PROMPT_TEXT))
+
+	def _route(self, image_path: str) -> Tuple[Optional[str], float, Optional[str]]:
+		"""Classify the frame locally and return (scene, confidence, action). No action means default routing."""
+		from .scene import classify_image # numpy is only loaded when routing is enabled
+		try:
+			scene, confidence = classify_image(image_path)
+		except Exception as e:
+			logger.warning(f"Scene classification failed for {image_path}: {e}")
+			return None, 0.0, None
+
+		if confidence < self.scene_min_confidence:
+			return scene, confidence, None
+		return scene, confidence, self.scene_policy.get(scene, "cheap")
+
+	def _request(
+		self, 
+		messages: List[Dict], 
+		models: List[str], 
+		image_path: str, 
+		timestamp: str, 
+		input_tokens: int
+	) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+		"""Try models in order and return (sanitized result, problems with the raw response)."""
+		# Iterate through available models until request is processed
+		for model in models:
+			payload = {
+				"model": model,
+				"messages": messages,
+				"response_format": {"type": "json_object"}
+			}
+			try:
+				logger.info(f"Analyzing {image_path} (model: {model})")
+				status_code, data, cache_key = self.client.send(payload, priority=PRIORITY_LOW) # Routine frames yield to post decisions
+
+				if status_code != 200:
+					if status_code == 429:
+						logger.warning(f"Rate limit exceeded for model {model}, trying next model")
+						continue
+					else:
+						logger.error(f"HTTP error with model {model}: {status_code}")
+						continue
+
+				# Let validate_api_response handle all the validation
+				validated_result = validate_response(
+					data, 
+					image_path, 
+					timestamp, 
+					model, 
+					input_tokens
+				)
+				
+				# Sanitize the response
+				problems = check_results(validated_result)
+				result = sanitize_results(validated_result, image_path, timestamp, model)
+				self.client.remember(cache_key, data)
+				logger.info(f"Analysis of {image_path} successful!")
+				return result, problems
+				
+			except Exception as e:
+				logger.error(f"Error with model {model}: {e}")
+				continue
+
+		return None, []
+
+	def _cascade(self, messages: List[Dict], image_path: str, timestamp: str, input_tokens: int) -> Optional[Dict[str, Any]]:
+		"""Analyze with the cheap tier and escalate to the strong tier for key moments or bad output."""
+		cheap, problems = self._request(messages, CHEAP_MODELS, image_path, timestamp, input_tokens)
+		if cheap is not None and not problems and cheap["score"] < self.cascade_threshold:
+			return {**cheap, "tier": "cheap"}
+
+		reason = "failed" if cheap is None else f"invalid fields {problems}" if problems else f"score {cheap['score']}"
+		logger.info(f"Escalating {image_path} to the strong tier ({reason})")
+		strong, _ = self._request(messages, STRONG_MODELS, image_path, timestamp, input_tokens)
+		if strong is None:
+			return {**cheap, "tier": "cheap"} if cheap is not None else None
+
+		strong["tier"] = "strong"
+		if cheap is not None:
+			# Keep the cheap tier's answer next to the strong one for later comparison
+			strong["cascade"] = {
+				"tier": "cheap",
+				"model": cheap["model"],
+				"score": cheap["score"],
+				"detailed_summary": cheap["detailed_summary"],
+				"estimated_location": cheap["estimated_location"],
+				"problems": problems,
+				"token_usage": cheap["token_usage"]
+			}
+		return strong
 		
-	def analyze_image(self, image_path: str) -> Dict[str, Any]:
-		"""Analyze a Twitch gameplay image and return structured data."""
+	def analyze_image(self, image_path: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+		"""Analyze a Twitch gameplay image and return structured data. Timestamps default to now."""
 		try:
-			timestamp = datetime.now(timezone.utc).isoformat()
-			base64_image = self._encode_image(image_path)
+			timestamp = timestamp or datetime.now(timezone.utc).isoformat()
+
+			# Route the frame by scene type before paying for a vision call
+			action, scene = None, {}
+			if self.scene_policy:
+				scene_type, confidence, action = self._route(image_path)
+				scene = {"scene": scene_type, "scene_confidence": confidence}
+				if action == "skip":
+					logger.info(f"Skipping {image_path} (scene: {scene_type}, confidence: {confidence})")
+					return {**get_default_response(image_path, timestamp), **scene, "skipped": True}
+
+			image_url = self._image_url(image_path)
 			messages = [
 				{
 					"role": "system", 
@@ -66,12 +195,12 @@ class ImageAnalyzer:
 					"content": [
 						{
 							"type": "text",
-							"text": "Screenshot of Claude playing Pokemon Red/Blue on Twitch"
+							"text": IMAGE_PROMPT_TEXT
 						},
 						{
 							"type": "image_url",
 							"image_url": {
-								"url": f"data:image/png;base64,{base64_image}"
+								"url": image_url
 							}
 						}
 					]
@@ -80,52 +209,116 @@ class ImageAnalyzer:
 
 			input_tokens = self._count_tokens(messages)
 
-			headers = {
-				"Authorization": f"Bearer {self.api_key}",
-				"Content-Type": "application/json"
-			}
-			
-			# Iterate through available models until request is processed
-			for model in AVAILABLE_MODELS:
-				payload = {
-					"model": model,
-					"messages": messages,
-					"response_format": {"type": "json_object"}
-				}
-				try:
-					logger.info(f"Analyzing {image_path} (model: {model})")
-					response = requests.post(self.api_url, json=payload, headers=headers)
-
-					if response.status_code != 200:
-						if response.status_code == 429:
-							logger.warning(f"Rate limit exceeded for model {model}, trying next model")
-							continue
-						else:
-							logger.error(f"HTTP error with model {model}: {response.status_code}")
-							continue
-
-					# Let validate_api_response handle all the validation
-					validated_result = validate_response(
-						response.json(), 
-						image_path, 
-						timestamp, 
-						model, 
-						input_tokens,
-						self.encoder
-					)
-					
-					# Sanitize the response
-					result = sanitize_results(validated_result, image_path, timestamp, model)
-					logger.info(f"Analysis of {image_path} successful!")
-					return result
-					
-				except Exception as e:
-					logger.error(f"Error with model {model}: {e}")
-					continue
+			if action == "best":
+				result, _ = self._request(messages, STRONG_MODELS + CHEAP_MODELS, image_path, timestamp, input_tokens)
+			elif self.cascade:
+				result = self._cascade(messages, image_path, timestamp, input_tokens)
+			elif action == "cheap":
+				result, _ = self._request(messages, CHEAP_MODELS, image_path, timestamp, input_tokens)
+			else:
+				result, _ = self._request(messages, AVAILABLE_MODELS, image_path, timestamp, input_tokens)
 
-			logger.error("All models failed to analyze the image")
-			return get_default_response(image_path, timestamp)
+			if result is None:
+				logger.error("All models failed to analyze the image")
+				return {**get_default_response(image_path, timestamp), **scene}
+			return {**result, **scene}
 				
 		except Exception as e:
 			logger.error(f"Error analyzing image: {e}")
-			return get_default_response(image_path, timestamp)
\ No newline at end of file
+			return get_default_response(image_path, timestamp)
+
+	def analyze_batch(self, frames: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+		"""Analyze several (image_path, timestamp) frames in a single request.
+
+		Returns one result per frame, in order, with each frame's own image path and timestamp.
+		"""
+		results: List[Optional[Dict[str, Any]]] = [None] * len(frames)
+		try:
+			# Scene routing applies per frame, skipped frames never reach the model
+			batch, actions = [], set()
+			for index, (image_path, timestamp) in enumerate(frames):
+				scene = {}
+				if self.scene_policy:
+					scene_type, confidence, action = self._route(image_path)
+					scene = {"scene": scene_type, "scene_confidence": confidence}
+					if action == "skip":
+						logger.info(f"Skipping {image_path} (scene: {scene_type}, confidence: {confidence})")
+						results[index] = {**get_default_response(image_path, timestamp), **scene, "skipped": True}
+						continue
+					actions.add(action)
+				batch.append((index, image_path, timestamp, scene))
+
+			if batch:
+				content = []
+				for number, (_, image_path, timestamp, _) in enumerate(batch, start=1):
+					content.append({"type": "text", "text": f"Frame {number} (captured {timestamp})"})
+					content.append({
+						"type": "image_url",
+						"image_url": {
+							"url": self._image_url(image_path)
+						}
+					})
+				messages = [
+					{
+						"role": "system", 
+						"content": MONITOR_BATCH_PROMPT
+					},
+					{
+						"role": "user",
+						"content": content
+					}
+				]
+				input_tokens = self._count_tokens(messages)
+				if "best" in actions:
+					models = STRONG_MODELS + CHEAP_MODELS
+				elif actions == {"cheap"}:
+					models = CHEAP_MODELS
+				else:
+					models = AVAILABLE_MODELS
+
+				analyses = self._request_batch(messages, models, len(batch), input_tokens)
+				for (index, image_path, timestamp, scene), (model, analysis) in zip(batch, analyses):
+					if model is not None and analysis is not None: # None when the model left the frame out
+						results[index] = {**sanitize_results(analysis, image_path, timestamp, model), **scene}
+					else:
+						results[index] = {**get_default_response(image_path, timestamp), **scene}
+
+		except Exception as e:
+			logger.error(f"Error analyzing batch: {e}")
+
+		# Anything that failed falls back to the default response
+		return [
+			result if result is not None else get_default_response(image_path, timestamp)
+			for result, (image_path, timestamp) in zip(results, frames)
+		]
+
+	def _request_batch(self, messages: List[Dict], models: List[str], frame_count: int, input_tokens: int) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+		"""Try models in order and return (model, raw analysis) per frame."""
+		for model in models:
+			payload = {
+				"model": model,
+				"messages": messages,
+				"response_format": {"type": "json_object"}
+			}
+			try:
+				logger.info(f"Analyzing batch of {frame_count} frames (model: {model})")
+				status_code, data, cache_key = self.client.send(payload, priority=PRIORITY_LOW) # Routine frames yield to post decisions
+
+				if status_code != 200:
+					if status_code == 429:
+						logger.warning(f"Rate limit exceeded for model {model}, trying next model")
+					else:
+						logger.error(f"HTTP error with model {model}: {status_code}")
+					continue
+
+				analyses = validate_batch_response(data, frame_count, input_tokens)
+				self.client.remember(cache_key, data)
+				logger.info(f"Analysis of batch successful!")
+				return [(model, analysis) for analysis in analyses]
+
+			except Exception as e:
+				logger.error(f"Error with model {model}: {e}")
+				continue
+
+		logger.error("All models failed to analyze the batch")
+		return [(None, {}) for _ in range(frame_count)]
@@ -45,4 +45,16 @@ Here's an example response (Make sure you only respond in this format):
 	"score": 9,
 	"estimated_location": "Indigo Plateau - Elite Four Chamber"
 }
-"""
\ No newline at end of file
+"""
+MONITOR_BATCH_PROMPT = MONITOR_SYSTEM_PROMPT + """
+You will receive several screenshots in chronological order, each labelled "Frame <n>".
+Analyze every frame on its own using the rules and format above, but use the neighbouring frames to resolve what is happening.
+
+Respond with a JSON object containing one analysis per frame, in the same order as the frames:
+{
+	"analyses": [
+		{ "frame": 1, "detailed_summary": ..., "team_details": [...], "score": ..., "estimated_location": ... },
+		{ "frame": 2, ... }
+	]
+}
+"""
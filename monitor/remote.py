@@ -0,0 +1,156 @@
+import os
+import json
+import hmac
+import logging
+import mimetypes
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from common.files import resolve_image_path
+from .jobs import Job, JobQueue
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/jobs"
+LOOPBACK = ("127.0.0.1", "::1", "localhost")
+REQUEST_TIMEOUT = 30 # secs
+
+class JobQueueAPI:
+	"""Serves the monitor's job queue over HTTP so workers on other nodes can claim frames.
+
+	Mounted on the monitor's HTTP server under /jobs. Frames are sent as bytes,
+	the SQLite database never leaves the monitor host. Requests must carry the
+	QUEUE_TOKEN as a bearer token, without a token only loopback clients are
+	served. Usage reported in results is recorded in the monitor's budget ledger,
+	remote workers cannot write to it.
+	"""
+	def __init__(self, job_queue: JobQueue, token: str = "", budget=None):
+		self.job_queue = job_queue
+		self.token = token
+		self.budget = budget
+
+	def handles(self, path: str) -> bool:
+		return path == API_PREFIX or path.startswith(API_PREFIX + "/")
+
+	def handle(self, handler, method: str) -> None:
+		"""Answer a request on a BaseHTTPRequestHandler."""
+		try:
+			if not self._authorized(handler):
+				return self._send_json(handler, 401, {"error": "unauthorized"})
+			parts = handler.path.split("?")[0][len(API_PREFIX):].strip("/").split("/")
+			if method == "POST" and parts == ["claim"]:
+				body = self._read_json(handler)
+				jobs = self.job_queue.claim(body["worker_id"], limit=int(body.get("limit", 1)))
+				return self._send_json(handler, 200, {"jobs": [job_to_dict(job) for job in jobs]})
+			if len(parts) != 2 or not parts[0].isdigit():
+				return self._send_json(handler, 404, {"error": "not found"})
+
+			job_id, action = int(parts[0]), parts[1]
+			if method == "GET" and action == "image":
+				return self._send_image(handler, job_id)
+			if method != "POST" or action not in ("extend", "complete", "release"):
+				return self._send_json(handler, 404, {"error": "not found"})
+			body = self._read_json(handler)
+			if action == "extend":
+				ok = self.job_queue.extend(job_id, body["worker_id"])
+			elif action == "complete":
+				ok = self.job_queue.complete(job_id, body["result"])
+				if ok:
+					self._record_usage(body["result"])
+			else:
+				self.job_queue.release(job_id, body["worker_id"])
+				ok = True
+			self._send_json(handler, 200, {"ok": ok})
+		except (KeyError, TypeError, ValueError) as e:
+			self._send_json(handler, 400, {"error": f"bad request: {e}"})
+		except Exception as e:
+			logger.error(f"Error serving job queue request {handler.path}: {e}")
+			self._send_json(handler, 500, {"error": "internal error"})
+
+	def _authorized(self, handler) -> bool:
+		if not self.token:
+			return handler.client_address[0] in LOOPBACK
+		supplied = handler.headers.get("Authorization", "")
+		return hmac.compare_digest(supplied, f"Bearer {self.token}")
+
+	def _record_usage(self, result: Dict[str, Any]) -> None:
+		usage = result.get("token_usage")
+		if self.budget and result.get("model") and isinstance(usage, dict) and usage.get("total_tokens"):
+			self.budget.record(result["model"], usage)
+
+	def _send_image(self, handler, job_id: int) -> None:
+		image_path = self.job_queue.image_path(job_id)
+		image_path = resolve_image_path(image_path) if image_path else None
+		if not image_path or not os.path.exists(image_path):
+			return self._send_json(handler, 404, {"error": "image not found"})
+		with open(image_path, "rb") as f:
+			data = f.read()
+		handler.send_response(200)
+		handler.send_header("Content-Type", mimetypes.guess_type(image_path)[0] or "application/octet-stream")
+		handler.send_header("Content-Length", str(len(data)))
+		handler.end_headers()
+		handler.wfile.write(data)
+
+	def _read_json(self, handler) -> Dict[str, Any]:
+		length = int(handler.headers.get("Content-Length") or 0)
+		return json.loads(handler.rfile.read(length) or b"{}")
+
+	def _send_json(self, handler, status: int, body: Dict[str, Any]) -> None:
+		data = json.dumps(body).encode()
+		handler.send_response(status)
+		handler.send_header("Content-Type", "application/json")
+		handler.send_header("Content-Length", str(len(data)))
+		handler.end_headers()
+		handler.wfile.write(data)
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+	return {
+		"id": job.id,
+		"channel": job.channel,
+		"image_path": job.image_path,
+		"capture_time": job.capture_time,
+		"attempts": job.attempts
+	}
+
+class RemoteJobQueue:
+	"""Worker side of JobQueueAPI with the consumer methods of JobQueue.
+
+	Frames are downloaded into a local temporary directory for the analyzer,
+	fetch_image returns their path and the caller removes them when done.
+	"""
+	def __init__(self, url: str, token: str = "", download_dir: Optional[str] = None):
+		self.url = url.rstrip("/") + API_PREFIX
+		self.session = requests.Session()
+		if token:
+			self.session.headers["Authorization"] = f"Bearer {token}"
+		self.download_dir = download_dir or tempfile.mkdtemp(prefix="worker-frames-")
+		os.makedirs(self.download_dir, exist_ok=True)
+
+	def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+		response = self.session.post(f"{self.url}/{path}", json=body, timeout=REQUEST_TIMEOUT)
+		response.raise_for_status()
+		return response.json()
+
+	def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+		return [Job(**job) for job in self._post("claim", {"worker_id": worker_id, "limit": limit})["jobs"]]
+
+	def extend(self, job_id: int, worker_id: str) -> bool:
+		return self._post(f"{job_id}/extend", {"worker_id": worker_id})["ok"]
+
+	def complete(self, job_id: int, result: Dict[str, Any]) -> bool:
+		return self._post(f"{job_id}/complete", {"result": result})["ok"]
+
+	def release(self, job_id: int, worker_id: str) -> None:
+		self._post(f"{job_id}/release", {"worker_id": worker_id})
+
+	def fetch_image(self, job: Job) -> str:
+		"""Download a job's frame and return the local path."""
+		response = self.session.get(f"{self.url}/{job.id}/image", timeout=REQUEST_TIMEOUT)
+		response.raise_for_status()
+		extension = mimetypes.guess_extension(response.headers.get("Content-Type", "").split(";")[0]) or os.path.splitext(job.image_path)[1]
+		path = os.path.join(self.download_dir, f"{job.id}{extension}")
+		with open(path, "wb") as f:
+			f.write(response.content)
+		return path
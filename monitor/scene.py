@@ -0,0 +1,110 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from common.images import crop_game_area
+
+logger = logging.getLogger(__name__)
+
+SCENES = ("overworld", "text", "menu", "battle")
+FRAME_SIZE = (160, 144) # Game Boy resolution, frames are classified at native scale
+DEFAULT_POLICY = "battle:best,text:cheap,menu:cheap,overworld:cheap"
+ACTIONS = ("best", "cheap", "skip")
+
+LIGHT = 170 # Grey level of text box and menu backgrounds
+DARK = 90 # Grey level of borders and text
+
+def load_frame(image_path: str) -> np.ndarray:
+	"""Load a screenshot, crop it to the game area and scale it to Game Boy resolution."""
+	with Image.open(image_path) as image:
+		image = crop_game_area(image.convert("RGB"))
+		return np.asarray(image.resize(FRAME_SIZE, Image.Resampling.BILINEAR), dtype=np.uint8)
+
+def _longest_runs(mask: np.ndarray) -> np.ndarray:
+	"""Return the longest run of True values in each row of a 2D boolean mask."""
+	padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1)))
+	edges = np.diff(padded, axis=1)
+	runs = np.zeros(mask.shape[0], dtype=np.int64)
+	for row in range(mask.shape[0]):
+		starts = np.flatnonzero(edges[row] == 1)
+		if starts.size:
+			runs[row] = (np.flatnonzero(edges[row] == -1) - starts).max()
+	return runs
+
+def _bar_score(frame: np.ndarray, rows: slice, cols: slice) -> float:
+	"""Return how strongly a region contains an HP bar (long thin run of saturated colour)."""
+	region = frame[rows, cols].astype(np.int16)
+	if region.shape[0] < 5 or region.shape[1] == 0:
+		return 0.0
+	saturation = region.max(axis=2) - region.min(axis=2)
+	bar_pixels = (region[..., 1] >= region[..., 2]) & (saturation > 60) # Green, yellow and red bars
+	runs = _longest_runs(bar_pixels) / region.shape[1]
+	best = int(runs.argmax())
+	# HP bars are thin, the rows a few pixels away should not contain a long run
+	neighbours = np.concatenate([runs[max(0, best - 4):max(0, best - 2)], runs[best + 3:best + 5]])
+	contrast = runs[best] - (float(neighbours.max()) if neighbours.size else 0.0)
+	return float(min(1.0, runs[best] / 0.3) * max(0.0, contrast) / max(runs[best], 1e-6))
+
+def _box_score(gray: np.ndarray, rows: slice, cols: slice) -> float:
+	"""Return how strongly a region looks like a bordered light box containing dark text."""
+	region = gray[rows, cols]
+	if region.size == 0:
+		return 0.0
+	border = max(
+		float((region[0] < DARK).mean()), float((region[1] < DARK).mean()),
+		float((region[:, 0] < DARK).mean()), float((region[:, 1] < DARK).mean())
+	)
+	interior = region[2:-2, 2:-2]
+	light = float((interior > LIGHT).mean())
+	ink = float((interior < DARK).mean())
+	text_like = 1.0 if 0.01 <= ink <= 0.35 else 0.3
+	return border * min(1.0, light / 0.6) * text_like
+
+def classify_scene(frame: np.ndarray) -> Tuple[str, float]:
+	"""Classify a Game Boy frame as overworld, text, menu or battle. Returns (scene, confidence)."""
+	gray = frame.mean(axis=2)
+	height, width = gray.shape
+
+	# Battle: enemy HP bar top left, player HP bar middle right
+	enemy_bar = _bar_score(frame, slice(int(height * 0.08), int(height * 0.30)), slice(int(width * 0.10), int(width * 0.55)))
+	player_bar = _bar_score(frame, slice(int(height * 0.45), int(height * 0.70)), slice(int(width * 0.50), int(width * 0.95)))
+	battle = (enemy_bar + player_bar) / 2
+
+	# Text box: bordered light box across the bottom third
+	text = _box_score(gray, slice(int(height * 0.66), height), slice(0, width))
+
+	# Menu: bordered light box on the right half that does not span the screen
+	menu = _box_score(gray, slice(0, int(height * 0.66)), slice(int(width * 0.45), width))
+
+	# Overworld: lots of texture and no UI boxes
+	texture = float(np.abs(np.diff(gray, axis=1)).mean() / 40)
+	overworld = min(1.0, texture) * (1 - max(battle, text, menu))
+
+	scores = np.array([overworld, text, menu, battle], dtype=np.float64)
+	if battle > 0.5:
+		scores[1] *= 0.5 # Battles always show a text box too
+	best = int(scores.argmax())
+	total = float(scores.sum())
+	confidence = float(scores[best] / total) if total > 0 else 0.0
+	return SCENES[best], round(confidence, 3)
+
+def classify_image(image_path: str) -> Tuple[str, float]:
+	"""Classify a screenshot on disk."""
+	return classify_scene(load_frame(image_path))
+
+def parse_policy(value: str) -> Dict[str, str]:
+	"""Parse a "scene:action,..." routing policy, falling back to DEFAULT_POLICY entries."""
+	policy = dict(item.split(":") for item in DEFAULT_POLICY.split(","))
+	for item in (value or "").split(","):
+		if not item.strip():
+			continue
+		try:
+			scene, action = (part.strip().lower() for part in item.split(":"))
+			if scene not in SCENES or action not in ACTIONS:
+				raise ValueError(item)
+			policy[scene] = action
+		except ValueError:
+			logger.warning(f"Ignoring invalid scene policy entry {item!r}")
+	return policy
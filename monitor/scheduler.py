@@ -0,0 +1,77 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from common.entities import LOCATION_INDEX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HIGH_SCORE = 7 # Analyses at or above this score are treated as action
+DEFAULT_LOW_SCORE = 3 # Analyses at or below this score are treated as idle
+DEFAULT_BACKOFF = 1.5 # Interval multiplier for every consecutive idle analysis
+
+class CaptureScheduler:
+	"""Picks the next capture interval from recent analyses.
+
+	High scores or a change of location or team drop the interval to the minimum,
+	sustained low scores back off exponentially towards the maximum and anything
+	in between returns to the configured interval. Failed or skipped analyses
+	(no model) leave the schedule unchanged.
+	"""
+	def __init__(
+		self,
+		base_secs: float,
+		min_secs: float,
+		max_secs: float,
+		high_score: int = DEFAULT_HIGH_SCORE,
+		low_score: int = DEFAULT_LOW_SCORE,
+		backoff: float = DEFAULT_BACKOFF
+	):
+		self.base_secs = base_secs
+		self.min_secs = min(min_secs, base_secs)
+		self.max_secs = max(max_secs, base_secs)
+		self.high_score = high_score
+		self.low_score = low_score
+		self.backoff = backoff
+
+		self.interval_secs = base_secs
+		self.idle_streak = 0
+		self.location: Optional[str] = None
+		self.team: Optional[List[str]] = None
+
+	def observe(self, analysis: Dict[str, Any]) -> float:
+		"""Update the schedule with a new analysis and return the next interval in seconds."""
+		if analysis.get("model") is None:
+			return self.interval_secs
+
+		score = analysis.get("score", 0)
+		# Canonical ids when available, so "Mt Moon B1F" after "Mt. Moon" is not counted as a move
+		location = analysis.get("location_id") or analysis.get("estimated_location") or None
+		if location is not None and LOCATION_INDEX.generic(location):
+			location = None # Generic places such as "Pokemon Center" say nothing about movement
+		team = sorted(
+			str(p.get("species_id") or p.get("name", "")) for p in analysis.get("team_details", []) if isinstance(p, dict)
+		) or None
+
+		# Only count changes between two known values, "Unknown" frames are noise
+		moved = location not in (None, "Unknown") and self.location is not None and location != self.location
+		team_changed = team is not None and self.team is not None and team != self.team
+		if location not in (None, "Unknown"):
+			self.location = location
+		if team is not None:
+			self.team = team
+
+		previous = self.interval_secs
+		if score >= self.high_score or moved or team_changed:
+			self.idle_streak = 0
+			self.interval_secs = self.min_secs
+		elif score <= self.low_score:
+			self.idle_streak += 1
+			self.interval_secs = min(self.max_secs, self.base_secs * self.backoff ** self.idle_streak)
+		else:
+			self.idle_streak = 0
+			self.interval_secs = self.base_secs
+
+		if self.interval_secs != previous:
+			reason = "high score" if score >= self.high_score else "location change" if moved else "team change" if team_changed else f"score {score}"
+			logger.info(f"Capture interval {previous:.0f}s -> {self.interval_secs:.0f}s ({reason})")
+		return self.interval_secs
@@ -0,0 +1,98 @@
+import time
+import base64
+import logging
+import threading
+from typing import Optional, Tuple
+
+import trio
+from selenium.webdriver.common.by import By
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FPS = 2 # Frame rate cap, frames are acknowledged no faster than this
+DEFAULT_QUALITY = 85 # JPEG quality of screencast frames
+
+class Screencast(threading.Thread):
+	"""Streams JPEG frames of the player over the Chrome DevTools Protocol.
+
+	Runs Page.startScreencast through Selenium's CDP bridge on a background trio
+	loop and keeps only the latest frame in memory, so a capture is a memory copy
+	instead of a WebDriver screenshot round trip. Chrome sends the next frame only
+	once the previous one is acknowledged, acknowledgements are delayed to cap
+	the frame rate.
+	"""
+	def __init__(
+		self,
+		driver,
+		lock: threading.RLock,
+		handle: Optional[str] = None,
+		fps: float = DEFAULT_FPS,
+		quality: int = DEFAULT_QUALITY
+	):
+		super().__init__(daemon=True)
+		self.driver = driver
+		self.handle = handle # Window handle of the tab to stream, the current tab by default
+		self.lock = lock # Shared with TwitchCapture, WebDriver sessions are not thread safe
+		self.fps = fps
+		self.quality = quality
+		self.frame: Optional[bytes] = None
+		self.frame_time = 0.0
+		self.frames = 0
+		self.ready = threading.Event()
+		self.running = False
+
+	def run(self) -> None:
+		self.running = True
+		try:
+			trio.run(self._stream)
+		except Exception as e:
+			logger.error(f"Screencast stopped: {e}")
+		finally:
+			self.running = False
+			self.ready.set()
+
+	def stop(self) -> None:
+		"""Stop streaming, the trio loop notices within half a second."""
+		self.running = False
+
+	def latest(self) -> Optional[Tuple[bytes, float]]:
+		"""Return the latest frame and the time it was received, or None before the first frame."""
+		frame = self.frame
+		return (frame, self.frame_time) if frame is not None else None
+
+	async def _stream(self) -> None:
+		with self.lock:
+			# The CDP session attaches to the current tab
+			if self.handle:
+				self.driver.switch_to.window(self.handle)
+			# The player fills the window, its size bounds the frames. Screencasts cannot clip to an element.
+			player = self.driver.find_element(By.TAG_NAME, "iframe").rect
+			connection = self.driver.bidi_connection()
+			bidi = await connection.__aenter__()
+		try:
+			session, devtools = bidi.session, bidi.devtools
+			async with trio.open_nursery() as nursery:
+				nursery.start_soon(self._watch_stop, nursery.cancel_scope)
+				frames = session.listen(devtools.page.ScreencastFrame)
+				await session.execute(devtools.page.start_screencast(
+					format_="jpeg",
+					quality=self.quality,
+					max_width=int(player["width"]),
+					max_height=int(player["height"])
+				))
+				logger.info(f"Screencast started ({int(player['width'])}x{int(player['height'])} @ {self.fps}fps)")
+
+				async for event in frames:
+					self.frame = base64.b64decode(event.data)
+					self.frame_time = time.time()
+					self.frames += 1
+					self.ready.set()
+					await trio.sleep(1 / self.fps)
+					await session.execute(devtools.page.screencast_frame_ack(event.session_id))
+		finally:
+			await connection.__aexit__(None, None, None)
+
+	async def _watch_stop(self, cancel_scope: trio.CancelScope) -> None:
+		while self.running:
+			await trio.sleep(0.5)
+		cancel_scope.cancel()
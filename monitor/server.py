@@ -10,12 +10,16 @@ logger = logging.getLogger(__name__)
 DEFAULT_PORT = 8001
 
 class Server(threading.Thread):
-	"""Run a simple HTTP server in a separate thread."""
+	"""Run a simple HTTP server in a separate thread.
 
-	def __init__(self, port: int = DEFAULT_PORT, directory: str = "stream"):
+	Serves the stream directory, and the job queue API under /jobs when one is given.
+	"""
+
+	def __init__(self, port: int = DEFAULT_PORT, directory: str = "stream", api=None):
 		super().__init__(daemon=True)
 		self.port = port
 		self.directory = directory
+		self.api = api # monitor.remote.JobQueueAPI in queue mode
 		self.httpd: Optional[socketserver.TCPServer] = None
 		
 	def run(self) -> None:
@@ -26,15 +30,33 @@ class Server(threading.Thread):
 
 	def _create_handler(self):
 		"""Create HTTP handler with directory configuration."""
-		return lambda *args, **kwargs: http.server.SimpleHTTPRequestHandler(
-			*args, directory=self.directory, **kwargs
-		)
+		server = self
+
+		class Handler(http.server.SimpleHTTPRequestHandler):
+			def do_GET(self):
+				api = server.api
+				if api and api.handles(self.path):
+					return api.handle(self, "GET")
+				return super().do_GET()
+
+			def do_POST(self):
+				api = server.api
+				if api and api.handles(self.path):
+					return api.handle(self, "POST")
+				self.send_error(404)
+
+			def log_message(self, format, *args):
+				if not (server.api and server.api.handles(getattr(self, "path", ""))): # Workers poll the API every few seconds
+					super().log_message(format, *args)
+
+		return lambda *args, **kwargs: Handler(*args, directory=self.directory, **kwargs)
 
 	def _try_start_server(self, port: int, handler) -> bool:
 		"""Try to start server on specified port."""
 		try:
 			self.port = port
-			self.httpd = socketserver.TCPServer(("", port), handler)
+			self.httpd = http.server.ThreadingHTTPServer(("", port), handler) # Workers must not wait behind each other
+			self.port = self.httpd.server_address[1] # Port 0 picks a free port
 			logger.info(f"HTTP server started on port {port}")
 			self.httpd.serve_forever()
 			return True
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from common.entities import LOCATION_INDEX, SPECIES_INDEX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "context/monitor/state.json"
+VOTE_DECAY = 0.7 # Weight kept by older frames each time a new one is observed
+SWITCH_SHARE = 0.5 # Share of the votes a new value needs before it replaces the current one
+MAX_CANDIDATES = 4 # Candidates tracked per field, the weakest are dropped
+HISTORY_LENGTH = 10 # Distinct locations remembered
+BADGE_CONFIRMATIONS = 2 # Frames that must mention a badge before it counts
+BATTLE_WORDS = re.compile(r"\b(battle|battling|fight|fighting|wild|trainer sent out|fainted)\b", re.IGNORECASE)
+BADGES = ("Boulder", "Cascade", "Thunder", "Rainbow", "Soul", "Marsh", "Volcano", "Earth")
+BADGE_PATTERN = re.compile(r"\b(" + "|".join(BADGES) + r")\s+badge", re.IGNORECASE)
+
+class Vote:
+	"""Exponentially decayed votes between a few candidate values of a noisy field."""
+	def __init__(self, data: Optional[Dict[str, Any]] = None):
+		data = data or {}
+		self.value: Optional[str] = data.get("value")
+		self.votes: Dict[str, float] = data.get("votes", {})
+
+	def observe(self, candidate: str) -> bool:
+		"""Add a vote and return True if the smoothed value changed."""
+		for key in self.votes:
+			self.votes[key] *= VOTE_DECAY
+		self.votes[candidate] = self.votes.get(candidate, 0.0) + 1.0
+		if len(self.votes) > MAX_CANDIDATES:
+			del self.votes[min(self.votes, key=self.votes.get)]
+
+		if candidate != self.value and self.share(candidate) >= SWITCH_SHARE:
+			self.value = candidate
+			return True
+		return False
+
+	def share(self, candidate: Optional[str] = None) -> float:
+		"""Share of the votes held by a candidate, the current value by default."""
+		total = sum(self.votes.values())
+		return self.votes.get(candidate or self.value, 0.0) / total if total else 0.0
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {"value": self.value, "votes": {key: round(vote, 4) for key, vote in self.votes.items()}}
+
+class GameState:
+	"""Compact game state reduced from monitor analyses.
+
+	Every sanitized analysis updates the state in constant time. Location and team
+	are smoothed with decayed votes so a single misread frame cannot change them,
+	badges need several mentions and battles are tracked as streaks of battle frames.
+	"""
+	def __init__(self, data: Optional[Dict[str, Any]] = None):
+		data = data or {}
+		self.location = Vote(data.get("location"))
+		self.team = Vote(data.get("team"))
+		self.team_details: List[Dict[str, str]] = data.get("team_details", [])
+		self.location_history: List[Dict[str, str]] = data.get("location_history", [])
+		self.badge_mentions: Dict[str, int] = data.get("badge_mentions", {})
+		self.badges: List[str] = data.get("badges", [])
+		self.in_battle: bool = data.get("in_battle", False)
+		self.battle_frames: int = data.get("battle_frames", 0)
+		self.battles: int = data.get("battles", 0)
+		self.longest_battle: int = data.get("longest_battle", 0)
+		self.score_avg: float = data.get("score_avg", 0.0)
+		self.frames: int = data.get("frames", 0)
+		self.updated: Optional[str] = data.get("updated")
+
+	def update(self, analysis: Dict[str, Any]) -> None:
+		"""Apply one analysis. Failed and skipped frames (no model) are ignored."""
+		if analysis.get("model") is None:
+			return
+		timestamp = analysis.get("timestamp", "")
+		self.frames += 1
+		self.updated = timestamp
+		self.score_avg += (analysis.get("score", 0) - self.score_avg) * (1 - VOTE_DECAY)
+
+		# Canonical names when the entity index resolved them, so spelling variants vote together
+		location = LOCATION_INDEX.name(analysis.get("location_id")) or (analysis.get("estimated_location") or "").strip()
+		if not LOCATION_INDEX.generic(location): # "Pokemon Center" alone does not say where the player is
+			if self.location.observe(location):
+				self.location_history.append({"location": location, "since": timestamp})
+				self.location_history = self.location_history[-HISTORY_LENGTH:]
+
+		team = [member for member in analysis.get("team_details", []) if member.get("name")]
+		if team:
+			signature = ",".join(
+				(SPECIES_INDEX.name(member.get("species_id")) or member["name"]).strip().lower() for member in team
+			)
+			self.team.observe(signature)
+			if signature == self.team.value:
+				self.team_details = team # Health comes from the latest frame showing the smoothed team
+
+		summary = analysis.get("detailed_summary", "")
+		for badge in {match.capitalize() for match in BADGE_PATTERN.findall(summary)}:
+			self.badge_mentions[badge] = self.badge_mentions.get(badge, 0) + 1
+			if self.badge_mentions[badge] >= BADGE_CONFIRMATIONS and badge not in self.badges:
+				self.badges.append(badge)
+				logger.info(f"Game state: {badge} Badge confirmed")
+
+		battle = analysis.get("scene") == "battle" or bool(BATTLE_WORDS.search(summary))
+		if battle:
+			if not self.in_battle:
+				self.battles += 1
+				self.battle_frames = 0
+			self.battle_frames += 1
+			self.longest_battle = max(self.longest_battle, self.battle_frames)
+		self.in_battle = battle
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"location": self.location.to_dict(),
+			"location_confidence": round(self.location.share(), 2),
+			"location_history": self.location_history,
+			"team": self.team.to_dict(),
+			"team_confidence": round(self.team.share(), 2),
+			"team_details": self.team_details,
+			"badge_mentions": self.badge_mentions,
+			"badges": self.badges,
+			"in_battle": self.in_battle,
+			"battle_frames": self.battle_frames,
+			"battles": self.battles,
+			"longest_battle": self.longest_battle,
+			"score_avg": round(self.score_avg, 2),
+			"frames": self.frames,
+			"updated": self.updated
+		}
+
+class StateTracker:
+	"""Keeps a GameState per channel and persists them to context/monitor/state.json."""
+	def __init__(self, path: str = DEFAULT_STATE_PATH):
+		self.path = Path(path)
+		self.lock = threading.Lock() # Analyses of several channels are reduced from worker threads
+		self.states: Dict[str, GameState] = {}
+		try:
+			if self.path.exists():
+				with open(self.path, "r") as f:
+					self.states = {channel: GameState(data) for channel, data in json.load(f).items()}
+		except Exception as e:
+			logger.error(f"Error loading game state, starting fresh: {e}")
+
+	def update(self, analysis: Dict[str, Any]) -> None:
+		"""Reduce an analysis into its channel's state and persist it."""
+		with self.lock:
+			channel = analysis.get("channel", "")
+			self.states.setdefault(channel, GameState()).update(analysis)
+			self._save()
+
+	def _save(self) -> None:
+		"""Write the state atomically so the post agent never reads a partial file."""
+		try:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			temp_path = self.path.with_suffix(".tmp")
+			with open(temp_path, "w") as f:
+				json.dump({channel: state.to_dict() for channel, state in self.states.items()}, f)
+			os.replace(temp_path, self.path)
+		except Exception as e:
+			logger.error(f"Error saving game state: {e}")
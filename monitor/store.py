@@ -0,0 +1,185 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Set
+
+from common.files import ARCHIVE_DIR, archived_image_path, file_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGES_DIR = "context/images"
+DEFAULT_POSTS_PATH = "context/posts/posts.jsonl"
+MAX_IMAGES = 20 # Hot images kept at full quality
+MAX_ARCHIVED_IMAGES = 2000 # Compressed images kept in the archive tier
+PINNED_POSTS = 50 # Images referenced by the latest posts are never evicted
+ARCHIVE_QUALITY = 60
+
+class ImageStore:
+	"""Content-addressed screenshot store with post-aware tiered retention.
+
+	Screenshots are stored as <sha256>.<ext> so identical frames share one file.
+	An in-memory ring of the latest captures drives retention without directory
+	scans. Frames leaving the ring are moved to a compressed archive tier unless
+	posts.jsonl still references them or they are held until their analysis is saved. Archived frames keep their digest as file
+	name, common.files.resolve_image_path maps saved paths to them.
+	"""
+	def __init__(
+		self,
+		images_dir: str = DEFAULT_IMAGES_DIR,
+		posts_path: str = DEFAULT_POSTS_PATH,
+		max_images: int = MAX_IMAGES,
+		max_archived: int = MAX_ARCHIVED_IMAGES
+	):
+		self.images_dir = Path(images_dir)
+		self.archive_dir = self.images_dir / ARCHIVE_DIR
+		self.posts_path = Path(posts_path)
+		self.max_images = max_images
+		self.max_archived = max_archived
+
+		self.ring: Deque[str] = deque() # Digests of the latest captures, oldest first
+		self.refs: Counter = Counter() # Number of ring slots per digest
+		self.paths: Dict[str, Path] = {} # Digest -> hot file
+		self.deferred: Set[str] = set() # Left the ring while pinned
+		self.archive: Deque[Path] = deque()
+
+		self.pins: Deque[str] = deque(maxlen=PINNED_POSTS)
+		self.pinned: Counter = Counter()
+		self.posts_offset = 0
+		self.held: Counter = Counter() # Digests of frames waiting for analysis
+		self.lock = threading.Lock() # Captures and analysis threads both touch the indexes
+
+		self.images_dir.mkdir(parents=True, exist_ok=True)
+		self.archive_dir.mkdir(parents=True, exist_ok=True)
+		self._load()
+
+	def _load(self) -> None:
+		"""Rebuild the indexes from disk once at startup."""
+		hot = sorted(
+			(path for path in self.images_dir.iterdir() if path.is_file()),
+			key=lambda path: path.stat().st_mtime
+		)
+		for path in hot:
+			self.paths[path.stem] = path
+			self.ring.append(path.stem)
+			self.refs[path.stem] += 1
+		self.archive.extend(sorted(self.archive_dir.iterdir(), key=lambda path: path.stat().st_mtime))
+		logger.info(f"Image store loaded {len(hot)} hot and {len(self.archive)} archived images")
+		self._enforce()
+
+	def put(self, path: str, hold: bool = False) -> str:
+		"""Move a new capture into the store and return its content-addressed path.
+
+		A held frame is not archived until release() is called for it, so frames
+		waiting for a batch or a queue worker survive any number of newer captures.
+		"""
+		with self.lock:
+			target = self._put(Path(path))
+			if hold:
+				self.held[target.stem] += 1
+			return str(target)
+
+	def hold(self, path: str) -> None:
+		"""Keep a stored frame from being archived until release() is called for it."""
+		with self.lock:
+			self.held[Path(path).stem] += 1
+
+	def release(self, path: str) -> None:
+		"""Drop a hold taken by put(), the frame may be archived from now on."""
+		digest = Path(path).stem
+		with self.lock:
+			self.held[digest] -= 1
+			if self.held[digest] <= 0:
+				self.held.pop(digest, None)
+				self._enforce()
+
+	def _put(self, source: Path) -> Path:
+		digest = file_hash(source)
+		target = self.paths.get(digest)
+		if target is not None and target.exists():
+			source.unlink() # Duplicate frame, reuse the stored copy
+			logger.debug(f"Duplicate frame {source} stored as {target}")
+		else:
+			target = self.images_dir / f"{digest}{source.suffix}"
+			os.replace(source, target)
+			self.paths[digest] = target
+
+		self.ring.append(digest)
+		self.refs[digest] += 1
+		self.deferred.discard(digest)
+		self._enforce()
+		return target
+
+#-------------------------------------------------------------------
+# Retention
+#-------------------------------------------------------------------
+	def _enforce(self) -> None:
+		"""Evict captures beyond max_images, keeping images pinned by posts."""
+		if len(self.ring) <= self.max_images and not self.deferred:
+			return
+		self._refresh_pins()
+
+		while len(self.ring) > self.max_images:
+			digest = self.ring.popleft()
+			self.refs[digest] -= 1
+			if self.refs[digest] > 0:
+				continue # Still referenced by a newer capture of the same frame
+			del self.refs[digest]
+			if self.pinned[digest] or digest in self.held:
+				self.deferred.add(digest)
+			else:
+				self._archive(digest)
+
+		for digest in [digest for digest in self.deferred if not self.pinned[digest] and digest not in self.held]:
+			self.deferred.discard(digest)
+			self._archive(digest)
+
+	def _refresh_pins(self) -> None:
+		"""Read posts appended to posts.jsonl since the last call and pin their images."""
+		try:
+			if not self.posts_path.exists():
+				return
+			with open(self.posts_path, "r") as f:
+				if os.fstat(f.fileno()).st_size < self.posts_offset:
+					self.posts_offset = 0 # File was truncated or replaced
+				f.seek(self.posts_offset)
+				for line in f:
+					if not line.endswith("\n"):
+						break # Partially written line, read it next time
+					self.posts_offset += len(line.encode("utf-8"))
+					image_path = json.loads(line).get("image_path")
+					if image_path:
+						self._pin(Path(image_path).stem)
+		except Exception as e:
+			logger.error(f"Error reading posts for image pins: {e}")
+
+	def _pin(self, digest: str) -> None:
+		"""Pin a digest, unpinning the oldest one when the pin window is full."""
+		if len(self.pins) == self.pins.maxlen:
+			self.pinned[self.pins[0]] -= 1
+		self.pins.append(digest)
+		self.pinned[digest] += 1
+
+	def _archive(self, digest: str) -> None:
+		"""Move a hot image to the compressed archive tier."""
+		path = self.paths.pop(digest, None)
+		if path is None or not path.exists():
+			return
+		archived = archived_image_path(str(path))
+		try:
+			from PIL import Image
+			with Image.open(path) as image:
+				image.save(archived, format="WEBP", quality=ARCHIVE_QUALITY, method=4)
+			path.unlink()
+			if archived in self.archive:
+				self.archive.remove(archived) # Re-captured after it was archived, it is the newest entry now
+			self.archive.append(archived)
+			logger.debug(f"Archived {path} to {archived}")
+		except Exception as e:
+			logger.warning(f"Failed to archive {path}, removing it: {e}")
+			path.unlink(missing_ok=True)
+
+		while len(self.archive) > self.max_archived:
+			self.archive.popleft().unlink(missing_ok=True)
@@ -1,8 +1,11 @@
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-def validate_response(response, image_path: str, timestamp: str, model: str, input_tokens: int, encoder):
+from common.tokens import count_tokens, usage_from_response
+from common.entities import match_location, match_species
+
+def validate_response(response, image_path: str, timestamp: str, model: str, input_tokens: int):
 	"""Validate and process LLM API response for monitoring agent."""
 	if (
 		"choices" not in response or 
@@ -13,21 +16,78 @@ def validate_response(response, image_path: str, timestamp: str, model: str, inp
 		raise ValueError("Invalid response structure")
 
 	content = response["choices"][0]["message"]["content"]
-	output_tokens = count_tokens(content, encoder)
 
 	try:
 		analysis_result = json.loads(content)
 	except json.JSONDecodeError as json_err:
 		raise ValueError(f"Failed to parse JSON: {json_err}")
 
-	analysis_result['token_usage'] = {
-		'input_tokens': input_tokens,
-		'output_tokens': output_tokens,
-		'total_tokens': input_tokens + output_tokens
-	}
+	# Prefer the usage reported by the API, it also accounts for image tokens
+	usage = usage_from_response(response)
+	if usage is None:
+		output_tokens = count_tokens(content)
+		usage = {
+			'input_tokens': input_tokens,
+			'output_tokens': output_tokens,
+			'total_tokens': input_tokens + output_tokens
+		}
+	analysis_result['token_usage'] = usage
 
 	return analysis_result
 		
+def validate_batch_response(response, frame_count: int, input_tokens: int) -> List[Optional[Dict[str, Any]]]:
+	"""Validate a multi-frame response and return one raw analysis per frame.
+
+	Token usage is split across the analyzed frames, the remainder goes to the first.
+	Frames missing from the response are None.
+	"""
+	if (
+		"choices" not in response or 
+		not response["choices"] or 
+		"message" not in response["choices"][0] or
+		"content" not in response["choices"][0]["message"]
+	):
+		raise ValueError("Invalid response structure")
+
+	content = response["choices"][0]["message"]["content"]
+	try:
+		batch_result = json.loads(content)
+	except json.JSONDecodeError as json_err:
+		raise ValueError(f"Failed to parse JSON: {json_err}")
+
+	# Accept a bare array as well as the requested {"analyses": [...]} object
+	analyses = batch_result.get("analyses") if isinstance(batch_result, dict) else batch_result
+	if not isinstance(analyses, list):
+		raise ValueError("Response does not contain an analyses array")
+
+	# Place analyses by their frame number when given, otherwise (or if that frame is taken) by position
+	frames: List[Optional[Dict[str, Any]]] = [None] * frame_count
+	for position, analysis in enumerate(analyses):
+		if not isinstance(analysis, dict):
+			continue
+		index = analysis.get("frame", position + 1)
+		index = index - 1 if isinstance(index, int) and 1 <= index <= frame_count else position
+		if index < frame_count and frames[index] is not None:
+			index = position
+		if index < frame_count and frames[index] is None:
+			frames[index] = analysis
+
+	usage = usage_from_response(response)
+	if usage is None:
+		output_tokens = count_tokens(content)
+		usage = {
+			'input_tokens': input_tokens,
+			'output_tokens': output_tokens,
+			'total_tokens': input_tokens + output_tokens
+		}
+	analyzed = [analysis for analysis in frames if analysis is not None]
+	for position, analysis in enumerate(analyzed):
+		analysis['token_usage'] = {
+			key: value // len(analyzed) + (value % len(analyzed) if position == 0 else 0)
+			for key, value in usage.items()
+		}
+	return frames
+
 def sanitize_results(response: Dict[str, Any], image_path: str, timestamp: str, model: str) -> Dict[str, Any]:
 	"""Validate and sanitize LLM response to ensure it matches the expected format."""
 	validated = {
@@ -38,6 +98,7 @@ def sanitize_results(response: Dict[str, Any], image_path: str, timestamp: str,
 		"team_details": [],
 		"score": 1,
 		"estimated_location": "Unknown",
+		"location_id": None,
 		"token_usage": {
 			"input_tokens": 0,
 			"output_tokens": 0,
@@ -58,11 +119,15 @@ def sanitize_results(response: Dict[str, Any], image_path: str, timestamp: str,
 			valid_pokemon = {
 				"name": "",
 				"custom_name": "",
-				"health": ""
+				"health": "",
+				"species_id": None
 			}
-			# Validate pokemon name
+			# Validate pokemon name, the canonical species id is its Pokedex number
 			if "name" in pokemon and isinstance(pokemon["name"], str):
 				valid_pokemon["name"] = pokemon["name"]
+				species = match_species(pokemon["name"])
+				if species:
+					valid_pokemon["species_id"] = species[0]
 			# Validate custom name
 			if "custom_name" in pokemon and isinstance(pokemon["custom_name"], str):
 				valid_pokemon["custom_name"] = pokemon["custom_name"]
@@ -87,6 +152,9 @@ def sanitize_results(response: Dict[str, Any], image_path: str, timestamp: str,
 	# Validate estimated_location
 	if "estimated_location" in response and isinstance(response["estimated_location"], str):
 		validated["estimated_location"] = response["estimated_location"]
+		location = match_location(response["estimated_location"])
+		if location:
+			validated["location_id"] = location[0]
 				
 	# Validate token usage
 	if "token_usage" in response and isinstance(response["token_usage"], dict):
@@ -96,6 +164,22 @@ def sanitize_results(response: Dict[str, Any], image_path: str, timestamp: str,
 
 	return validated
 
+def check_results(response: Dict[str, Any]) -> List[str]:
+	"""Return the fields that sanitize_results would have to fill in or repair."""
+	problems = []
+	if not isinstance(response.get("detailed_summary"), str) or not response["detailed_summary"].strip():
+		problems.append("detailed_summary")
+	if not isinstance(response.get("team_details"), list) or not all(isinstance(p, dict) for p in response["team_details"]):
+		problems.append("team_details")
+	try:
+		if not 1 <= int(response.get("score")) <= 10:
+			problems.append("score")
+	except (ValueError, TypeError):
+		problems.append("score")
+	if not isinstance(response.get("estimated_location"), str):
+		problems.append("estimated_location")
+	return problems
+
 def get_default_response(image_path: str, timestamp: str) -> Dict[str, Any]:
 	"""Return a default response structure when analysis fails."""
 	return {
@@ -106,13 +190,10 @@ def get_default_response(image_path: str, timestamp: str) -> Dict[str, Any]:
 		"team_details": [],
 		"score": 0,
 		"estimated_location": "",
+		"location_id": None,
 		"token_usage": {
 			"input_tokens": 0,
 			"output_tokens": 0,
 			"total_tokens": 0,
 		}
-	} 
-
-def count_tokens(text: str, encoder) -> int:
-	"""Count tokens in text using the provided encoder."""
-	return len(encoder.encode(text))
\ No newline at end of file
+	} 
\ No newline at end of file
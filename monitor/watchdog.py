@@ -0,0 +1,244 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL = 30 # secs between health checks
+DEFAULT_MAX_RSS_MB = 2048 # Recycle the browser once its process tree uses more memory than this
+DEFAULT_STALL_SECS = 180 # Recycle the browser once the stream frame has not changed for this long
+
+def process_tree(pid: int) -> List[int]:
+	"""Return a process and all its descendants, read from /proc."""
+	children: Dict[int, list] = {}
+	for entry in os.listdir("/proc"):
+		if not entry.isdigit():
+			continue
+		try:
+			with open(f"/proc/{entry}/stat", "r") as f:
+				stat = f.read()
+			# The command name may contain spaces, fields after it are fixed
+			ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+			children.setdefault(ppid, []).append(int(entry))
+		except (OSError, ValueError, IndexError):
+			continue
+
+	tree = []
+	pending = [pid]
+	while pending:
+		current = pending.pop()
+		tree.append(current)
+		pending.extend(children.get(current, []))
+	return tree
+
+def process_tree_rss(pid: int) -> int:
+	"""Return the resident memory in bytes of a process and all its descendants."""
+	total = 0
+	for current in process_tree(pid):
+		try:
+			with open(f"/proc/{current}/status", "r") as f:
+				for line in f:
+					if line.startswith("VmRSS:"):
+						total += int(line.split()[1]) * 1024
+						break
+		except OSError:
+			continue
+	return total
+
+def process_tree_cpu(pid: int) -> float:
+	"""Return the user and system CPU seconds used by a process and all its descendants."""
+	total = 0
+	for current in process_tree(pid):
+		try:
+			with open(f"/proc/{current}/stat", "r") as f:
+				stat = f.read()
+			fields = stat[stat.rindex(")") + 2:].split()
+			total += int(fields[11]) + int(fields[12]) # utime, stime in clock ticks
+		except (OSError, ValueError, IndexError):
+			continue
+	return total / os.sysconf("SC_CLK_TCK")
+
+class BrowserWatchdog(threading.Thread):
+	"""Watches the capture browser and swaps in a warm standby when it degrades.
+
+	Every check the watchdog measures the RSS of the Chrome process tree and
+	fingerprints the current frame. A dead session, memory above max_rss or a
+	frame that has not changed for stall_secs triggers a recovery: the standby
+	driver, which already has the embed loaded, is swapped in under the capture
+	lock and the old browser is closed afterwards. A new standby is then warmed
+	in the background, so captures keep flowing through recoveries. The standby
+	gets the same memory and stall checks and is replaced when it fails them.
+	"""
+	def __init__(
+		self,
+		capture,
+		check_interval: float = DEFAULT_CHECK_INTERVAL,
+		max_rss: int = DEFAULT_MAX_RSS_MB * 1024 * 1024,
+		stall_secs: float = DEFAULT_STALL_SECS,
+		standby: bool = True
+	):
+		super().__init__(daemon=True)
+		self.capture = capture
+		self.check_interval = check_interval
+		self.max_rss = max_rss
+		self.stall_secs = stall_secs
+		self.standby_enabled = standby
+		self.standby = None
+
+		self.fingerprint: Optional[str] = None
+		self.fingerprint_since = time.time()
+		self.standby_fingerprint: Optional[str] = None
+		self.standby_since = time.time()
+		self.recoveries = 0
+		self.wakeup = threading.Event()
+		self.running = False
+
+	def run(self) -> None:
+		self.running = True
+		logger.info("Browser watchdog started")
+		while self.running:
+			try:
+				reason = self.check()
+				if reason:
+					self.recover(reason)
+				if self.standby is not None:
+					reason = self.check_standby()
+					if reason:
+						logger.warning(f"Replacing standby browser: {reason}")
+						self._quit(self.standby)
+						self.standby = None
+				if self.standby_enabled and self.standby is None and self.running:
+					self.warm_standby()
+			except Exception as e:
+				logger.error(f"Error in browser watchdog: {e}")
+			self.wakeup.wait(self.check_interval)
+			self.wakeup.clear()
+
+	def wake(self) -> None:
+		"""Run a health check now, e.g. after a failed capture."""
+		self.wakeup.set()
+
+	def stop(self) -> None:
+		"""Stop the watchdog, wait for the current check and close the standby browser."""
+		self.running = False
+		self.wakeup.set()
+		if self.is_alive() and threading.current_thread() is not self:
+			self.join()
+		if self.standby:
+			self._quit(self.standby)
+			self.standby = None
+
+#-------------------------------------------------------------------
+# Health checks
+#-------------------------------------------------------------------
+	def check(self) -> Optional[str]:
+		"""Return the reason the active browser needs recycling, or None if it is healthy."""
+		driver = self.capture.driver
+		if driver is None:
+			return None
+
+		try:
+			frame = self.capture.capture_frame()
+		except Exception as e:
+			return f"session unresponsive ({e.__class__.__name__})"
+
+		# A live stream never produces byte-identical frames for long
+		fingerprint = hashlib.sha1(frame).hexdigest()
+		now = time.time()
+		if fingerprint != self.fingerprint:
+			self.fingerprint = fingerprint
+			self.fingerprint_since = now
+		stalled_secs = now - self.fingerprint_since
+
+		rss = self._rss(driver)
+		metrics.emit("browser", rss_mb=round(rss / 1024 / 1024, 1), stalled_secs=round(stalled_secs), recoveries=self.recoveries)
+		if rss > self.max_rss:
+			return f"memory {rss / 1024 / 1024:.0f}MB above {self.max_rss / 1024 / 1024:.0f}MB"
+		if stalled_secs >= self.stall_secs:
+			return f"frame unchanged for {stalled_secs:.0f}s"
+		return None
+
+	def check_standby(self) -> Optional[str]:
+		"""Return the reason the standby browser cannot be swapped in, or None if it is healthy."""
+		try:
+			frame = self.standby.get_screenshot_as_png()
+		except Exception as e:
+			return f"session unresponsive ({e.__class__.__name__})"
+
+		fingerprint = hashlib.sha1(frame).hexdigest()
+		now = time.time()
+		if fingerprint != self.standby_fingerprint:
+			self.standby_fingerprint = fingerprint
+			self.standby_since = now
+		stalled_secs = now - self.standby_since
+
+		rss = self._rss(self.standby)
+		if rss > self.max_rss:
+			return f"memory {rss / 1024 / 1024:.0f}MB above {self.max_rss / 1024 / 1024:.0f}MB"
+		if stalled_secs >= self.stall_secs:
+			return f"frame unchanged for {stalled_secs:.0f}s"
+		return None
+
+	def _rss(self, driver) -> int:
+		"""RSS of the chromedriver process and the browsers it started."""
+		try:
+			return process_tree_rss(driver.service.process.pid)
+		except Exception:
+			return 0
+
+#-------------------------------------------------------------------
+# Recovery
+#-------------------------------------------------------------------
+	def warm_standby(self) -> None:
+		"""Start a standby browser with the embed loaded."""
+		try:
+			start = time.time()
+			driver = self.capture.create_driver()
+			if not self.running: # Stopped while the embed was loading
+				self._quit(driver)
+				return
+			self.standby = driver
+			self.standby_fingerprint = None
+			self.standby_since = time.time()
+			logger.info(f"Standby browser ready in {time.time() - start:.1f}s")
+		except Exception as e:
+			logger.error(f"Error starting standby browser: {e}")
+
+	def recover(self, reason: str) -> None:
+		"""Swap the active browser for the standby, starting a new one if none is warm."""
+		logger.warning(f"Recycling capture browser: {reason}")
+		start = time.time()
+		if self.standby is not None:
+			standby_reason = self.check_standby()
+			if standby_reason:
+				logger.warning(f"Standby browser unhealthy, starting a new one: {standby_reason}")
+				self._quit(self.standby)
+				self.standby = None
+		driver, self.standby = self.standby, None
+		if driver is None:
+			try:
+				driver = self.capture.create_driver()
+			except Exception as e:
+				logger.error(f"Error starting replacement browser: {e}")
+				return
+
+		previous = self.capture.swap(driver)
+		gap = time.time() - start
+		self.recoveries += 1
+		self.fingerprint = None
+		self.fingerprint_since = time.time()
+		logger.info(f"Capture browser swapped in {gap:.2f}s")
+		metrics.emit("browser_recovery", reason=reason, gap_secs=round(gap, 3), recoveries=self.recoveries)
+		if previous:
+			self._quit(previous)
+
+	def _quit(self, driver) -> None:
+		try:
+			driver.quit()
+		except Exception as e:
+			logger.warning(f"Error closing browser: {e}")
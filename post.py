@@ -1,17 +1,23 @@
 import os
 import sys
-import time
 import signal
 import logging
 from typing import Optional
-from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-from post.llm import PostAnalyzer
+from common.startup import StartupTimer
+startup = StartupTimer()
+
+# PostAnalyzer (requests) and TwitterClient (tweepy) are imported in PostAgent.initialize once the config is valid
 from post.context import Context
-from post.tweet import TwitterClient
+from post.cycle import post_cycle
+from common.clock import Clock
+from common.profiling import Profiler
+from common.cache import ResponseCache
+from common.ratelimit import RateLimiter, parse_limits
+from common.budget import BudgetGovernor, parse_prices
 
 # Configure logging
 def setup_logging():
@@ -36,6 +42,8 @@ logger = setup_logging()
 
 DEFAULT_AGENT_BOOT_WAIT = "0" # mins
 DEFAULT_POST_INTERVAL = "5" # mins
+CACHE_DIR = "context/cache"
+RATE_LIMIT_STATE_PATH = "context/ratelimit.json"
 
 class PostAgent:
 	def __init__(self):
@@ -60,17 +68,64 @@ class PostAgent:
 			self.x_access_token = os.getenv("X_ACCESS_TOKEN")
 			self.x_access_secret = os.getenv("X_ACCESS_SECRET")
 			self.x_enabled = os.getenv("X_ENABLED", "false").lower() == "true"
+
+			# Only comment on this channel when the monitor watches several (empty uses every event)
+			self.post_channel = os.getenv("POST_CHANNEL", "") or None
+			# Use the game state tracked by the monitor agent instead of per-event team dumps
+			self.game_state = os.getenv("GAME_STATE", "false").lower() == "true"
+			# Send only the notes, past posts and milestones relevant to the recent events (BM25)
+			self.notes_retrieval = os.getenv("NOTES_RETRIEVAL", "false").lower() == "true"
+			self.retrieval_top_k = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+			self.retrieval_max_tokens = int(os.getenv("RETRIEVAL_MAX_TOKENS", "800"))
+			self.retrieval_milestone_score = int(os.getenv("RETRIEVAL_MILESTONE_SCORE", "8"))
+			# Veto commentaries too similar to a recent post (MinHash/LSH over posts.jsonl)
+			self.tweet_dedup = os.getenv("TWEET_DEDUP", "false").lower() == "true"
+			self.dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "0.5"))
+			self.dedup_horizon_secs = float(os.getenv("DEDUP_HORIZON", "24")) * 60 * 60
+
+			# Provider prompt caching hints and the local response cache are opt-in
+			self.prompt_cache = os.getenv("PROMPT_CACHE", "false").lower() == "true"
+			self.response_cache_enabled = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+			self.response_cache_ttl_secs = float(os.getenv("RESPONSE_CACHE_TTL", "1440")) * 60
+			self.response_cache_max_bytes = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+			# Rate limits shared with the other agent through context/ratelimit.json
+			self.rate_limit_rpm = float(os.getenv("RATE_LIMIT_RPM", "20"))
+			self.rate_limit_tpm = float(os.getenv("RATE_LIMIT_TPM", "1000000"))
+			self.rate_limits = os.getenv("RATE_LIMITS", "")
+
+			# Daily spend ceiling in USD shared with the other agent, 0 only records usage
+			self.daily_budget = float(os.getenv("DAILY_BUDGET", "0"))
+			self.model_prices = os.getenv("MODEL_PRICES", "")
+			self.budget_max_scale = float(os.getenv("BUDGET_MAX_SCALE", "8"))
 				
 		except ValueError:
 			logger.error("AGENT_BOOT_WAIT and POST_INTERVAL must be numeric values")
 			sys.exit(1)
 
+		# Fail fast before any heavy imports
+		if not self.openrouter_api_key:
+			logger.error("OPENROUTER_API_KEY environment variable is required")
+			sys.exit(1)
+
+		self.budget = BudgetGovernor(
+			"post",
+			daily_budget=self.daily_budget,
+			prices=parse_prices(self.model_prices),
+			max_scale=self.budget_max_scale
+		)
+		self.profiler: Optional[Profiler] = None
+		self.dispatcher = None
+		self.retriever = None
+		self.dedup = None
+		self.clock = Clock() # Replays drive the loop with a virtual clock
 		# Flag to control the main loop
 		self.running = False
 
 	def initialize(self):
 		"""Initialize the posting agent"""
 		try:
+			startup.mark("config")
 			logger.info("Initializing posting agent...")
 			logger.info(f"Post interval set to {self.post_interval} minutes")
 
@@ -78,12 +133,17 @@ class PostAgent:
 			if self.x_enabled:
 				if all([self.x_api_key, self.x_api_secret, self.x_access_token, self.x_access_secret]):
 					logger.info("X/Twitter posting enabled!")
+					TwitterClient = startup.import_module("post.tweet").TwitterClient
 					self.x_client = TwitterClient(
 						self.x_api_key, 
 						self.x_api_secret, 
 						self.x_access_token, 
 						self.x_access_secret
 					)
+					# Tweets are posted from a background thread so the loop never waits on the X API
+					TweetDispatcher = startup.import_module("post.dispatch").TweetDispatcher
+					self.dispatcher = TweetDispatcher(self.x_client)
+					self.dispatcher.start()
 				else:
 					logger.warning("X/Twitter posting disabled as credentials are incomplete")
 					self.x_enabled = False
@@ -92,8 +152,38 @@ class PostAgent:
 
 			# Initialize the PostAnalyzer with Openrouter
 			logger.info("Initializing PostAnalyzer...")
-			self.post_analyzer = PostAnalyzer(api_key=self.openrouter_api_key)
+			PostAnalyzer = startup.import_module("post.llm").PostAnalyzer
+			self.post_analyzer = PostAnalyzer(
+				api_key=self.openrouter_api_key,
+				response_cache=self.create_response_cache(),
+				prompt_cache=self.prompt_cache,
+				rate_limiter=RateLimiter(
+					state_path=RATE_LIMIT_STATE_PATH,
+					default_limits=(self.rate_limit_rpm, self.rate_limit_tpm),
+					limits=parse_limits(self.rate_limits)
+				),
+				budget=self.budget
+			)
 			logger.info(f"PostAnalyzer initialized")
+
+			if self.notes_retrieval:
+				NotesRetriever = startup.import_module("post.retrieval").NotesRetriever
+				self.retriever = NotesRetriever(
+					channel=self.post_channel,
+					top_k=self.retrieval_top_k,
+					max_tokens=self.retrieval_max_tokens,
+					milestone_score=self.retrieval_milestone_score
+				)
+				self.retriever.refresh() # Index the existing history once, later cycles only read new items
+				logger.info(f"Notes retrieval enabled ({len(self.retriever.index)} passages indexed)")
+
+			if self.tweet_dedup:
+				DuplicateIndex = startup.import_module("post.dedup").DuplicateIndex
+				self.dedup = DuplicateIndex(threshold=self.dedup_threshold, horizon_secs=self.dedup_horizon_secs)
+				self.dedup.refresh()
+				logger.info(f"Tweet deduplication enabled ({len(self.dedup.entries)} past commentaries indexed)")
+			startup.mark("components")
+			startup.report()
 				
 		except Exception as e:
 			logger.error(f"Error during initialization: {e}")
@@ -106,11 +196,14 @@ class PostAgent:
 		# Register signal handlers
 		signal.signal(signal.SIGINT, self.handle_interrupt)
 		signal.signal(signal.SIGTERM, self.handle_interrupt)
+		# Register on-demand profiling hooks (SIGUSR1: cProfile, SIGUSR2: tracemalloc)
+		self.profiler = Profiler(name="post")
+		self.profiler.install()
 		
 		# Wait before starting posting loop
 		if self.agent_boot_wait_secs > 0:
 			logger.info(f"Waiting {self.agent_boot_wait} minutes before starting posting...")
-			time.sleep(self.agent_boot_wait_secs)
+			self.clock.sleep(self.agent_boot_wait_secs)
 		
 		try:
 			# Main posting loop
@@ -118,41 +211,48 @@ class PostAgent:
 			while self.running:
 				try:
 					# Get context from past events
-					self.context = Context()
+					self.context = Context(channel=self.post_channel, game_state=self.game_state, timestamp=self.clock.now())
 					logger.info("Context loaded")
 
-					if self.context.context_str != "": # Do not call the llm if recent context is empty
-						# Create a commentary using context from monitor agent and notes of the post agents
-						combined_context = self.context.context_str + self.context.notes
-						analysis = self.post_analyzer.analyze_context(combined_context)
-						image_path = self.context.save_post(analysis) # Save post to context/posts and get image path
-
-						# Post to X/Twitter if conditions are satisfied
-						if ( 
-							self.x_enabled and 
-							hasattr(self, 'x_client') and 
-							analysis.get("post", False) and 
-							analysis.get("commentary", False) and
-							self.context.notes != "" # If the post agent has created a commentary with no notes, do not post to twitter.
-						):
-							success = self.x_client.post(analysis["commentary"], image_path)
-							if success:
-								logger.info(f"Posted to X/Twitter: {analysis['commentary'][:30]}...")
-							else:
-								logger.warning("Failed to post to X/Twitter")
-
-						# Post agents updates it's notes
-						new_notes = self.post_analyzer.update_notes(combined_context)
-						if new_notes != "":
-							self.context.save_notes(new_notes)
+					post_cycle(
+						self.context,
+						self.post_analyzer,
+						retriever=self.retriever,
+						dedup=self.dedup,
+						publish=self.publish
+					)
 
 					# Wait until next posting check
-					time.sleep(self.post_interval_secs)
+					self.clock.sleep(self.budget.interval(self.post_interval_secs))
 				except Exception as e:
 					logger.error(f"Error during posting cycle: {e}")
 		finally:
 			self.cleanup()
 
+	def publish(self, analysis: dict, image_path: str):
+		"""Queue the post for X/Twitter if conditions are satisfied, media upload starts immediately"""
+		if ( 
+			self.x_enabled and 
+			self.dispatcher and 
+			analysis.get("post", False) and 
+			analysis.get("commentary", False) and
+			self.context.notes != "" # If the post agent has created a commentary with no notes, do not post to twitter.
+		):
+			# Prefer the highlight clip when the monitor agent exported one
+			clip_path = analysis.get("clip_path", "")
+			media_path = clip_path if clip_path and os.path.exists(clip_path) else image_path
+			self.dispatcher.enqueue(analysis["commentary"], media_path)
+
+	def create_response_cache(self) -> Optional[ResponseCache]:
+		"""Create the local LLM response cache if enabled"""
+		if not self.response_cache_enabled:
+			return None
+		return ResponseCache(
+			cache_dir=f"{CACHE_DIR}/post",
+			ttl=self.response_cache_ttl_secs,
+			max_bytes=self.response_cache_max_bytes
+		)
+
 	def handle_interrupt(self, sig, frame):
 		"""Handle keyboard interrupt or termination signal"""
 		logger.info("Received interrupt signal, shutting down...")
@@ -163,6 +263,12 @@ class PostAgent:
 		"""Clean up resources"""
 		logger.info("Cleaning up resources...")
 
+		if self.profiler:
+			self.profiler.stop_profile() # Dump an in-progress profile before exiting
+
+		if self.dispatcher:
+			self.dispatcher.stop() # Pending posts are persisted and resumed on the next start
+
 if __name__ == "__main__":
 	post_agent = PostAgent()
 	post_agent.initialize()
@@ -4,10 +4,14 @@ from pathlib import Path
 from typing import Optional, List
 from datetime import datetime, timedelta, timezone
 
+from common.files import resolve_image_path
 from .utils import get_relative_time
+from .state import load_state, render_state
 
 logger = logging.getLogger(__name__)
 
+STATE_EVENT_LIMIT = 10 # Recent events kept when the game state block already covers team and location
+
 class Context:
 	def __init__(
 		self, 
@@ -15,13 +19,21 @@ class Context:
 		context_filename: str = "context.jsonl",
 		posts_dir: str = "context/posts", 
 		posts_filename: str = "posts.jsonl",
-		notes_filename: str = "notes.txt"
+		notes_filename: str = "notes.txt",
+		channel: Optional[str] = None,
+		game_state: bool = False,
+		timestamp: Optional[datetime] = None
 	):
-		self.timestamp = datetime.now(timezone.utc)
+		self.timestamp = timestamp or datetime.now(timezone.utc) # Replays load the context as of a past time
+		self.channel = channel # Only use events of this channel when the monitor watches several
+
+		# The game state tracked by the monitor agent replaces the per-event team dumps
+		self.state_str = render_state(load_state(channel=channel)) if game_state else ""
+		compact = self.state_str != ""
 
 		self.context_path = Path(context_dir) / context_filename
-		self.context = self._get_context()
-		self.context_str = self._context_to_string(self.context)
+		self.context = self._get_context(limit=STATE_EVENT_LIMIT if compact else 20)
+		self.context_str = self._context_to_string(self.context, include_team=not compact)
 
 		# Set up posts
 		self.posts_dir = Path(posts_dir)
@@ -62,6 +74,8 @@ class Context:
 			with open(self.context_path, 'r') as f:
 				for line in f:
 					entry = json.loads(line)
+					if self.channel and entry.get("channel", self.channel) != self.channel:
+						continue
 					entry_time = datetime.fromisoformat(entry["timestamp"])
 					if start_time <= entry_time <= end_time and entry["detailed_summary"] != "":
 						context.append(entry)
@@ -95,7 +109,7 @@ class Context:
 			logger.error(f"Error retrieving context entries: {e}")
 			return {}
 
-	def _context_to_string(self, context: dict = None) -> str:	
+	def _context_to_string(self, context: dict = None, include_team: bool = True) -> str:	
 		"""Convert context data to a formatted string for use in LLM prompts."""
 
 		if context is None:
@@ -120,9 +134,9 @@ class Context:
 			result += f'  "score": {event["score"]},\n'
 			result += f'  "event_details": "{event["detailed_summary"]}",\n'
 			
-			# Handle team data
+			# Handle team data (covered by the game state block in compact mode)
 			team_data = event.get("team_details", [])
-			if team_data:
+			if include_team and team_data:
 				team_members = []
 				for member in team_data:
 					name = member.get("name", "unknown pokemon name")
@@ -131,7 +145,7 @@ class Context:
 					team_members.append(f"{name}/{custom_name} ({health})")
 				team_str = ", ".join(team_members)
 				result += f'  "team": "There are {len(team_data)} pokemons ({team_str})",\n'
-			else:
+			elif include_team:
 				result += '  "team": "No team data available",\n'
 					
 			# Add location
@@ -164,8 +178,10 @@ class Context:
 			# Find the context entry with matching ID
 			for entry in self.context["context"]:
 				if entry.get("id") == image_id and "image_path" in entry:
-					image_path = entry["image_path"]
+					image_path = resolve_image_path(entry["image_path"]) # The frame may have been archived since
 					response["image_path"] = image_path
+					if entry.get("clip_path"):
+						response["clip_path"] = entry["clip_path"] # Highlight clip exported by the monitor agent
 					break
 			
 		# Append the data as a JSON line
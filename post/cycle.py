@@ -0,0 +1,73 @@
+import time
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from common.tokens import count_tokens
+from .context import Context
+
+logger = logging.getLogger(__name__)
+
+def post_cycle(
+	context: Context,
+	post_analyzer, # PostAnalyzer, imported lazily by the post agent
+	retriever=None,
+	dedup=None,
+	publish: Optional[Callable[[Dict[str, Any], str], None]] = None,
+	now: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+	"""Run one post cycle on a loaded context, shared by the post agent and replays.
+
+	Creates a commentary, vetoes repeats, saves the post, hands it to `publish`
+	and updates the notes. Returns a record of the decision with prompt sizes and
+	latencies, or None when there were no recent events. `now` is the (virtual)
+	time of the cycle, the wall clock by default.
+	"""
+	if context.context_str == "": # Do not call the llm if recent context is empty
+		return None
+	timestamp = now.isoformat() if now else None
+
+	# Create a commentary using context from monitor agent and notes of the post agents
+	combined_context = context.state_str + context.context_str + context.notes
+	if retriever:
+		prompt = context.state_str + context.context_str + retriever.retrieve(context.context, now=now.timestamp() if now else None)
+	else:
+		prompt = combined_context
+	start = time.perf_counter()
+	analysis = post_analyzer.analyze_context(prompt, timestamp=timestamp)
+	analyze_secs = time.perf_counter() - start
+
+	# Veto repeats of a recent post before it is saved, so the saved post records the veto
+	if dedup and analysis.get("post", False) and analysis.get("commentary"):
+		duplicate = dedup.find(analysis["commentary"], now=now.timestamp() if now else None)
+		if duplicate:
+			similarity, previous = duplicate
+			logger.info(f"Commentary repeats a recent post (similarity {similarity:.2f}), not posting: {previous['commentary']}")
+			analysis["post"] = False
+			analysis["duplicate_of"] = previous["commentary"]
+
+	image_path = context.save_post(analysis) # Save post to context/posts and get image path
+	if publish:
+		publish(analysis, image_path) # Before the notes update so media upload starts immediately
+
+	# Post agents updates it's notes (always from the full notes, they are rewritten as a whole)
+	start = time.perf_counter()
+	new_notes = post_analyzer.update_notes(combined_context, timestamp=timestamp)
+	notes_secs = time.perf_counter() - start
+	if new_notes != "":
+		context.save_notes(new_notes)
+
+	return {
+		"timestamp": timestamp or analysis.get("timestamp"),
+		"events": context.context.get("count", 0),
+		"model": analysis.get("model"),
+		"commentary": analysis.get("commentary", ""),
+		"score": analysis.get("score", 0),
+		"post": analysis.get("post", False),
+		"duplicate_of": analysis.get("duplicate_of"),
+		"image_path": image_path,
+		"prompt_tokens": count_tokens(prompt),
+		"notes_prompt_tokens": count_tokens(combined_context),
+		"analyze_secs": round(analyze_secs, 4),
+		"notes_secs": round(notes_secs, 4)
+	}
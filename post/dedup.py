@@ -0,0 +1,112 @@
+import json
+import time
+import zlib
+import logging
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.entities import normalize
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128 # MinHash permutations
+BANDS = 32 # LSH bands of NUM_PERM / BANDS rows, candidates start around 0.42 similarity
+SHINGLE_SIZE = 5 # Characters per shingle, short commentaries need character level shingles
+PRIME = 4294967311 # First prime above 2**32, shingle hashes are 32 bit
+DEFAULT_THRESHOLD = 0.5 # Estimated Jaccard similarity above which a commentary is a repeat
+DEFAULT_HORIZON_SECS = 24 * 60 * 60
+
+class DuplicateIndex:
+	"""MinHash/LSH index of past commentaries, used to veto repeated tweets.
+
+	Every commentary in posts.jsonl is reduced to a MinHash signature and bucketed
+	by LSH band, so a lookup only compares against the few posts sharing a bucket
+	and stays well under a millisecond with tens of thousands of posts. Only
+	commentaries that were posted within the horizon can veto a new one.
+	"""
+	def __init__(
+		self,
+		posts_path: str = "context/posts/posts.jsonl",
+		threshold: float = DEFAULT_THRESHOLD,
+		horizon_secs: float = DEFAULT_HORIZON_SECS
+	):
+		self.posts_path = Path(posts_path)
+		self.threshold = threshold
+		self.horizon_secs = horizon_secs # 0 compares against every past post
+		self.offset = 0 # Bytes of posts.jsonl already indexed
+		self.rows = NUM_PERM // BANDS
+		generator = np.random.default_rng(1) # Fixed seed so signatures are stable across restarts
+		self.a = generator.integers(1, 2**32, NUM_PERM, dtype=np.uint64)
+		self.b = generator.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+		self.buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+		self.signatures: List[np.ndarray] = []
+		self.entries: List[Dict[str, Any]] = []
+
+	def signature(self, text: str) -> Optional[np.ndarray]:
+		"""MinHash signature of the text's character shingles, None for text too short to compare."""
+		text = normalize(text)
+		if len(text) < SHINGLE_SIZE:
+			return None
+		shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+		hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+		return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % PRIME).min(axis=1)
+
+	def _bands(self, signature: np.ndarray):
+		for band in range(BANDS):
+			yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+	def add(self, text: str, timestamp: float, posted: bool = True) -> None:
+		signature = self.signature(text)
+		if signature is None:
+			return
+		position = len(self.entries)
+		self.signatures.append(signature)
+		self.entries.append({"commentary": text, "time": timestamp, "posted": posted})
+		for key in self._bands(signature):
+			self.buckets[key].append(position)
+
+	def refresh(self) -> None:
+		"""Index commentaries appended to posts.jsonl since the last refresh."""
+		if not self.posts_path.exists():
+			return
+		try:
+			with open(self.posts_path, "rb") as f:
+				f.seek(self.offset)
+				for line in f:
+					if not line.endswith(b"\n"):
+						break # Partially written entry, read it next time
+					self.offset += len(line)
+					try:
+						entry = json.loads(line)
+						if entry.get("commentary"):
+							self.add(
+								entry["commentary"],
+								datetime.fromisoformat(entry["timestamp"]).timestamp(),
+								posted=bool(entry.get("post")) and not entry.get("duplicate_of")
+							)
+					except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+						continue
+		except Exception as e:
+			logger.error(f"Error indexing posts for deduplication: {e}")
+
+	def find(self, text: str, now: Optional[float] = None) -> Optional[Tuple[float, Dict[str, Any]]]:
+		"""Return (similarity, past post) of the closest posted repeat of the text, None if it is new."""
+		self.refresh()
+		signature = self.signature(text)
+		if signature is None:
+			return None
+		now = now if now is not None else time.time()
+		candidates = {position for key in self._bands(signature) for position in self.buckets.get(key, ())}
+		best = None
+		for position in candidates:
+			entry = self.entries[position]
+			if not entry["posted"] or (self.horizon_secs and now - entry["time"] > self.horizon_secs):
+				continue
+			similarity = float(np.mean(self.signatures[position] == signature))
+			if similarity >= self.threshold and (best is None or similarity > best[0]):
+				best = (similarity, entry)
+		return best
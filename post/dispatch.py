@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PENDING_PATH = "context/posts/pending.json"
+MAX_ATTEMPTS = 6
+BASE_RETRY_DELAY = 30 # secs, doubled after every failed attempt
+MAX_RETRY_DELAY = 30 * 60 # secs
+UPLOAD_WORKERS = 2
+UPLOAD_TIMEOUT = 5 * 60 # secs
+
+def is_transient(error: Exception) -> bool:
+	"""True for failures worth retrying: rate limits, server errors and network errors.
+
+	Other HTTP errors (duplicate content, text too long, bad media) fail the same
+	way on every attempt.
+	"""
+	status = getattr(getattr(error, "response", None), "status_code", None)
+	if status is not None:
+		return status == 429 or status >= 500
+	return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError, FutureTimeoutError))
+
+class TweetDispatcher:
+	"""Posts tweets from a background thread so the post agent never blocks on the X API.
+
+	Media is uploaded as soon as a post is queued, transient failures are retried
+	with exponential backoff and pending posts are persisted across restarts.
+	"""
+	def __init__(self, client, pending_path: str = DEFAULT_PENDING_PATH):
+		self.client = client
+		self.pending_path = Path(pending_path)
+		self.pending: List[Dict] = []
+		self.uploads: Dict[str, Future] = {} # image_path -> media id future
+		self.executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="media-upload")
+		self.condition = threading.Condition()
+		self.thread: Optional[threading.Thread] = None
+		self.running = False
+
+	def start(self) -> None:
+		"""Load pending posts from disk and start the dispatch thread."""
+		self.pending = self._load_pending()
+		if self.pending:
+			logger.info(f"Resuming {len(self.pending)} pending post(s)")
+		self.running = True
+		self.thread = threading.Thread(target=self._run, name="tweet-dispatch", daemon=True)
+		self.thread.start()
+
+	def stop(self, timeout: float = 10) -> None:
+		"""Stop the dispatch thread, pending posts stay on disk for the next start."""
+		with self.condition:
+			self.running = False
+			self.condition.notify_all()
+		if self.thread:
+			self.thread.join(timeout)
+		self.executor.shutdown(wait=False, cancel_futures=True)
+		with self.condition:
+			self._save_pending()
+
+	def enqueue(self, text: str, image_path: str = "") -> None:
+		"""Queue a post and start uploading its media right away."""
+		if image_path and os.path.exists(image_path):
+			self.prefetch_media(image_path)
+		else:
+			image_path = ""
+		job = {
+			"id": uuid.uuid4().hex,
+			"text": text,
+			"image_path": image_path,
+			"attempts": 0,
+			"next_attempt": time.time(),
+			"created": time.time()
+		}
+		with self.condition:
+			self.pending.append(job)
+			self._save_pending()
+			self.condition.notify_all()
+		logger.info(f"Queued post for X/Twitter: {text[:30]}...")
+
+	def prefetch_media(self, image_path: str) -> Future:
+		"""Start uploading an image in the background and return the media id future."""
+		with self.condition:
+			future = self.uploads.get(image_path)
+			if future is None:
+				future = self.executor.submit(self.client.upload_media, image_path)
+				self.uploads[image_path] = future
+			return future
+
+#-------------------------------------------------------------------
+# Dispatch loop
+#-------------------------------------------------------------------
+	def _run(self) -> None:
+		"""Post due jobs in order, sleeping until the next one is due."""
+		while True:
+			with self.condition:
+				while self.running:
+					job = self._next_due()
+					if job is not None:
+						break
+					wait = min((j["next_attempt"] for j in self.pending), default=None)
+					self.condition.wait(None if wait is None else max(0.0, wait - time.time()))
+				if not self.running:
+					return
+
+			try:
+				self._dispatch(job)
+				logger.info(f"Posted to X/Twitter: {job['text'][:30]}...")
+				with self.condition:
+					self.pending.remove(job)
+					self._save_pending()
+			except Exception as e:
+				self._retry_later(job, e)
+
+	def _next_due(self) -> Optional[Dict]:
+		"""Return the oldest job whose retry time has passed."""
+		now = time.time()
+		for job in self.pending:
+			if job["next_attempt"] <= now:
+				return job
+		return None
+
+	def _dispatch(self, job: Dict) -> None:
+		"""Upload media (unless already uploaded) and create the tweet. Raises on failure."""
+		media_ids = []
+		if job["image_path"] and not os.path.exists(job["image_path"]):
+			logger.warning(f"Image {job['image_path']} no longer exists, posting without it")
+			job["image_path"] = ""
+		if job["image_path"]:
+			future = self.prefetch_media(job["image_path"])
+			try:
+				media_ids.append(future.result(timeout=UPLOAD_TIMEOUT))
+			finally:
+				# Failed or used uploads are not reused, media ids expire and retries upload again
+				with self.condition:
+					self.uploads.pop(job["image_path"], None)
+		self.client.create_tweet(job["text"], media_ids)
+
+	def _retry_later(self, job: Dict, error: Exception) -> None:
+		"""Schedule the job with exponential backoff, or drop it after MAX_ATTEMPTS or a permanent error."""
+		with self.condition:
+			job["attempts"] += 1
+			if not is_transient(error):
+				logger.error(f"Dropping post, X/Twitter rejected it: {error}")
+				self.pending.remove(job)
+			elif job["attempts"] >= MAX_ATTEMPTS:
+				logger.error(f"Dropping post after {job['attempts']} failed attempts: {error}")
+				self.pending.remove(job)
+			else:
+				delay = min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2 ** (job["attempts"] - 1))
+				job["next_attempt"] = time.time() + delay
+				logger.warning(f"Failed to post to X/Twitter (attempt {job['attempts']}), retrying in {delay}s: {error}")
+			self._save_pending()
+
+#-------------------------------------------------------------------
+# Persistence
+# - context/posts/pending.json
+# - posts waiting to be dispatched to X/Twitter
+#-------------------------------------------------------------------
+	def _load_pending(self) -> List[Dict]:
+		"""Read pending posts saved by a previous run."""
+		try:
+			if not self.pending_path.exists():
+				return []
+			with open(self.pending_path, 'r') as f:
+				pending = json.load(f)
+			return pending if isinstance(pending, list) else []
+		except Exception as e:
+			logger.error(f"Error reading pending posts from {self.pending_path}: {e}")
+			return []
+
+	def _save_pending(self) -> None:
+		"""Atomically write pending posts to disk. Caller must hold the condition lock."""
+		try:
+			self.pending_path.parent.mkdir(parents=True, exist_ok=True)
+			tmp_path = self.pending_path.with_suffix(".tmp")
+			with open(tmp_path, 'w') as f:
+				json.dump(self.pending, f)
+			os.replace(tmp_path, self.pending_path)
+		except Exception as e:
+			logger.error(f"Error saving pending posts to {self.pending_path}: {e}")
@@ -1,13 +1,16 @@
 import os
 import json
 import logging
-import requests
-import tiktoken
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional, Tuple
 
 from .prompts import ANALYZE_CONTEXT_PROMPT, UPDATE_NOTES_PROMPT
-from .validate import validate_response, sanitize_results, get_default_response, count_tokens
+from .validate import validate_response, sanitize_results, get_default_response
+from common.tokens import count_message_tokens
+from common.client import ChatClient
+from common.budget import BudgetGovernor
+from common.cache import ResponseCache
+from common.ratelimit import RateLimiter, PRIORITY_HIGH, PRIORITY_NORMAL
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +21,15 @@ AVAILABLE_MODELS = [
 
 class PostAnalyzer:
 	"""Analyzes recent events and previous milestones by using LLM and decides whether a tweet should be created"""
-	def __init__(self, api_key: str, model: str = None):
+	def __init__(
+		self, 
+		api_key: str, 
+		model: str = None,
+		response_cache: Optional[ResponseCache] = None,
+		prompt_cache: bool = False,
+		rate_limiter: Optional[RateLimiter] = None,
+		budget: Optional[BudgetGovernor] = None
+	):
 		self.api_key = api_key
 		self.model = model if model in AVAILABLE_MODELS else AVAILABLE_MODELS[0]
 		self.api_url = "https://openrouter.ai/api/v1/chat/completions"
@@ -26,29 +37,23 @@ class PostAnalyzer:
 		if not api_key:
 			logger.error("No OpenRouter API key provided")
 			raise ValueError("OpenRouter API key is required")
-
-		self.encoder = tiktoken.encoding_for_model("gpt-4") # Initialize tiktoken encoder
+		self.client = ChatClient(
+			api_key, 
+			self.api_url, 
+			response_cache=response_cache, 
+			prompt_cache=prompt_cache, 
+			rate_limiter=rate_limiter,
+			budget=budget
+		)
             
 	def _count_tokens(self, messages: List[Dict]) -> int:
-		"""Count input and output tokens using tiktoken."""
-		token_count = 0
-		for message in messages:
-			if isinstance(message.get('content'), str):
-				token_count += count_tokens(message['content'], self.encoder)
-			elif isinstance(message.get('content'), list):
-				for content in message['content']:
-					if content['type'] == 'text':
-						token_count += count_tokens(content['text'], self.encoder)
-		return token_count
+		"""Count input tokens, static prompts are only tokenized once per process."""
+		return count_message_tokens(messages, static=(ANALYZE_CONTEXT_PROMPT, UPDATE_NOTES_PROMPT))
 		
-	def analyze_context(self, context: str) -> Dict[str, Any]:
-		"""Analyze a Twitch gameplay image and return structured data."""
+	def analyze_context(self, context: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+		"""Analyze recent events and notes and return a commentary. Timestamps default to now."""
 		try:
-			timestamp = datetime.now(timezone.utc).isoformat()
-			headers = {
-				"Authorization": f"Bearer {self.api_key}",
-				"Content-Type": "application/json"
-			}
+			timestamp = timestamp or datetime.now(timezone.utc).isoformat()
 			messages = [
 				{
 					"role": "system", 
@@ -76,24 +81,24 @@ class PostAnalyzer:
 				}
 				try:
 					logger.info(f"Analyzing context (model: {model})")
-					response = requests.post(self.api_url, json=payload, headers=headers)
+					status_code, data, cache_key = self.client.send(payload, priority=PRIORITY_HIGH)
 
-					if response.status_code != 200:
-						if response.status_code == 429:
+					if status_code != 200:
+						if status_code == 429:
 							logger.warning(f"Rate limit exceeded for model {model}, trying next model")
 							continue
 						else:
-							logger.error(f"HTTP error with model {model}: {response.status_code}")
+							logger.error(f"HTTP error with model {model}: {status_code}")
 							continue
 
 					validated_result = validate_response(
-						response.json(), 
+						data, 
 						timestamp, 
 						model, 
-						input_tokens,
-						self.encoder
+						input_tokens
 					)
 					result = sanitize_results(validated_result, timestamp, model)
+					self.client.remember(cache_key, data)
 					logger.info(f"Analysis of context successful!")
 					return result
 					
@@ -108,14 +113,10 @@ class PostAnalyzer:
 			logger.error(f"Error analyzing context: {e}")
 			return get_default_response(timestamp)
 
-	def update_notes(self, context: str) -> str:
+	def update_notes(self, context: str, timestamp: Optional[str] = None) -> str:
 		"""Update notes based on context and existing notes."""
 		try:
-			timestamp = datetime.now(timezone.utc).isoformat()
-			headers = {
-				"Authorization": f"Bearer {self.api_key}",
-				"Content-Type": "application/json"
-			}
+			timestamp = timestamp or datetime.now(timezone.utc).isoformat()
 			messages = [
 				{
 					"role": "system", 
@@ -142,24 +143,25 @@ class PostAnalyzer:
 				}
 				try:
 					logger.info(f"Updating notes (model: {model})")
-					response = requests.post(self.api_url, json=payload, headers=headers)
+					status_code, data, cache_key = self.client.send(payload, priority=PRIORITY_NORMAL)
 
-					if response.status_code != 200:
-						if response.status_code == 429:
+					if status_code != 200:
+						if status_code == 429:
 							logger.warning(f"Rate limit exceeded for model {model}, trying next model")
 							continue
 						else:
-							logger.error(f"HTTP error with model {model}: {response.status_code}")
+							logger.error(f"HTTP error with model {model}: {status_code}")
 							continue
 
 					# Extract content directly without validation
 					if (
-						"choices" in response.json() and 
-						response.json()["choices"] and 
-						"message" in response.json()["choices"][0] and
-						"content" in response.json()["choices"][0]["message"]
+						"choices" in data and 
+						data["choices"] and 
+						"message" in data["choices"][0] and
+						"content" in data["choices"][0]["message"]
 					):
-						content = response.json()["choices"][0]["message"]["content"]
+						content = data["choices"][0]["message"]["content"]
+						self.client.remember(cache_key, data)
 						logger.info(f"Notes update successful!")
 						return content
 					else:
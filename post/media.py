@@ -0,0 +1,88 @@
+import io
+import os
+import glob
+import hashlib
+import logging
+from pathlib import Path
+
+from PIL import Image
+
+from common.files import file_hash
+from common.images import crop_game_area, get_game_area
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DIR = "context/posts/media"
+MAX_MEDIA_BYTES = int(os.getenv("MEDIA_MAX_BYTES", "1000000"))
+MAX_MEDIA_WIDTH = 1200 # Widest size X displays inline
+JPEG_QUALITIES = [90, 82, 75, 65, 55, 45]
+DOWNSCALE_STEP = 0.75 # Width factor applied when even the lowest JPEG quality is over budget
+MIN_MEDIA_WIDTH = 320
+MAX_CACHED_MEDIA = 200
+
+def _encode(image: Image.Image, max_bytes: int):
+	"""Return (extension, bytes) for the best encoding that fits in max_bytes."""
+	# Lossless first: a palette PNG when the frame has few enough colours, otherwise full colour
+	buffer = io.BytesIO()
+	lossless = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT) if image.getcolors(256) else image
+	lossless.save(buffer, format="PNG", optimize=True)
+	if buffer.tell() <= max_bytes:
+		return "png", buffer.getvalue()
+
+	# Otherwise step down the JPEG quality ladder, then the size, until the budget is met
+	rgb = image.convert("RGB")
+	while True:
+		for quality in JPEG_QUALITIES:
+			buffer = io.BytesIO()
+			rgb.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+			if buffer.tell() <= max_bytes:
+				return "jpg", buffer.getvalue()
+		width = round(rgb.width * DOWNSCALE_STEP)
+		if width < MIN_MEDIA_WIDTH:
+			logger.warning(f"Could not fit media in {max_bytes} bytes, using {buffer.tell()} bytes at {rgb.width}px")
+			return "jpg", buffer.getvalue()
+		rgb = rgb.resize((width, max(1, round(rgb.height * width / rgb.width))), Image.Resampling.LANCZOS)
+
+def prepare_media(image_path: str, media_dir: str = MEDIA_DIR, max_bytes: int = MAX_MEDIA_BYTES) -> str:
+	"""Crop, scale and re-encode a screenshot for upload. Returns the prepared file path.
+
+	Prepared files are cached by image hash and preparation settings (size budget,
+	crop box, width), so retries and reposts reuse them. Falls back to the original image if anything goes wrong.
+	"""
+	try:
+		settings = f"{max_bytes}:{get_game_area()}:{MAX_MEDIA_WIDTH}"
+		key = f"{file_hash(image_path)[:32]}_{hashlib.sha256(settings.encode()).hexdigest()[:12]}"
+		cached = glob.glob(os.path.join(media_dir, f"{key}.*"))
+		if cached:
+			return cached[0]
+
+		with Image.open(image_path) as image:
+			image = crop_game_area(image.convert("RGB"))
+			if image.width > MAX_MEDIA_WIDTH:
+				height = round(image.height * MAX_MEDIA_WIDTH / image.width)
+				image = image.resize((MAX_MEDIA_WIDTH, height), Image.Resampling.LANCZOS)
+			extension, data = _encode(image, max_bytes)
+
+		Path(media_dir).mkdir(parents=True, exist_ok=True)
+		media_path = os.path.join(media_dir, f"{key}.{extension}")
+		with open(media_path, "wb") as f:
+			f.write(data)
+		logger.info(f"Prepared {image_path} for upload ({os.path.getsize(image_path)} -> {len(data)} bytes)")
+		_prune(media_dir)
+		return media_path
+
+	except Exception as e:
+		logger.warning(f"Could not prepare {image_path} for upload, using the original: {e}")
+		return image_path
+
+def _prune(media_dir: str) -> None:
+	"""Keep only the newest MAX_CACHED_MEDIA prepared files."""
+	files = glob.glob(os.path.join(media_dir, "*"))
+	if len(files) <= MAX_CACHED_MEDIA:
+		return
+	files.sort(key=os.path.getmtime)
+	for old_file in files[:-MAX_CACHED_MEDIA]:
+		try:
+			os.remove(old_file)
+		except OSError as e:
+			logger.warning(f"Failed to remove cached media {old_file}: {e}")
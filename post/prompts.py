@@ -10,10 +10,14 @@ Rules for using context and creating the commentary:
 - Recent events:
 1. You should use recent events to formulate your commentary. Recents events have occured in the past 5 minutes.
 2. Recent events will be placed within <recent_events> and </recent_events> tags.
+- Game state
+1. A summary of the current location, team, badges and battles may be placed within <game_state> and </game_state> tags.
+2. It is tracked across many screenshots, trust it over single events for the team and location.
 - Your notes
 1. Your notes are long running events in the stream. This are notes created by a previous instance of an agent.
 2. You have to use the notes as a guide of what has happened in the stream previously
 3. The notes will be placed within the <your_notes> and </your_notes> tags.
+4. They may only be the excerpts of your notes, past posts ([post]) and past milestone events ([milestone]) most relevant to the recent events.
 - Other
 1. Pay careful attenttion to the crucial events happening in the context. This can include major events like pokemon battles, pokemon teams, conversations, player strategies, etc
 2. Be objective! The player can make mistakes or have a bad strategy. Call out this if needed.
@@ -56,6 +60,9 @@ Rules for using context and updating the notes:
 - Recent events:
 1. You should use recent events to update your knowledge of the stream. Recents events have occured in the past 5 minutes.
 2. Recent events will be placed within <recent_events> and </recent_events> tags.
+- Game state
+1. A summary of the current location, team, badges and battles may be placed within <game_state> and </game_state> tags.
+2. It is tracked across many screenshots, trust it over single events for the team and location.
 - Your notes
 1. These are notes are notes taken by previous instance of yourself.
 2. You have to use the notes as a guide of what has happened in the stream previously
@@ -0,0 +1,227 @@
+import re
+import json
+import math
+import logging
+from pathlib import Path
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.entities import normalize, LOCATION_INDEX, SPECIES_INDEX
+from common.tokens import approx_tokens
+from .utils import get_relative_time
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2 # Term frequency saturation
+BM25_B = 0.75 # Document length normalization
+DEFAULT_TOP_K = 8
+DEFAULT_MAX_TOKENS = 800 # Budget for the retrieved passages in each prompt
+DEFAULT_MILESTONE_SCORE = 8 # Monitor events scored at least this are indexed as milestones
+MAX_PASSAGE_TOKENS = 120 # Long note sections are split into passages of about this size
+STOPWORDS = set("""
+a an and are as at be been but by for from has have he his in into is it its of on or that the their
+then there they this to was were will with while who which what when where claude player game screen
+currently still now just also appears seems
+""".split())
+
+def tokenize(text: str) -> List[str]:
+	return [word for word in normalize(text).split() if word not in STOPWORDS and len(word) > 1]
+
+class BM25Index:
+	"""In-memory inverted index with BM25 scoring, documents can be added and removed at any time."""
+	def __init__(self):
+		self.postings: Dict[str, Dict[str, int]] = defaultdict(dict) # term -> {doc id: term frequency}
+		self.lengths: Dict[str, int] = {}
+		self.documents: Dict[str, Dict[str, Any]] = {}
+		self.total_length = 0
+
+	def __len__(self) -> int:
+		return len(self.documents)
+
+	def add(self, doc_id: str, text: str, **fields) -> None:
+		if doc_id in self.documents:
+			self.remove(doc_id)
+		terms = Counter(tokenize(text))
+		for term, count in terms.items():
+			self.postings[term][doc_id] = count
+		length = sum(terms.values())
+		self.lengths[doc_id] = length
+		self.total_length += length
+		self.documents[doc_id] = {"text": text, "terms": list(terms), **fields}
+
+	def remove(self, doc_id: str) -> None:
+		document = self.documents.pop(doc_id, None)
+		if document is None:
+			return
+		for term in document["terms"]:
+			postings = self.postings[term]
+			postings.pop(doc_id, None)
+			if not postings:
+				del self.postings[term]
+		self.total_length -= self.lengths.pop(doc_id)
+
+	def search(self, query: str, limit: int = DEFAULT_TOP_K) -> List[Tuple[str, float]]:
+		"""Return (doc id, score) of the best matching documents, only documents sharing a term are scored."""
+		if not self.documents:
+			return []
+		count = len(self.documents)
+		avg_length = self.total_length / count or 1
+		scores: Dict[str, float] = defaultdict(float)
+		for term, query_count in Counter(tokenize(query)).items():
+			postings = self.postings.get(term)
+			if not postings:
+				continue
+			idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+			for doc_id, frequency in postings.items():
+				norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+				scores[doc_id] += query_count * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+		return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+class NotesRetriever:
+	"""Picks the notes, past posts and milestone events relevant to the current events.
+
+	Instead of the whole notes file, analyze_context gets the top-k passages for
+	the locations, Pokemon and trainers in the recent events, within a token
+	budget, so the prompt stays the same size however long the stream runs. Posts
+	and milestones are read incrementally from the end of their files, notes are
+	re-split only when the file changes.
+	"""
+	def __init__(
+		self,
+		context_path: str = "context/monitor/context.jsonl",
+		posts_path: str = "context/posts/posts.jsonl",
+		notes_path: str = "context/posts/notes.txt",
+		channel: Optional[str] = None,
+		top_k: int = DEFAULT_TOP_K,
+		max_tokens: int = DEFAULT_MAX_TOKENS,
+		milestone_score: int = DEFAULT_MILESTONE_SCORE
+	):
+		self.paths = {"milestone": Path(context_path), "post": Path(posts_path)}
+		self.offsets = {"milestone": 0, "post": 0}
+		self.notes_path = Path(notes_path)
+		self.notes_mtime: Optional[float] = None
+		self.note_ids: List[str] = []
+		self.channel = channel
+		self.top_k = top_k
+		self.max_tokens = max_tokens
+		self.milestone_score = milestone_score
+		self.index = BM25Index()
+
+	def refresh(self) -> None:
+		"""Index items written since the last refresh."""
+		for source in ("milestone", "post"):
+			path = self.paths[source]
+			if not path.exists():
+				continue
+			if path.stat().st_size < self.offsets[source]:
+				self.offsets[source] = 0 # File was replaced
+			try:
+				with open(path, "rb") as f:
+					f.seek(self.offsets[source])
+					for line in f:
+						if not line.endswith(b"\n"):
+							break # Partially written entry, read it next time
+						self.offsets[source] += len(line)
+						try:
+							self._add(source, json.loads(line))
+						except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+							continue
+			except Exception as e:
+				logger.error(f"Error indexing {path}: {e}")
+		self._refresh_notes()
+
+	def _add(self, source: str, entry: Dict[str, Any]) -> None:
+		timestamp = entry.get("timestamp", "")
+		if source == "post":
+			if entry.get("commentary"):
+				self.index.add(f"post:{self.offsets[source]}", entry["commentary"], source=source, timestamp=timestamp)
+			return
+		if self.channel and entry.get("channel", self.channel) != self.channel:
+			return
+		if entry.get("score", 0) >= self.milestone_score and entry.get("detailed_summary"):
+			text = entry["detailed_summary"]
+			if entry.get("estimated_location"):
+				text += f" (location: {entry['estimated_location']})"
+			self.index.add(f"milestone:{self.offsets[source]}", text, source=source, timestamp=timestamp)
+
+	def _refresh_notes(self) -> None:
+		"""Re-split the notes into passages when the post agent has rewritten them."""
+		try:
+			mtime = self.notes_path.stat().st_mtime if self.notes_path.exists() else None
+			if mtime == self.notes_mtime:
+				return
+			self.notes_mtime = mtime
+			for doc_id in self.note_ids:
+				self.index.remove(doc_id)
+			self.note_ids = []
+			content = self.notes_path.read_text() if mtime is not None else ""
+			for i, passage in enumerate(split_passages(content)):
+				doc_id = f"note:{i}"
+				self.index.add(doc_id, passage, source="note", timestamp="")
+				self.note_ids.append(doc_id)
+		except Exception as e:
+			logger.error(f"Error indexing notes: {e}")
+
+	def query_for(self, context: Dict[str, Any]) -> str:
+		"""Build a query from the recent events, canonical location and species names count twice."""
+		terms = []
+		for event in context.get("context", []):
+			terms.append(event.get("detailed_summary", ""))
+			location = LOCATION_INDEX.name(event.get("location_id")) or event.get("estimated_location", "")
+			terms += [location, location]
+			for member in event.get("team_details", []):
+				species = SPECIES_INDEX.name(member.get("species_id")) or member.get("name", "")
+				terms += [species, species]
+		return " ".join(term for term in terms if term)
+
+	def retrieve(self, context: Dict[str, Any], now: Optional[float] = None) -> str:
+		"""Return the passages relevant to the recent events within <your_notes> tags."""
+		self.refresh()
+		events = context.get("context", []) if context else []
+		if not self.index or not events:
+			return "<your_notes>\nNo previous notes\n</your_notes>"
+
+		# Events of the current window are already in the prompt
+		window_start = min(event["timestamp"] for event in events)
+		now = now if now is not None else datetime.now(timezone.utc).timestamp()
+		lines, used = [], 0
+		for doc_id, _ in self.index.search(self.query_for(context), limit=self.top_k * 2):
+			document = self.index.documents[doc_id]
+			if document["source"] == "milestone" and document["timestamp"] >= window_start:
+				continue
+			label = document["source"]
+			if document["timestamp"]:
+				try:
+					label += ", " + get_relative_time(now, datetime.fromisoformat(document["timestamp"]).timestamp())
+				except ValueError:
+					pass
+			line = f"- [{label}] {document['text']}"
+			tokens = approx_tokens(line)
+			if used + tokens > self.max_tokens:
+				continue
+			lines.append(line)
+			used += tokens
+			if len(lines) >= self.top_k:
+				break
+
+		logger.info(f"Retrieved {len(lines)} of {len(self.index)} passages ({used} tokens)")
+		if not lines:
+			return "<your_notes>\nNo relevant notes\n</your_notes>"
+		return "<your_notes>\n" + "\n".join(lines) + "\n</your_notes>"
+
+def split_passages(content: str, max_tokens: int = MAX_PASSAGE_TOKENS) -> List[str]:
+	"""Split notes on blank lines and headings, long sections are cut at line boundaries."""
+	passages = []
+	for section in re.split(r"\n\s*\n|\n(?=#)", content):
+		lines, size = [], 0
+		for line in section.strip().splitlines():
+			tokens = approx_tokens(line)
+			if lines and size + tokens > max_tokens:
+				passages.append("\n".join(lines))
+				lines, size = [], 0
+			lines.append(line)
+			size += tokens
+		if lines:
+			passages.append("\n".join(lines))
+	return [passage for passage in passages if passage.strip()]
@@ -0,0 +1,58 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "context/monitor/state.json"
+
+def load_state(path: str = DEFAULT_STATE_PATH, channel: Optional[str] = None) -> Dict[str, Any]:
+	"""Load the game state maintained by the monitor agent, {} if there is none.
+
+	Picks the given channel, or the most recently updated one.
+	"""
+	try:
+		state_path = Path(path)
+		if not state_path.exists():
+			return {}
+		with open(state_path, "r") as f:
+			states = json.load(f)
+		if channel is not None:
+			return states.get(channel, {})
+		return max(states.values(), key=lambda state: state.get("updated") or "", default={})
+	except Exception as e:
+		logger.error(f"Error loading game state: {e}")
+		return {}
+
+def render_state(state: Dict[str, Any]) -> str:
+	"""Render the game state as a compact block for the post prompts."""
+	if not state or not state.get("frames"):
+		return ""
+
+	lines = []
+	location = state.get("location", {}).get("value")
+	if location:
+		lines.append(f"Location: {location} (confidence {state.get('location_confidence', 0):.0%})")
+	history = [entry["location"] for entry in state.get("location_history", [])[:-1]]
+	if history:
+		lines.append(f"Previous locations: {' > '.join(history[-5:])}")
+
+	team = state.get("team_details", [])
+	if team:
+		members = []
+		for member in team:
+			name = member.get("name", "")
+			if member.get("custom_name") and member["custom_name"].lower() != name.lower():
+				name = f"{name}/{member['custom_name']}"
+			members.append(f"{name} ({member['health']})" if member.get("health") else name)
+		lines.append(f"Team: {', '.join(members)} (confidence {state.get('team_confidence', 0):.0%})")
+
+	badges = state.get("badges", [])
+	lines.append(f"Badges: {', '.join(badges) if badges else 'none confirmed'}")
+
+	if state.get("in_battle"):
+		lines.append(f"In battle for {state.get('battle_frames', 0)} frames")
+	lines.append(f"Battles seen: {state.get('battles', 0)} (longest {state.get('longest_battle', 0)} frames)")
+
+	return "<game_state>\n" + "\n".join(lines) + "\n</game_state>\n"
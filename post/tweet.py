@@ -1,7 +1,9 @@
 import os
 import logging
 import tweepy
-from typing import Optional
+from typing import List, Optional
+
+from .media import prepare_media
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,27 @@ class TwitterClient:
 			self.client_v2 = None
 			self.api_v1 = None
 		
+	def upload_media(self, image_path: str) -> str:
+		"""Upload an image or GIF clip and return its media id. Raises on failure."""
+		if not self.api_v1:
+			raise RuntimeError("Twitter API not initialized")
+		if image_path.endswith(".gif"):
+			# Animated GIFs have to go through the chunked upload endpoint
+			media = self.api_v1.media_upload(image_path, chunked=True, media_category="tweet_gif")
+			logger.info(f"Uploaded clip: {image_path}")
+			return media.media_id_string
+		media_path = prepare_media(image_path) # Cropped, scaled and compressed copy
+		media = self.api_v1.media_upload(media_path)
+		logger.info(f"Uploaded image: {image_path} ({media_path})")
+		return media.media_id_string
+
+	def create_tweet(self, text: str, media_ids: Optional[List[str]] = None) -> None:
+		"""Create a tweet with already uploaded media. Raises on failure."""
+		if not self.client_v2:
+			raise RuntimeError("Twitter API not initialized")
+		self.client_v2.create_tweet(text=text, media_ids=media_ids if media_ids else None)
+		logger.info(f"Tweet posted successfully")
+
 	def post(self, text: str, image_path: str = "") -> bool:
 		"""Post to Twitter with/without an image"""
 		if not self.client_v2 or not self.api_v1:
@@ -48,13 +71,10 @@ class TwitterClient:
 			# If image path is provided and valid, upload and include it
 			media_ids = []
 			if image_path and os.path.exists(image_path):
-				media = self.api_v1.media_upload(image_path)
-				media_ids.append(media.media_id_string)
-				logger.info(f"Uploaded image: {image_path}")
+				media_ids.append(self.upload_media(image_path))
 			
 			# Create the tweet
-			response = self.client_v2.create_tweet(text=text, media_ids=media_ids if media_ids else None)
-			logger.info(f"Tweet posted successfully")
+			self.create_tweet(text, media_ids)
 			return True
 			
 		except Exception as e:
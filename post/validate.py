@@ -2,7 +2,9 @@ import json
 from typing import Dict, Any
 from datetime import datetime
 
-def validate_response(response, timestamp: str, model: str, input_tokens: int, encoder):
+from common.tokens import count_tokens, usage_from_response
+
+def validate_response(response, timestamp: str, model: str, input_tokens: int):
 	"""Validate and process LLM API response for post agent."""
 	if (
 		"choices" not in response or 
@@ -13,18 +15,22 @@ def validate_response(response, timestamp: str, model: str, input_tokens: int, e
 		raise ValueError("Invalid response structure")
 
 	content = response["choices"][0]["message"]["content"]
-	output_tokens = count_tokens(content, encoder)
 
 	try:
 		post_result = json.loads(content)
 	except json.JSONDecodeError as json_err:
 		raise ValueError(f"Failed to parse JSON: {json_err}")
 
-	post_result['token_usage'] = {
-		'input_tokens': input_tokens,
-		'output_tokens': output_tokens,
-		'total_tokens': input_tokens + output_tokens
-	}
+	# Prefer the usage reported by the API over the local estimate
+	usage = usage_from_response(response)
+	if usage is None:
+		output_tokens = count_tokens(content)
+		usage = {
+			'input_tokens': input_tokens,
+			'output_tokens': output_tokens,
+			'total_tokens': input_tokens + output_tokens
+		}
+	post_result['token_usage'] = usage
 	return post_result
         
 def sanitize_results(response: Dict[str, Any], timestamp: str, model: str) -> Dict[str, Any]:
@@ -88,8 +94,4 @@ def get_default_response(timestamp: str) -> Dict[str, Any]:
 			"output_tokens": 0,
 			"total_tokens": 0,
 		}
-	} 
-
-def count_tokens(text: str, encoder) -> int:
-	"""Count tokens in text using the provided encoder."""
-	return len(encoder.encode(text))
\ No newline at end of file
+	} 
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Replay the post agent over a historical context.jsonl with a virtual clock.
+
+Steps through the log in POST_INTERVAL windows as fast as the LLM backend
+answers and records every decision, prompt size and latency:
+
+	uv run replay.py context/monitor/context.jsonl --start 2025-03-01T00:00 --end 2025-03-02T00:00
+	uv run replay.py context/monitor/context.jsonl --backend openrouter --notes-retrieval --dedup
+
+Posts, notes and decisions.jsonl are written to the output directory, never to
+context/posts, and nothing is tweeted. The monitor's game state file is not
+replayed, so GAME_STATE is not supported.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from post.context import Context
+from post.cycle import post_cycle
+from common.clock import VirtualClock
+from common.tokens import approx_tokens
+
+logger = logging.getLogger("replay")
+
+DEFAULT_POST_INTERVAL = "5" # mins
+DEFAULT_OUTPUT_DIR = "context/replay"
+MOCK_POST_SCORE = 8 # The mock posts when the best recent event scored at least this
+MOCK_NOTES_LINES = 40
+
+class MockChatClient:
+	"""Local stand-in for ChatClient that answers post agent prompts deterministically.
+
+	The commentary is the summary of the highest scored recent event, the notes
+	gain one line per cycle. Used to replay without network access or cost.
+	"""
+	def __init__(self, latency_secs: float = 0.0):
+		self.latency_secs = latency_secs
+
+	def send(self, payload: Dict[str, Any], priority: int = 0) -> Tuple[int, Dict[str, Any], Optional[str]]:
+		if self.latency_secs:
+			time.sleep(self.latency_secs)
+		prompt = payload["messages"][-1]["content"][0]["text"]
+		events = dict(re.findall(r'"id": (\d+),.*?"event_details": "(.*?)",\n', prompt, re.DOTALL))
+		best = re.search(r"event \(id: (\d+)\) had the highest score (\d+)", prompt)
+		image_id, score = (int(best.group(1)), int(best.group(2))) if best else (1, 0)
+		summary = events.get(str(image_id), "")
+
+		if "response_format" in payload:
+			content = json.dumps({
+				"commentary": summary[:240],
+				"score": score,
+				"post": score >= MOCK_POST_SCORE,
+				"image_id": image_id
+			})
+		else:
+			notes = re.search(r"<your_notes>\n(.*)\n</your_notes>", prompt, re.DOTALL)
+			lines = [line for line in (notes.group(1) if notes else "").splitlines() if line and line != "No previous notes"]
+			digest = hashlib.sha1(summary.encode()).hexdigest()[:8]
+			content = "\n".join((lines + [f"- [{digest}] {summary[:160]}"])[-MOCK_NOTES_LINES:])
+
+		usage = {"prompt_tokens": approx_tokens(prompt), "completion_tokens": approx_tokens(content)}
+		usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+		return 200, {"choices": [{"message": {"content": content}}], "usage": usage, "model": payload["model"]}, None
+
+	def remember(self, key: Optional[str], data: Dict[str, Any]) -> None:
+		pass
+
+def parse_time(value: str) -> datetime:
+	parsed = datetime.fromisoformat(value)
+	return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def log_range(context_path: Path) -> Tuple[datetime, datetime]:
+	"""Timestamps of the first and last entries, the log is appended in time order."""
+	with open(context_path, "rb") as f:
+		first = json.loads(f.readline())
+		f.seek(max(0, os.path.getsize(context_path) - 65536))
+		last = json.loads([line for line in f.read().splitlines() if line.strip()][-1])
+	return parse_time(first["timestamp"]), parse_time(last["timestamp"])
+
+class Replay:
+	"""Drives post_cycle over a past time range, one POST_INTERVAL window per step."""
+	def __init__(
+		self,
+		context_path: str,
+		output_dir: str,
+		post_analyzer,
+		start: datetime,
+		end: datetime,
+		interval_secs: float,
+		channel: Optional[str] = None,
+		notes_retrieval: bool = False,
+		dedup: bool = False
+	):
+		self.context_path = Path(context_path)
+		self.output_dir = Path(output_dir)
+		self.post_analyzer = post_analyzer
+		self.end = end
+		self.interval_secs = interval_secs
+		self.channel = channel
+		self.clock = VirtualClock(start)
+		self.output_dir.mkdir(parents=True, exist_ok=True)
+		self.decisions_path = self.output_dir / "decisions.jsonl"
+
+		self.retriever = None
+		if notes_retrieval:
+			from post.retrieval import NotesRetriever
+			self.retriever = NotesRetriever(
+				context_path=str(self.context_path),
+				posts_path=str(self.output_dir / "posts.jsonl"),
+				notes_path=str(self.output_dir / "notes.txt"),
+				channel=channel
+			)
+		self.dedup = None
+		if dedup:
+			from post.dedup import DuplicateIndex
+			self.dedup = DuplicateIndex(posts_path=str(self.output_dir / "posts.jsonl"))
+
+	def run(self) -> Dict[str, Any]:
+		"""Replay every window up to the end time and return a summary."""
+		records = []
+		wall_start = time.perf_counter()
+		with open(self.decisions_path, "w") as f:
+			while self.clock.now() <= self.end:
+				now = self.clock.now()
+				start = time.perf_counter()
+				context = Context(
+					context_dir=str(self.context_path.parent),
+					context_filename=self.context_path.name,
+					posts_dir=str(self.output_dir),
+					channel=self.channel,
+					timestamp=now
+				)
+				context_secs = time.perf_counter() - start
+				record = post_cycle(context, self.post_analyzer, retriever=self.retriever, dedup=self.dedup, now=now)
+				record = record or {"timestamp": now.isoformat(), "events": 0, "skipped": True}
+				record["context_secs"] = round(context_secs, 4)
+				f.write(json.dumps(record) + "\n")
+				records.append(record)
+				if not record.get("skipped"):
+					logger.info(f"{now.isoformat()} score {record['score']} post {record['post']}: {record['commentary'][:80]}")
+				self.clock.sleep(self.interval_secs)
+
+		cycles = [record for record in records if not record.get("skipped")]
+		summary = {
+			"windows": len(records),
+			"cycles": len(cycles),
+			"posts": sum(1 for record in cycles if record["post"]),
+			"vetoed": sum(1 for record in cycles if record.get("duplicate_of")),
+			"wall_secs": round(time.perf_counter() - wall_start, 2)
+		}
+		if cycles:
+			summary["post_rate"] = round(summary["posts"] / len(cycles), 3)
+			for key in ("prompt_tokens", "analyze_secs", "notes_secs"):
+				values = sorted(record[key] for record in cycles)
+				summary[f"{key}_mean"] = round(statistics.mean(values), 4)
+				summary[f"{key}_p95"] = values[int(0.95 * (len(values) - 1))]
+		summary["context_secs_mean"] = round(statistics.mean(record["context_secs"] for record in records), 4) if records else 0
+		with open(self.output_dir / "summary.json", "w") as f:
+			json.dump(summary, f, indent=2)
+		return summary
+
+def main(argv: Optional[list] = None) -> int:
+	parser = argparse.ArgumentParser(description="Replay the post agent over a historical context.jsonl")
+	parser.add_argument("context", help="Historical context.jsonl written by the monitor agent")
+	parser.add_argument("--start", default="", help="ISO time of the first window (default: first event + one interval)")
+	parser.add_argument("--end", default="", help="ISO time of the last window (default: last event)")
+	parser.add_argument("--interval", type=float, default=float(os.getenv("POST_INTERVAL", DEFAULT_POST_INTERVAL)), help="Minutes between cycles (default: POST_INTERVAL)")
+	parser.add_argument("--backend", choices=("mock", "openrouter"), default="mock", help="mock answers locally, openrouter calls the real models")
+	parser.add_argument("--mock-latency", type=float, default=0.0, help="Seconds the mock backend waits per request")
+	parser.add_argument("--output", default="", help=f"Output directory (default: {DEFAULT_OUTPUT_DIR}/<timestamp>)")
+	parser.add_argument("--channel", default=os.getenv("POST_CHANNEL", "") or None)
+	parser.add_argument("--notes-retrieval", action="store_true", help="Send retrieved passages instead of all notes (NOTES_RETRIEVAL)")
+	parser.add_argument("--dedup", action="store_true", help="Veto near-duplicate posts (TWEET_DEDUP)")
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+	if args.backend == "mock":
+		logging.getLogger("post").setLevel(logging.WARNING) # Per request logs would drown the decisions
+
+	first, last = log_range(Path(args.context))
+	interval_secs = args.interval * 60
+	start = parse_time(args.start) if args.start else first.replace(microsecond=0) + timedelta(seconds=interval_secs)
+	end = parse_time(args.end) if args.end else last
+	output_dir = args.output or f"{DEFAULT_OUTPUT_DIR}/{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+
+	from post.llm import PostAnalyzer
+	if args.backend == "mock":
+		post_analyzer = PostAnalyzer(api_key="mock")
+		post_analyzer.client = MockChatClient(args.mock_latency)
+	else:
+		api_key = os.getenv("OPENROUTER_API_KEY")
+		if not api_key:
+			logger.error("OPENROUTER_API_KEY environment variable is required for the openrouter backend")
+			return 1
+		post_analyzer = PostAnalyzer(api_key=api_key)
+
+	logger.info(f"Replaying {start.isoformat()} to {end.isoformat()} every {args.interval} minutes into {output_dir}")
+	summary = Replay(
+		args.context,
+		output_dir,
+		post_analyzer,
+		start=start,
+		end=end,
+		interval_secs=interval_secs,
+		channel=args.channel,
+		notes_retrieval=args.notes_retrieval,
+		dedup=args.dedup
+	).run()
+	print(json.dumps(summary, indent=2))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
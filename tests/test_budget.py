@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from common import budget
+from common.budget import BudgetGovernor
+
+NOON = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+MIDNIGHT = datetime(2025, 3, 2, 0, 0, tzinfo=timezone.utc).timestamp()
+
+class FakeTime:
+	def __init__(self, now: float):
+		self.now = now
+
+	def time(self) -> float:
+		return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+	fake = FakeTime(NOON)
+
+	class FakeDatetime(datetime):
+		@classmethod
+		def now(cls, tz=None):
+			return datetime.fromtimestamp(fake.now, tz)
+
+	monkeypatch.setattr(budget, "time", fake)
+	monkeypatch.setattr(budget, "datetime", FakeDatetime)
+	monkeypatch.setattr(budget.metrics, "emit", lambda *args, **kwargs: None)
+	return fake
+
+def write_ledger(ledger_dir, entries):
+	"""Append (time, cost) entries to the ledgers of their UTC days."""
+	for time_, cost in entries:
+		day = datetime.fromtimestamp(time_, timezone.utc).strftime("%Y-%m-%d")
+		with open(ledger_dir / f"usage-{day}.jsonl", "a") as f:
+			f.write(json.dumps({
+				"time": time_, "agent": "post", "model": "m",
+				"input_tokens": 0, "output_tokens": 0, "cost": cost
+			}) + "\n")
+
+def test_restart_ignores_spend_before_start(tmp_path, clock):
+	# $0.10 spent by the other agent over the hour before this agent (re)started
+	write_ledger(tmp_path, [(NOON - 3600 + i * 60, 0.10 / 60) for i in range(60)])
+	governor = BudgetGovernor("monitor", daily_budget=10.0, ledger_dir=str(tmp_path))
+
+	# That hour must not be divided by the 300 s this agent has been observing
+	clock.now = NOON + 300
+	assert governor.interval(60) == 60 * governor.min_scale
+	clock.now = NOON + 3600
+	assert governor.interval(60) == 60 * governor.min_scale
+
+def test_restart_burn_rate_covers_the_observed_window(tmp_path, clock):
+	write_ledger(tmp_path, [(NOON - 3600 + i * 60, 0.50 / 60) for i in range(60)])
+	governor = BudgetGovernor("monitor", daily_budget=5.0, ledger_dir=str(tmp_path))
+	write_ledger(tmp_path, [(NOON + i * 60, 0.01) for i in range(5)])
+	clock.now = NOON + 300
+
+	burn_rate = 0.05 / 300
+	expected = burn_rate * (MIDNIGHT - clock.now) / (5.0 - 0.50 - 0.05)
+	assert governor.interval(60) / 60 == pytest.approx(expected)
+
+def test_day_rollover_starts_a_new_window(tmp_path, clock):
+	clock.now = MIDNIGHT - 3600
+	governor = BudgetGovernor("monitor", daily_budget=1.0, ledger_dir=str(tmp_path))
+	write_ledger(tmp_path, [(MIDNIGHT - 600, 5.0)]) # Yesterday's spend is over budget
+	clock.now = MIDNIGHT - 60
+	assert governor.interval(60) == 60 * governor.max_scale
+
+	# Only today's spend counts, over the time since midnight
+	write_ledger(tmp_path, [(MIDNIGHT + 300, 0.01)])
+	clock.now = MIDNIGHT + 600
+	assert governor.spent == 5.0
+	scale = governor.interval(60) / 60
+	assert governor.spent == pytest.approx(0.01)
+	projected = 0.01 / 600 * (86400 - 600)
+	# The burn was observed at the max scale in effect until now
+	assert scale == pytest.approx(min(governor.max_scale, projected * governor.max_scale / 0.99), rel=0.01)
+
+def test_no_adjustment_before_min_observation(tmp_path, clock):
+	write_ledger(tmp_path, [(NOON - 60, 10.0)])
+	governor = BudgetGovernor("monitor", daily_budget=1.0, ledger_dir=str(tmp_path))
+	clock.now = NOON + budget.MIN_OBSERVATION - 1
+	assert governor.interval(60) == 60
@@ -0,0 +1,20 @@
+import requests
+
+from post.dispatch import is_transient
+
+class HTTPError(Exception):
+	"""Shaped like tweepy.errors.HTTPException, which carries the requests response."""
+	def __init__(self, status_code: int):
+		self.response = requests.Response()
+		self.response.status_code = status_code
+
+def test_rate_limits_server_and_network_errors_are_retried():
+	assert is_transient(HTTPError(429))
+	assert is_transient(HTTPError(503))
+	assert is_transient(requests.ConnectionError("reset"))
+	assert is_transient(TimeoutError())
+
+def test_rejected_posts_are_not_retried():
+	assert not is_transient(HTTPError(403)) # Duplicate content
+	assert not is_transient(HTTPError(400)) # Text too long
+	assert not is_transient(RuntimeError("X/Twitter client not initialized"))
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from monitor.jobs import JobQueue
+from monitor.remote import JobQueueAPI, RemoteJobQueue
+from monitor.server import Server
+
+@pytest.fixture
+def queue(tmp_path):
+	return JobQueue(str(tmp_path / "queue.db"), lease_secs=0.2, max_attempts=2)
+
+def test_expired_lease_is_claimed_by_another_worker(queue):
+	job_id = queue.enqueue("a.png", 1.0)
+	assert [job.id for job in queue.claim("w1")] == [job_id]
+	assert queue.claim("w2") == []
+
+	time.sleep(0.25)
+	jobs = queue.claim("w2")
+	assert [(job.id, job.attempts) for job in jobs] == [(job_id, 2)]
+	assert not queue.extend(job_id, "w1") # w1 lost the lease
+	assert queue.extend(job_id, "w2")
+
+def test_first_result_wins(queue):
+	job_id = queue.enqueue("a.png", 1.0)
+	queue.claim("w1")
+	assert queue.complete(job_id, {"score": 1})
+	assert not queue.complete(job_id, {"score": 2})
+	assert queue.ready()[0].result == {"score": 1}
+
+def test_released_job_is_retried_then_failed(queue):
+	job_id = queue.enqueue("a.png", 1.0)
+	queue.claim("w1")
+	queue.release(job_id, "w1")
+	assert [job.attempts for job in queue.claim("w2")] == [2]
+	queue.release(job_id, "w2")
+
+	assert queue.claim("w3") == []
+	ready = queue.ready()
+	assert [job.id for job in ready] == [job_id]
+	assert ready[0].result is None # Failed jobs are committed with the default response
+
+def test_expired_job_out_of_attempts_is_failed(queue):
+	job_id = queue.enqueue("a.png", 1.0)
+	queue.claim("w1")
+	time.sleep(0.25)
+	queue.claim("w2")
+	time.sleep(0.25)
+	assert queue.claim("w3") == []
+	assert [job.id for job in queue.ready()] == [job_id]
+
+def test_results_are_committed_in_capture_order(queue):
+	first = queue.enqueue("a.png", 1.0)
+	second = queue.enqueue("b.png", 2.0)
+	queue.claim("w1", limit=2)
+	queue.complete(second, {"score": 2})
+	assert queue.ready() == [] # The first job is still being analyzed
+
+	queue.complete(first, {"score": 1})
+	assert [job.id for job in queue.ready()] == [first, second]
+	queue.mark_committed(second)
+	assert queue.ready() == []
+	assert queue.backlog() == 0
+
+def test_restart_skips_jobs_already_saved(queue):
+	first = queue.enqueue("a.png", 1.0)
+	second = queue.enqueue("b.png", 2.0)
+	queue.claim("w1", limit=2)
+	queue.complete(first, {})
+	queue.complete(second, {})
+	assert [job.id for job in queue.ready(after=first)] == [second]
+
+@pytest.fixture
+def server(tmp_path, queue):
+	recorded = []
+
+	class Budget:
+		def record(self, model, usage):
+			recorded.append((model, usage))
+
+	server = Server(port=0, directory=str(tmp_path / "stream"), api=JobQueueAPI(queue, token="secret", budget=Budget()))
+	server.start()
+	deadline = time.time() + 5
+	while server.httpd is None or server.port == 0:
+		assert time.time() < deadline
+		time.sleep(0.01)
+	server.recorded = recorded
+	yield server
+	server.stop()
+
+def test_remote_worker_round_trip(tmp_path, queue, server):
+	image = tmp_path / "frame.png"
+	image.write_bytes(b"frame bytes")
+	job_id = queue.enqueue(str(image), 1.0, channel="c")
+
+	remote = RemoteJobQueue(f"http://127.0.0.1:{server.port}", token="secret", download_dir=str(tmp_path / "downloads"))
+	jobs = remote.claim("w1")
+	assert [(job.id, job.channel, job.image_path) for job in jobs] == [(job_id, "c", str(image))]
+	local_path = remote.fetch_image(jobs[0])
+	assert open(local_path, "rb").read() == b"frame bytes"
+	assert remote.extend(job_id, "w1")
+
+	usage = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+	assert remote.complete(job_id, {"model": "m", "token_usage": usage})
+	assert not remote.complete(job_id, {"model": "m", "token_usage": usage})
+	assert server.recorded == [("m", usage)] # Counted once
+	assert queue.ready()[0].result["model"] == "m"
+
+def test_remote_release_and_auth(tmp_path, queue, server):
+	job_id = queue.enqueue(str(tmp_path / "missing.png"), 1.0)
+	remote = RemoteJobQueue(f"http://127.0.0.1:{server.port}", token="secret", download_dir=str(tmp_path / "downloads"))
+	job = remote.claim("w1")[0]
+	with pytest.raises(Exception):
+		remote.fetch_image(job) # 404 for a frame that is gone
+	remote.release(job_id, "w1")
+	assert [job.attempts for job in remote.claim("w2")] == [2]
+
+	intruder = RemoteJobQueue(f"http://127.0.0.1:{server.port}", token="wrong", download_dir=str(tmp_path / "downloads"))
+	with pytest.raises(Exception):
+		intruder.claim("w3")
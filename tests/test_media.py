@@ -0,0 +1,17 @@
+import os
+
+from PIL import Image
+
+from post import media
+
+def noise(width: int, height: int) -> Image.Image:
+	return Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+
+def test_flat_frames_stay_lossless():
+	extension, _ = media._encode(Image.new("RGB", (640, 360), (10, 20, 30)), 100_000)
+	assert extension == "png"
+
+def test_frames_are_downscaled_until_they_fit():
+	extension, data = media._encode(noise(1200, 800), 150_000)
+	assert extension == "jpg"
+	assert len(data) <= 150_000
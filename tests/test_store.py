@@ -0,0 +1,39 @@
+import os
+
+import pytest
+from PIL import Image
+
+from monitor.store import ImageStore
+
+@pytest.fixture
+def store(tmp_path):
+	return ImageStore(images_dir=str(tmp_path / "images"), posts_path=str(tmp_path / "posts.jsonl"), max_images=2)
+
+def capture(tmp_path, store, shade: int, hold: bool = False) -> str:
+	path = tmp_path / f"capture-{shade}.png"
+	Image.new("RGB", (8, 8), (shade, 0, 0)).save(path)
+	return store.put(str(path), hold=hold)
+
+def test_old_frames_are_archived(tmp_path, store):
+	paths = [capture(tmp_path, store, shade) for shade in range(4)]
+	assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+
+def test_held_frames_survive_until_released(tmp_path, store):
+	held = [capture(tmp_path, store, shade, hold=True) for shade in range(4)]
+	assert all(os.path.exists(path) for path in held)
+
+	store.release(held[0])
+	assert not os.path.exists(held[0])
+	assert os.path.exists(held[1])
+	store.release(held[3]) # Still among the newest frames
+	assert os.path.exists(held[3])
+
+def test_recaptured_frame_is_archived_once(tmp_path):
+	store = ImageStore(images_dir=str(tmp_path / "images"), posts_path=str(tmp_path / "posts.jsonl"), max_images=1, max_archived=2)
+	capture(tmp_path, store, 0)
+	capture(tmp_path, store, 1) # Archives frame 0
+	capture(tmp_path, store, 0) # Frame 0 again, archives frame 1
+	capture(tmp_path, store, 2) # Archives frame 0 a second time
+	assert len(store.archive) == 2
+	capture(tmp_path, store, 3) # Evicts frame 1, the oldest archived entry
+	assert all(path.exists() for path in store.archive)
@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Set, Union, TYPE_CHECKING
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from monitor.jobs import JobQueue, DEFAULT_QUEUE_PATH, DEFAULT_LEASE_SECS
+from monitor.llm import ImageAnalyzer
+from common.cache import ResponseCache
+from common.ratelimit import RateLimiter, parse_limits
+from common.budget import BudgetGovernor, parse_prices
+
+if TYPE_CHECKING:
+	from monitor.remote import RemoteJobQueue
+
+# Configure logging
+def setup_logging():
+	# Create logs directory if it doesn't exist
+	os.makedirs("logs", exist_ok=True)
+	# Configure root logger
+	logger = logging.getLogger()
+	logger.setLevel(logging.INFO)
+	# Create formatters
+	formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+	# Setup console handler
+	console_handler = logging.StreamHandler()
+	console_handler.setFormatter(formatter)
+	logger.addHandler(console_handler)
+	# Setup file handler
+	file_handler = logging.FileHandler(f"logs/worker-{os.getpid()}.log")
+	file_handler.setFormatter(formatter)
+	logger.addHandler(file_handler)
+	return logger
+
+logger = setup_logging()
+
+CACHE_DIR = "context/cache"
+RATE_LIMIT_STATE_PATH = "context/ratelimit-{worker_id}.json" # Per worker, WORKER_RATE_LIMIT_STATE overrides it
+DEFAULT_POLL_INTERVAL = "2" # secs
+
+class AnalysisWorker:
+	"""Claims captured frames from the monitor agent's job queue and analyzes them (ANALYSIS_MODE=queue)
+
+	With QUEUE_URL the worker runs on any node and talks to the monitor's HTTP
+	server, otherwise it opens the SQLite queue at QUEUE_PATH on this host. Each
+	worker has its own rate limits, so workers with their own API keys add
+	throughput instead of sharing the monitor's bucket.
+	"""
+	def __init__(self):
+		self.worker_id = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+		try:
+			self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+			self.queue_path = os.getenv("QUEUE_PATH", DEFAULT_QUEUE_PATH)
+			self.queue_url = os.getenv("QUEUE_URL", "")
+			self.queue_token = os.getenv("QUEUE_TOKEN", "")
+			self.queue_lease_secs = float(os.getenv("QUEUE_LEASE_SECS", str(DEFAULT_LEASE_SECS)))
+			self.poll_interval_secs = float(os.getenv("WORKER_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+
+			# Same analyzer settings as the monitor agent
+			self.scene_routing = os.getenv("SCENE_ROUTING", "false").lower() == "true"
+			self.scene_policy = os.getenv("SCENE_POLICY", "")
+			self.scene_min_confidence = float(os.getenv("SCENE_MIN_CONFIDENCE", "0.6"))
+			self.cascade = os.getenv("CASCADE_MODE", "false").lower() == "true"
+			self.cascade_threshold = int(os.getenv("CASCADE_SCORE_THRESHOLD", "7"))
+			self.prompt_cache = os.getenv("PROMPT_CACHE", "false").lower() == "true"
+			self.response_cache_enabled = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+			self.response_cache_ttl_secs = float(os.getenv("RESPONSE_CACHE_TTL", "1440")) * 60
+			self.response_cache_max_bytes = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+			self.rate_limit_rpm = float(os.getenv("WORKER_RATE_LIMIT_RPM") or os.getenv("RATE_LIMIT_RPM", "20"))
+			self.rate_limit_tpm = float(os.getenv("WORKER_RATE_LIMIT_TPM") or os.getenv("RATE_LIMIT_TPM", "1000000"))
+			self.rate_limits = os.getenv("WORKER_RATE_LIMITS") or os.getenv("RATE_LIMITS", "")
+			self.rate_limit_state_path = os.getenv("WORKER_RATE_LIMIT_STATE") or RATE_LIMIT_STATE_PATH.format(worker_id=self.worker_id)
+			self.model_prices = os.getenv("MODEL_PRICES", "")
+		except ValueError:
+			logger.error("QUEUE_LEASE_SECS, WORKER_POLL_INTERVAL and other numeric settings must be numeric values")
+			sys.exit(1)
+
+		if not self.openrouter_api_key:
+			logger.error("OPENROUTER_API_KEY environment variable is required")
+			sys.exit(1)
+
+		self.job_queue: Optional[Union[JobQueue, "RemoteJobQueue"]] = None
+		self.image_analyzer: Optional[ImageAnalyzer] = None
+		self.leased: Set[int] = set() # Jobs whose leases the heartbeat keeps alive
+		self.running = False
+
+	def initialize(self):
+		"""Connect to the job queue and set up the analyzer"""
+		try:
+			budget = None
+			if self.queue_url:
+				from monitor.remote import RemoteJobQueue
+				self.job_queue = RemoteJobQueue(self.queue_url, token=self.queue_token)
+			else:
+				self.job_queue = JobQueue(self.queue_path, lease_secs=self.queue_lease_secs)
+				# Spend is recorded in the shared ledger, the monitor agent paces captures to the budget
+				budget = BudgetGovernor("worker", prices=parse_prices(self.model_prices))
+			scene_policy = None
+			if self.scene_routing:
+				from common.images import get_game_area
+				from monitor.scene import parse_policy
+				if get_game_area() is None:
+					logger.warning("SCENE_ROUTING needs GAME_AREA to classify frames reliably, scene routing disabled")
+				else:
+					scene_policy = parse_policy(self.scene_policy)
+			response_cache = None
+			if self.response_cache_enabled:
+				response_cache = ResponseCache(
+					cache_dir=f"{CACHE_DIR}/monitor",
+					ttl=self.response_cache_ttl_secs,
+					max_bytes=self.response_cache_max_bytes
+				)
+			self.image_analyzer = ImageAnalyzer(
+				api_key=self.openrouter_api_key,
+				scene_policy=scene_policy,
+				scene_min_confidence=self.scene_min_confidence,
+				cascade=self.cascade,
+				cascade_threshold=self.cascade_threshold,
+				response_cache=response_cache,
+				prompt_cache=self.prompt_cache,
+				rate_limiter=RateLimiter(
+					state_path=self.rate_limit_state_path,
+					default_limits=(self.rate_limit_rpm, self.rate_limit_tpm),
+					limits=parse_limits(self.rate_limits)
+				),
+				budget=budget # Remote workers' usage is recorded by the monitor when results come in
+			)
+			logger.info(f"Worker {self.worker_id} initialized (queue: {self.queue_url or self.queue_path})")
+		except Exception as e:
+			logger.error(f"Error during initialization: {e}")
+			sys.exit(1)
+
+	def run(self):
+		"""Claim and analyze jobs until interrupted"""
+		self.running = True
+		signal.signal(signal.SIGINT, self.handle_interrupt)
+		signal.signal(signal.SIGTERM, self.handle_interrupt)
+		threading.Thread(target=self.heartbeat, daemon=True).start()
+
+		while self.running:
+			try:
+				jobs = self.job_queue.claim(self.worker_id)
+				if not jobs:
+					time.sleep(self.poll_interval_secs)
+					continue
+
+				for job in jobs:
+					self.leased.add(job.id)
+					image_path = job.image_path
+					try:
+						if self.queue_url:
+							image_path = self.job_queue.fetch_image(job) # Frames are sent as bytes
+						timestamp = datetime.fromtimestamp(job.capture_time, timezone.utc).isoformat()
+						analysis = self.image_analyzer.analyze_image(image_path, timestamp=timestamp)
+						# analyze_image returns a default response instead of raising, only scene skips are final
+						if analysis.get("model") is None and not analysis.get("skipped"):
+							raise RuntimeError("no model returned an analysis")
+						analysis["image_path"] = job.image_path # The monitor's copy, not the downloaded one
+						if not self.job_queue.complete(job.id, analysis):
+							logger.info(f"Job {job.id} was already completed by another worker")
+					except Exception as e:
+						logger.error(f"Error analyzing job {job.id}: {e}")
+						try:
+							self.job_queue.release(job.id, self.worker_id)
+						except Exception as release_error:
+							logger.error(f"Error releasing job {job.id}, its lease will expire: {release_error}")
+					finally:
+						self.leased.discard(job.id)
+						if image_path != job.image_path and os.path.exists(image_path):
+							os.remove(image_path)
+			except Exception as e:
+				logger.error(f"Error claiming jobs: {e}")
+				time.sleep(self.poll_interval_secs)
+		logger.info(f"Worker {self.worker_id} stopped")
+
+	def heartbeat(self):
+		"""Renew leases of in-flight jobs so slow analyses are not handed to another worker"""
+		while self.running:
+			time.sleep(self.queue_lease_secs / 3)
+			for job_id in list(self.leased):
+				try:
+					if not self.job_queue.extend(job_id, self.worker_id):
+						logger.warning(f"Lost the lease on job {job_id}")
+				except Exception as e:
+					logger.error(f"Error renewing lease on job {job_id}: {e}")
+
+	def handle_interrupt(self, sig, frame):
+		"""Finish the current job and stop"""
+		logger.info("Received interrupt signal, shutting down...")
+		self.running = False
+
+if __name__ == "__main__":
+	worker = AnalysisWorker()
+	worker.initialize()
+	worker.run()